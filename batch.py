@@ -0,0 +1,377 @@
+"""Headless batch mode: parse a folder of source documents and render templates.
+
+This module must not import PyQt5 so it can run on servers without a display.
+"""
+import argparse
+import collections
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import ocr
+from parsers import DEFAULT_DATA, OCR_DPI, read_data_from_file
+from source_cache import get_default_cache, read_data_cached
+from excel_utils import RENDER_BACKENDS
+from templates import DEFAULT_NAME_PATTERN, NameClaims, compile_template, render_all
+
+SOURCE_EXTENSIONS = (".docx", ".pdf")
+# Sources submitted to the pool ahead of the results, per worker
+QUEUE_DEPTH = 2
+
+_worker_templates = {}
+
+
+def find_sources(directory, recursive=False):
+    """Return sorted paths of supported source documents in directory."""
+    paths = []
+    if recursive:
+        for root, _dirs, files in os.walk(directory):
+            for name in files:
+                paths.append(os.path.join(root, name))
+    else:
+        for name in os.listdir(directory):
+            paths.append(os.path.join(directory, name))
+    return sorted(
+        p for p in paths
+        if os.path.isfile(p)
+        and p.lower().endswith(SOURCE_EXTENSIONS)
+        and not os.path.basename(p).startswith("~$")
+    )
+
+
+def read_manifest(path):
+    """Read source paths from a manifest file, one per line.
+
+    Empty lines and lines starting with ``#`` are ignored. Relative paths are
+    resolved against the manifest's directory.
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    sources = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            sources.append(os.path.normpath(os.path.join(base, line)))
+    return sources
+
+
+def output_dirs(sources, output_dir):
+    """Return the output directory of each source.
+
+    Sources from different folders (``--recursive`` or a manifest) are put
+    into the same subfolders of output_dir as below their common parent, so
+    equally named sources do not overwrite each other's outputs.
+    """
+    parents = [os.path.dirname(os.path.abspath(source)) for source in sources]
+    try:
+        base = os.path.commonpath(parents) if parents else ""
+    except ValueError:
+        # Sources on different drives
+        return [os.path.join(output_dir, os.path.splitdrive(p)[1].lstrip(os.sep)) for p in parents]
+    return [os.path.normpath(os.path.join(output_dir, os.path.relpath(parent, base))) for parent in parents]
+
+
+def load_templates(paths, backend="openpyxl"):
+    """Compile the given template files, skipping empty paths."""
+    return {key: compile_template(path, backend) for key, path in paths.items() if path}
+
+
+def missing_fields(data):
+    """Return names of fields that the parser left empty."""
+    return [key for key in DEFAULT_DATA if not data.get(key)]
+
+
+def failed_result(source, error):
+    """Return the result record of a source that could not be processed at all."""
+    return {
+        "source": source,
+        "ok": False,
+        "missing": [],
+        "outputs": {},
+        "error": f"{type(error).__name__}: {error}",
+        "parse_seconds": 0.0,
+        "render_seconds": 0.0,
+        "seconds": 0.0,
+    }
+
+
+def process_file(
+    source,
+    templates,
+    output_dir,
+    pdf_options=None,
+    use_cache=True,
+    name_pattern=None,
+    bundle=False,
+    claims=None,
+):
+    """Parse one source and render every template, returning a result record.
+
+    ``pdf_options`` are passed to the PDF reader (OCR ``dpi`` and ``workers``).
+    Outputs are named ``<source>_<key>`` unless ``name_pattern`` or ``bundle``
+    is given, in which case they are written by ``render_all`` (bundles are
+    named after the source unless a pattern is given). ``claims`` keeps the
+    names unique across a batch (see ``NameClaims``).
+    """
+    read_data = read_data_cached if use_cache else read_data_from_file
+    start = time.perf_counter()
+    result = {
+        "source": source,
+        "ok": False,
+        "missing": [],
+        "outputs": {},
+        "error": "",
+        "parse_seconds": 0.0,
+        "render_seconds": 0.0,
+        "seconds": 0.0,
+    }
+    try:
+        data = read_data(source, **(pdf_options or {}))
+        parsed = time.perf_counter()
+        result["parse_seconds"] = round(parsed - start, 4)
+        result["missing"] = missing_fields(data)
+        if name_pattern or bundle:
+            stem = os.path.splitext(os.path.basename(source))[0]
+            pattern = name_pattern or stem.replace("{", "(").replace("}", ")") + "_{{Шаблон}}"
+            result["outputs"] = render_all(templates, data, output_dir, pattern, bundle, claims)
+        else:
+            stem = os.path.splitext(os.path.basename(source))[0]
+            os.makedirs(output_dir, exist_ok=True)
+            for key, template in templates.items():
+                output_path = os.path.join(output_dir, f"{stem}_{key}{template.ext}")
+                if claims is not None:
+                    output_path = claims.unique(output_path)
+                template.render(data, output_path)
+                result["outputs"][key] = output_path
+        result["render_seconds"] = round(time.perf_counter() - parsed, 4)
+        result["ok"] = True
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = round(time.perf_counter() - start, 4)
+    return result
+
+
+def _init_worker(templates):
+    # Compiled templates are recompiled from their bytes once per worker on unpickling
+    global _worker_templates
+    _worker_templates = templates
+
+
+def _process_in_worker(
+    source, output_dir, pdf_options, use_cache, name_pattern=None, bundle=False, claims=None
+):
+    return process_file(
+        source, _worker_templates, output_dir, pdf_options, use_cache, name_pattern, bundle, claims
+    )
+
+
+def _new_pool(workers, templates):
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(templates,))
+
+
+def run_batch(
+    sources,
+    templates,
+    output_dir,
+    workers=None,
+    on_result=None,
+    dpi=OCR_DPI,
+    use_cache=True,
+    early_exit=False,
+    ocr_layout=None,
+    name_pattern=None,
+    bundle=False,
+):
+    """Process sources across a process pool and return results in input order.
+
+    ``workers`` defaults to the number of CPU cores. ``on_result`` is called
+    with each result as soon as it is available. With ``early_exit``, PDF
+    pages stop being read once all fields are found. ``ocr_layout`` names the
+    regions of scanned pages to recognize (see ``ocr.OCR_LAYOUTS``).
+    ``name_pattern`` and ``bundle`` are passed to ``process_file``. Outputs
+    of sources in subfolders go to the same subfolders of output_dir, and
+    sources whose outputs would get the same name (e.g. the same document
+    number) get numbered names instead of overwriting each other.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    results = []
+    # Resolved here so layouts registered in this process reach the workers too
+    layout = ocr.get_layout(ocr_layout)
+    jobs = list(zip(sources, output_dirs(sources, output_dir)))
+    claims = NameClaims()
+    try:
+        if workers == 1:
+            pdf_options = {"dpi": dpi, "early_exit": early_exit, "ocr_layout": layout}
+            for source, target in jobs:
+                result = process_file(
+                    source, templates, target, pdf_options, use_cache, name_pattern, bundle, claims
+                )
+                if on_result:
+                    on_result(result)
+                results.append(result)
+            return results
+        # Files are already spread over the cores, so each one is OCR'd serially
+        pdf_options = {"dpi": dpi, "workers": 1, "early_exit": early_exit, "ocr_layout": layout}
+        pool = _new_pool(workers, templates)
+
+        def submit(source, target):
+            return pool.submit(
+                _process_in_worker, source, target, pdf_options, use_cache, name_pattern, bundle, claims
+            )
+
+        def emit(result):
+            if on_result:
+                on_result(result)
+            results.append(result)
+
+        def run_alone(source, target):
+            nonlocal pool
+            try:
+                return submit(source, target).result()
+            except BrokenProcessPool as e:
+                pool.shutdown(wait=False)
+                pool = _new_pool(workers, templates)
+                return failed_result(source, e)
+
+        # Sources submitted ahead of the results, so that few of them have to run
+        # again when a worker dies
+        queued = collections.deque()
+        next_job = 0
+        try:
+            while queued or next_job < len(jobs):
+                while next_job < len(jobs) and len(queued) < workers * QUEUE_DEPTH:
+                    try:
+                        queued.append(jobs[next_job] + (submit(*jobs[next_job]),))
+                    except BrokenProcessPool:
+                        if queued:
+                            # The queued sources will show which one broke it
+                            break
+                        pool.shutdown(wait=False)
+                        pool = _new_pool(workers, templates)
+                        continue
+                    next_job += 1
+                source, target, future = queued.popleft()
+                try:
+                    emit(future.result())
+                except BrokenProcessPool:
+                    # A worker died (out of memory, a crash in a native library) and took
+                    # the pool with it. Any queued source may have killed it, so those
+                    # that did not finish run again one at a time on a new pool
+                    pool.shutdown(wait=False)
+                    pool = _new_pool(workers, templates)
+                    suspects = [(source, target, future)] + list(queued)
+                    queued.clear()
+                    for source, target, future in suspects:
+                        try:
+                            result = future.result()
+                        except BrokenProcessPool:
+                            result = run_alone(source, target)
+                        emit(result)
+        finally:
+            pool.shutdown()
+        return results
+    finally:
+        claims.close()
+
+
+def _print_result(result):
+    status = "OK  " if result["ok"] else "FAIL"
+    line = f"{status} {result['seconds']:7.2f}s  {result['source']}"
+    if result["error"]:
+        line += f"  [{result['error']}]"
+    elif result["missing"]:
+        line += f"  missing: {', '.join(result['missing'])}"
+    print(line, flush=True)
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(
+        description="Render act and invoice workbooks for a batch of source documents."
+    )
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input", "-i", help="directory with .docx/.pdf sources")
+    source.add_argument("--manifest", "-m", help="text file listing source paths")
+    parser.add_argument("--recursive", "-r", action="store_true", help="walk subdirectories")
+    parser.add_argument("--act", help="act template (.xlsx or .docx)")
+    parser.add_argument("--invoice", help="invoice template (.xlsx or .docx)")
+    parser.add_argument("--output", "-o", required=True, help="output directory")
+    parser.add_argument(
+        "--backend",
+        choices=RENDER_BACKENDS,
+        default="openpyxl",
+        help="xlsx rendering backend (default: openpyxl)",
+    )
+    parser.add_argument("--workers", "-j", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--dpi", type=int, default=OCR_DPI, help=f"OCR resolution (default: {OCR_DPI})")
+    parser.add_argument(
+        "--early-exit",
+        action="store_true",
+        help="stop reading PDF pages once all fields are found",
+    )
+    parser.add_argument(
+        "--ocr-layout",
+        choices=sorted(ocr.OCR_LAYOUTS),
+        default="page",
+        help="regions of scanned pages to recognize (default: page, the whole page)",
+    )
+    parser.add_argument(
+        "--name",
+        help="output name pattern with {{Field}} placeholders, e.g. "
+        f"{DEFAULT_NAME_PATTERN!r} ({{{{Шаблон}}}} is Акт/Счёт; default: <source>_<template>)",
+    )
+    parser.add_argument("--zip", action="store_true", help="bundle the outputs of each source into one zip")
+    parser.add_argument("--no-cache", action="store_true", help="do not use the extracted data cache")
+    parser.add_argument("--clear-cache", action="store_true", help="empty the extracted data cache first")
+    parser.add_argument("--report", help="write per-file results to this JSON file")
+    return parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    if args.manifest:
+        sources = read_manifest(args.manifest)
+    else:
+        sources = find_sources(args.input, recursive=args.recursive)
+    if args.clear_cache:
+        get_default_cache().clear()
+    templates = load_templates({"act": args.act, "invoice": args.invoice}, args.backend)
+    warning = ocr.backend_warning()
+    if warning and any(source.lower().endswith(".pdf") for source in sources):
+        print(f"warning: {warning}", file=sys.stderr, flush=True)
+
+    start = time.perf_counter()
+    results = run_batch(
+        sources,
+        templates,
+        args.output,
+        args.workers,
+        on_result=_print_result,
+        dpi=args.dpi,
+        use_cache=not args.no_cache,
+        early_exit=args.early_exit,
+        ocr_layout=args.ocr_layout,
+        name_pattern=args.name,
+        bundle=args.zip,
+    )
+    elapsed = time.perf_counter() - start
+
+    failed = sum(1 for r in results if not r["ok"])
+    print(f"Processed {len(results)} file(s) in {elapsed:.2f}s, {failed} failed")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(
+                {"elapsed": round(elapsed, 4), "results": results},
+                f,
+                ensure_ascii=False,
+                indent=2,
+            )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
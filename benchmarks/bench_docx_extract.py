@@ -0,0 +1,111 @@
+"""Latency and memory of .docx field extraction on large contracts.
+
+Usage: python benchmarks/bench_docx_extract.py [--paragraphs 0,1000,10000] [--count 5]
+                                               [--repeat 3] [--output results.json]
+
+Every contract has the three tables of the default layout followed by
+``--paragraphs`` paragraphs of terms. Compared methods:
+
+* ``python-docx`` - the previous path, a ``Document`` and
+  ``DocumentIndex.from_document``;
+* ``stream-full`` - ``docx_layouts.read_index`` made to read the whole file;
+* ``stream`` - ``docx_layouts.read_index`` as ``parsers.read_data_from_docx``
+  uses it, stopping once the fields are settled.
+
+Reports the median time per file and the tracemalloc peak of one file, and
+checks that python-docx and ``stream`` give the same fields. tracemalloc does
+not see the lxml trees python-docx builds, so its peak is understated.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import corpus
+import docx_layouts
+
+# A layout whose fields are never settled, so the whole document is read
+_READ_ALL = {"name": "read-all", "fields": {"all": {"paragraph": "\0"}}}
+
+
+def python_docx_fields(path):
+    from docx import Document
+
+    return docx_layouts.extract_fields(docx_layouts.DocumentIndex.from_document(Document(path)))
+
+
+def stream_full_fields(path):
+    return docx_layouts.extract_fields(docx_layouts.read_index(path, layouts=[_READ_ALL]))
+
+
+def stream_fields(path):
+    return docx_layouts.extract_fields(docx_layouts.read_index(path))
+
+
+METHODS = {
+    "python-docx": python_docx_fields,
+    "stream-full": stream_full_fields,
+    "stream": stream_fields,
+}
+
+
+def measure(extract, paths, repeat):
+    seconds = []
+    for _ in range(repeat):
+        for path in paths:
+            start = time.perf_counter()
+            extract(path)
+            seconds.append(time.perf_counter() - start)
+    tracemalloc.start()
+    extract(paths[0])
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return statistics.median(seconds), peak
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--paragraphs", default="0,1000,10000", help="terms paragraphs per contract")
+    parser.add_argument("--count", type=int, default=5, help="contracts per size")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    results = []
+    print(f"{'paragraphs':>10}  {'method':<12}{'ms/file':>9}{'peak MB':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for paragraphs in [int(n) for n in args.paragraphs.split(",")]:
+            paths = []
+            for i in range(args.count):
+                path = os.path.join(tmp, f"contract_{paragraphs}_{i}.docx")
+                corpus.write_docx(path, corpus.make_contract_data(i), extra_paragraphs=paragraphs)
+                paths.append(path)
+            expected = [python_docx_fields(path) for path in paths]
+            for name, extract in METHODS.items():
+                if name != "stream-full" and [extract(path) for path in paths] != expected:
+                    raise SystemExit(f"{name} gives different fields")
+                seconds, peak = measure(extract, paths, args.repeat)
+                results.append({
+                    "paragraphs": paragraphs,
+                    "method": name,
+                    "ms_per_file": round(seconds * 1000, 2),
+                    "peak_mb": round(peak / (1024 * 1024), 2),
+                })
+                print(
+                    f"{paragraphs:>10}  {name:<12}{seconds * 1000:>9.2f}{peak / (1024 * 1024):>9.2f}",
+                    flush=True,
+                )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""Time .docx template rendering on a large generated template.
+
+Usage: python benchmarks/bench_docx_render.py [--paragraphs 2000] [--tables 50] [--renders 10]
+
+Compares the old per-run substitution (which misses split placeholders), a
+one-shot ``doc_utils.replace_placeholders`` on a freshly loaded document, and
+repeated renders of a ``doc_utils.CompiledDocument``.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from docx import Document
+
+import doc_utils
+from parsers import DEFAULT_DATA
+
+
+def build_template(path, paragraphs, tables):
+    """Write a template where every third paragraph has a placeholder split over runs."""
+    keys = list(DEFAULT_DATA)
+    doc = Document()
+    doc.sections[0].header.paragraphs[0].text = "Договор {{Номер документа}}"
+    for i in range(paragraphs):
+        para = doc.add_paragraph(f"Пункт {i + 1}. ")
+        if i % 3 == 0:
+            key = keys[i % len(keys)]
+            para.add_run("{{" + key[:3])
+            para.add_run(key[3:] + "}}").bold = True
+        para.add_run(" Текст условия договора без подстановок.")
+    for i in range(tables):
+        table = doc.add_table(rows=4, cols=4)
+        for r in range(4):
+            for c in range(4):
+                table.cell(r, c).text = f"{{{{{keys[(i + r + c) % len(keys)]}}}}}" if (r + c) % 2 else "—"
+    doc.save(path)
+
+
+def legacy_replace(container, data):
+    for para in container.paragraphs:
+        for run in para.runs:
+            for key, value in data.items():
+                placeholder = f"{{{{{key}}}}}"
+                if placeholder in run.text:
+                    run.text = run.text.replace(placeholder, value)
+    for table in container.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                legacy_replace(cell, data)
+
+
+def measure(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {
+        "mean_seconds": round(sum(timings) / len(timings), 4),
+        "p95_seconds": round(timings[int(0.95 * (len(timings) - 1))], 4),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--paragraphs", type=int, default=2000)
+    parser.add_argument("--tables", type=int, default=50)
+    parser.add_argument("--renders", type=int, default=10)
+    parser.add_argument("--output", help="write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    data = {key: f"значение {key}" for key in DEFAULT_DATA}
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "template.docx")
+        build_template(path, args.paragraphs, args.tables)
+        with open(path, "rb") as f:
+            template_bytes = f.read()
+
+        def one_shot(replace):
+            doc = Document(BytesIO(template_bytes))
+            replace(doc, data)
+            doc.save(BytesIO())
+
+        results["legacy_per_run"] = measure(lambda: one_shot(legacy_replace), args.renders)
+        results["replace_placeholders"] = measure(
+            lambda: one_shot(doc_utils.replace_placeholders), args.renders
+        )
+        start = time.perf_counter()
+        template = doc_utils.CompiledDocument(template_bytes)
+        results["compile_seconds"] = round(time.perf_counter() - start, 4)
+        results["compiled_render"] = measure(lambda: template.render(data, BytesIO()), args.renders)
+
+    for name, value in results.items():
+        if isinstance(value, dict):
+            print(f"{name:>22}: mean {value['mean_seconds']:.3f}s p95 {value['p95_seconds']:.3f}s")
+        else:
+            print(f"{name:>22}: {value:.3f}s")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
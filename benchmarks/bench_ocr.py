@@ -0,0 +1,93 @@
+"""Accuracy and time of OCR settings on synthetic scanned contracts.
+
+Usage: python benchmarks/bench_ocr.py [--count 5] [--pages 3] [--skew 1.5] [--dpi 200]
+                                      [--output results.json]
+
+Every contract is written twice, as a scanned PDF (optionally rotated by
+``--skew`` degrees) and as a PDF with a text layer. The fields parsed from
+the text layer are the reference; accuracy is the share of those fields
+that come out the same after OCR. Compared settings:
+
+* ``whole-page`` - every page whole, without cleanup (``ocr.PAGE_LAYOUT``);
+* ``preprocessed`` - every page whole after grayscale, deskew and binarization;
+* ``contract`` - preprocessed, only the regions of ``ocr.CONTRACT_LAYOUT``.
+
+Needs tesseract (with Russian data) and poppler.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import corpus
+import ocr
+import parsers
+
+SETTINGS = {
+    "whole-page": ocr.PAGE_LAYOUT,
+    "preprocessed": {"name": "preprocessed", "regions": [], "preprocess": {}},
+    "contract": ocr.CONTRACT_LAYOUT,
+}
+
+
+def field_accuracy(data, reference):
+    keys = [key for key, value in reference.items() if value]
+    return sum(data[key] == reference[key] for key in keys) / len(keys)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=5)
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--skew", type=float, default=1.5, help="rotation of the scans in degrees")
+    parser.add_argument("--dpi", type=int, default=parsers.OCR_DPI)
+    parser.add_argument("--output", help="write results to this JSON file")
+    args = parser.parse_args(argv)
+    if not (shutil.which("tesseract") and shutil.which("pdftoppm")):
+        print("tesseract/poppler not found", file=sys.stderr)
+        return 1
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        sources = []
+        for i in range(args.count):
+            fields = corpus.make_contract_data(i)
+            scan = os.path.join(tmp, f"scan_{i}.pdf")
+            text = os.path.join(tmp, f"text_{i}.pdf")
+            corpus.write_source(scan, "scan-pdf", fields, args.pages, skew=args.skew)
+            corpus.write_source(text, "text-pdf", fields, args.pages)
+            sources.append((scan, parsers.read_data_from_pdf(text)))
+        print(f"{'setting':<14}{'p50 s':>9}{'docs/s':>9}{'accuracy':>10}")
+        for name, layout in SETTINGS.items():
+            seconds = []
+            accuracy = []
+            for scan, reference in sources:
+                start = time.perf_counter()
+                data = parsers.read_data_from_pdf(scan, dpi=args.dpi, workers=1, ocr_layout=layout)
+                seconds.append(time.perf_counter() - start)
+                accuracy.append(field_accuracy(data, reference))
+            results[name] = {
+                "p50_seconds": round(statistics.median(seconds), 3),
+                "throughput_per_second": round(len(seconds) / sum(seconds), 3),
+                "field_accuracy": round(statistics.mean(accuracy), 3),
+            }
+            r = results[name]
+            print(
+                f"{name:<14}{r['p50_seconds']:>9.3f}{r['throughput_per_second']:>9.3f}"
+                f"{r['field_accuracy']:>10.1%}",
+                flush=True,
+            )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
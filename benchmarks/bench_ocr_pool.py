@@ -0,0 +1,110 @@
+"""OCR throughput per core: a pool per document versus the persistent pool.
+
+Usage: python benchmarks/bench_ocr_pool.py [--count 4] [--pages 6] [--workers 2]
+                                           [--backends pytesseract,tesserocr]
+
+``per-document`` is the previous approach: a new process pool for every PDF
+and the tesseract command started for every page. ``persistent`` goes
+through ``parsers.extract_text_from_pdf``, whose pool and OCR engines stay
+loaded across documents; it is run once per OCR backend. Each setting runs
+in a fresh process. Needs tesseract (with Russian data) and poppler;
+the ``tesserocr`` backend also needs the tesserocr package.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import corpus
+import ocr
+import parsers
+
+
+def per_document(paths, pages, dpi, workers):
+    for path in paths:
+        with ProcessPoolExecutor(max_workers=workers, initializer=parsers._init_ocr_worker) as pool:
+            list(pool.map(ocr.recognize_page, [path] * pages, range(1, pages + 1), [dpi] * pages))
+
+
+def persistent(paths, pages, dpi, workers):
+    for path in paths:
+        parsers.extract_text_from_pdf(path, dpi=dpi, workers=workers)
+    parsers.shutdown_ocr_pools()
+
+
+def run_setting(method, backend, paths, pages, dpi, workers, queue):
+    os.environ["WORD_COPYWRITER_OCR_BACKEND"] = backend
+    start = time.perf_counter()
+    (per_document if method == "per-document" else persistent)(paths, pages, dpi, workers)
+    seconds = time.perf_counter() - start
+    pages_per_second = len(paths) * pages / seconds
+    queue.put({
+        "setting": f"{method}/{backend}",
+        "seconds": round(seconds, 3),
+        "pages_per_second": round(pages_per_second, 3),
+        "pages_per_second_per_core": round(pages_per_second / workers, 3),
+    })
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=4, help="scanned PDFs")
+    parser.add_argument("--pages", type=int, default=6, help="pages per PDF")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--dpi", type=int, default=parsers.OCR_DPI)
+    parser.add_argument("--backends", default="pytesseract,tesserocr")
+    parser.add_argument("--output", help="write results to this JSON file")
+    args = parser.parse_args(argv)
+    if not (shutil.which("tesseract") and shutil.which("pdftoppm")):
+        print("tesseract/poppler not found", file=sys.stderr)
+        return 1
+
+    settings = [("per-document", "pytesseract")]
+    for backend in args.backends.split(","):
+        if backend == "tesserocr":
+            try:
+                import tesserocr  # noqa: F401
+            except ImportError:
+                print("skipping tesserocr: not installed", file=sys.stderr)
+                continue
+        settings.append(("persistent", backend))
+
+    results = []
+    ctx = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(args.count):
+            path = os.path.join(tmp, f"scan_{i}.pdf")
+            corpus.write_source(path, "scan-pdf", corpus.make_contract_data(i), args.pages)
+            paths.append(path)
+        print(f"{'setting':<26}{'seconds':>9}{'pages/s':>9}{'per core':>10}")
+        for method, backend in settings:
+            queue = ctx.Queue()
+            proc = ctx.Process(
+                target=run_setting,
+                args=(method, backend, paths, args.pages, args.dpi, args.workers, queue),
+            )
+            proc.start()
+            result = queue.get()
+            proc.join()
+            results.append(result)
+            print(
+                f"{result['setting']:<26}{result['seconds']:>9.2f}{result['pages_per_second']:>9.2f}"
+                f"{result['pages_per_second_per_core']:>10.2f}",
+                flush=True,
+            )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
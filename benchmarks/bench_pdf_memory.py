@@ -0,0 +1,109 @@
+"""Peak memory of PDF text extraction as the page count grows.
+
+Usage: python benchmarks/bench_pdf_memory.py [--pages 5,20,50] [--kind text-pdf|scan-pdf]
+
+Compares ``parsers.extract_text_from_pdf`` with the previous approach that
+kept every pdfplumber page parsed until the file was closed and rasterized
+the whole document with one ``convert_from_path`` call. Each run happens in
+a fresh process and reports its peak RSS (plus that of child processes such
+as pdftoppm and tesseract). ``scan-pdf`` needs poppler and tesseract.
+Peak RSS needs the ``resource`` module and is reported as null elsewhere.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import corpus
+import parsers
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+METHODS = ("legacy", "streaming")
+
+
+def legacy_extract(path, dpi):
+    import pdfplumber
+
+    text = ""
+    scanned = False
+    with pdfplumber.open(path) as pdf:
+        for page in pdf.pages:
+            page_text = page.extract_text() or ""
+            text += page_text + "\n"
+            scanned = scanned or len("".join(page_text.split())) < parsers.MIN_TEXT_LAYER_CHARS
+    if scanned:
+        from pdf2image import convert_from_path
+        import pytesseract
+
+        text = ""
+        for image in convert_from_path(path, dpi=dpi):
+            text += pytesseract.image_to_string(image, lang=parsers.OCR_LANG) + "\n"
+    return text
+
+
+def peak_rss_mb(who):
+    if resource is None:
+        return None
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_method(method, path, dpi, queue):
+    start = time.perf_counter()
+    if method == "legacy":
+        text = legacy_extract(path, dpi)
+    else:
+        text = parsers.extract_text_from_pdf(path, dpi=dpi, workers=1)
+    queue.put({
+        "method": method,
+        "seconds": round(time.perf_counter() - start, 3),
+        "chars": len(text),
+        "peak_rss_mb": peak_rss_mb(resource.RUSAGE_SELF) if resource else None,
+        "children_peak_rss_mb": peak_rss_mb(resource.RUSAGE_CHILDREN) if resource else None,
+    })
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", default="5,20,50", help="comma-separated page counts")
+    parser.add_argument("--kind", choices=("text-pdf", "scan-pdf"), default="text-pdf")
+    parser.add_argument("--dpi", type=int, default=parsers.OCR_DPI)
+    parser.add_argument("--output", help="write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    results = []
+    ctx = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        for pages in (int(p) for p in args.pages.split(",")):
+            path = os.path.join(tmp, f"{pages}.pdf")
+            corpus.write_source(path, args.kind, corpus.make_contract_data(0), pages)
+            for method in METHODS:
+                queue = ctx.Queue()
+                proc = ctx.Process(target=run_method, args=(method, path, args.dpi, queue))
+                proc.start()
+                result = queue.get()
+                proc.join()
+                result["pages"] = pages
+                results.append(result)
+                print(
+                    f"{pages:4d} pages {method:>9}: {result['seconds']:7.2f}s, "
+                    f"peak RSS {result['peak_rss_mb']} MB (children {result['children_peak_rss_mb']} MB)",
+                    flush=True,
+                )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
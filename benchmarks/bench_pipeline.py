@@ -0,0 +1,163 @@
+"""Time each stage of the extract → parse → render pipeline on a synthetic corpus.
+
+Usage: python benchmarks/bench_pipeline.py [--count 20] [--pages 1] [--kinds docx,text-pdf,scan-pdf]
+                                           [--output results.json] [--compare old.json]
+
+Stages are timed one document at a time: ``read_data_from_docx``,
+``extract_text_from_pdf`` (text layer and OCR; also with ``early_exit`` on
+the fields the corpus fills), ``parse_data_from_text``,
+``create_document`` and the whole pipeline end to end. For every stage the
+report gives throughput, p50/p95 latency and the peak of Python allocations
+(tracemalloc, measured in a separate pass so it does not skew timings).
+Scanned PDFs are skipped when tesseract or poppler are not installed.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from openpyxl import Workbook
+
+import excel_utils
+import parsers
+from corpus import KINDS, generate_corpus
+
+
+def build_template(path):
+    """Write a small act-like template that uses every placeholder."""
+    wb = Workbook()
+    ws = wb.active
+    for row, key in enumerate(parsers.DEFAULT_DATA, 1):
+        ws.cell(row, 1, key)
+        ws.cell(row, 2, f"{{{{{key}}}}}")
+    wb.save(path)
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def summarize(timings, peak_bytes):
+    total = sum(timings)
+    return {
+        "count": len(timings),
+        "throughput_per_second": round(len(timings) / total, 2) if total else None,
+        "p50_seconds": round(statistics.median(timings), 5),
+        "p95_seconds": round(percentile(timings, 0.95), 5),
+        "mean_seconds": round(total / len(timings), 5),
+        "peak_alloc_mb": round(peak_bytes / (1024 * 1024), 2),
+    }
+
+
+def measure(fn, inputs):
+    """Run fn over inputs, returning per-call timings and the peak of one traced call."""
+    timings = []
+    for item in inputs:
+        start = time.perf_counter()
+        fn(item)
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn(inputs[0])
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return summarize(timings, peak)
+
+
+def ocr_available():
+    return bool(shutil.which("tesseract") and shutil.which("pdftoppm"))
+
+
+def run(count, pages, kinds, workdir):
+    paths = generate_corpus(os.path.join(workdir, "corpus"), count, pages, kinds)
+    template_path = os.path.join(workdir, "template.xlsx")
+    build_template(template_path)
+    with open(template_path, "rb") as f:
+        template_bytes = f.read()
+    out_path = os.path.join(workdir, "out.xlsx")
+    results = {}
+
+    def render(data):
+        excel_utils.create_document(template_bytes, ".xlsx", data, out_path)
+
+    def end_to_end(path):
+        render(parsers.read_data_from_file(path))
+
+    if "docx" in paths:
+        results["read_data_from_docx"] = measure(parsers.read_data_from_docx, paths["docx"])
+        results["end_to_end/docx"] = measure(end_to_end, paths["docx"])
+    for kind in ("text-pdf", "scan-pdf"):
+        if kind not in paths:
+            continue
+        if kind == "scan-pdf" and not ocr_available():
+            print("skipping scan-pdf: tesseract/poppler not found", file=sys.stderr)
+            continue
+        results[f"extract_text_from_pdf/{kind}"] = measure(parsers.extract_text_from_pdf, paths[kind])
+        texts = [parsers.extract_text_from_pdf(p) for p in paths[kind]]
+        found = parsers.parse_data_from_text(texts[0])
+        fields = [key for key in parsers.EARLY_EXIT_FIELDS if found[key]]
+        results[f"extract_text_from_pdf/{kind}/early-exit"] = measure(
+            lambda p: parsers.extract_text_from_pdf(p, early_exit=fields), paths[kind]
+        )
+        results[f"parse_data_from_text/{kind}"] = measure(parsers.parse_data_from_text, texts)
+        results[f"end_to_end/{kind}"] = measure(end_to_end, paths[kind])
+
+    sample = parsers.read_data_from_file(next(iter(p for ps in paths.values() for p in ps)))
+    results["create_document"] = measure(render, [sample] * max(count, 5))
+    return results
+
+
+def compare(results, baseline):
+    print(f"\n{'stage':<44}{'p50 before':>12}{'p50 now':>12}{'change':>9}")
+    for stage, now in results.items():
+        before = baseline.get(stage)
+        if not before:
+            continue
+        change = (now["p50_seconds"] - before["p50_seconds"]) / before["p50_seconds"] * 100
+        print(f"{stage:<44}{before['p50_seconds']:>12.5f}{now['p50_seconds']:>12.5f}{change:>+8.1f}%")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=20, help="documents per kind")
+    parser.add_argument("--pages", type=int, default=1, help="pages per document")
+    parser.add_argument("--kinds", default=",".join(KINDS))
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", help="previous results JSON to compare against")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = run(args.count, args.pages, args.kinds.split(","), workdir)
+
+    print(f"{'stage':<44}{'docs/s':>9}{'p50 s':>10}{'p95 s':>10}{'peak MB':>9}")
+    for stage, r in results.items():
+        print(
+            f"{stage:<44}{r['throughput_per_second']:>9}{r['p50_seconds']:>10.5f}"
+            f"{r['p95_seconds']:>10.5f}{r['peak_alloc_mb']:>9.2f}"
+        )
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(results, json.load(f)["results"])
+    if args.output:
+        report = {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "parser_version": parsers.PARSER_VERSION,
+            "args": vars(args),
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Compare time and peak memory of the xlsx rendering backends.
+
+Usage: python benchmarks/bench_render.py [--sheets 30] [--rows 400] [--renders 20]
+
+Each backend runs in a fresh process so its peak RSS is measured in isolation.
+Peak RSS needs the ``resource`` module and is reported as null elsewhere.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from openpyxl import Workbook
+
+import excel_utils
+from parsers import DEFAULT_DATA
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def build_template(path, sheets, rows):
+    """Write a template with sheets × rows × 6 cells, every third one a placeholder."""
+    keys = list(DEFAULT_DATA)
+    wb = Workbook()
+    wb.remove(wb.active)
+    for s in range(sheets):
+        ws = wb.create_sheet(f"Лист {s + 1}")
+        for r in range(1, rows + 1):
+            for c in range(1, 7):
+                if (r + c) % 3 == 0:
+                    key = keys[(r * c) % len(keys)]
+                    ws.cell(r, c, f"{key}: {{{{{key}}}}}")
+                elif c == 6:
+                    ws.cell(r, c, r * 10.5)
+                else:
+                    ws.cell(r, c, f"Текст {r}-{c}")
+    wb.save(path)
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_backend(backend, template_path, renders, queue):
+    with open(template_path, "rb") as f:
+        template_bytes = f.read()
+    data = {key: f"значение {key}" for key in DEFAULT_DATA}
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        template = excel_utils.compile_workbook(template_bytes, backend=backend)
+        compiled = time.perf_counter()
+        timings = []
+        for i in range(renders):
+            t0 = time.perf_counter()
+            template.render(data, os.path.join(tmp, f"{i}.xlsx"))
+            timings.append(time.perf_counter() - t0)
+        one_shot = time.perf_counter()
+        excel_utils.create_document(
+            template_bytes, ".xlsx", data, os.path.join(tmp, "once.xlsx"), backend=backend
+        )
+        one_shot = time.perf_counter() - one_shot
+    timings.sort()
+    queue.put({
+        "backend": backend,
+        "compile_seconds": round(compiled - start, 4),
+        "render_mean_seconds": round(sum(timings) / len(timings), 4),
+        "render_p95_seconds": round(timings[int(0.95 * (len(timings) - 1))], 4),
+        "create_document_seconds": round(one_shot, 4),
+        "peak_rss_mb": peak_rss_mb(),
+    })
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sheets", type=int, default=30)
+    parser.add_argument("--rows", type=int, default=400)
+    parser.add_argument("--renders", type=int, default=20)
+    parser.add_argument("--output", help="write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        template_path = os.path.join(tmp, "template.xlsx")
+        build_template(template_path, args.sheets, args.rows)
+        ctx = multiprocessing.get_context("spawn")
+        for backend in excel_utils.RENDER_BACKENDS:
+            queue = ctx.Queue()
+            proc = ctx.Process(target=run_backend, args=(backend, template_path, args.renders, queue))
+            proc.start()
+            results.append(queue.get())
+            proc.join()
+
+    for r in results:
+        print(
+            f"{r['backend']:>8}: compile {r['compile_seconds']:.3f}s, "
+            f"render mean {r['render_mean_seconds']:.3f}s p95 {r['render_p95_seconds']:.3f}s, "
+            f"create_document {r['create_document_seconds']:.3f}s, peak RSS {r['peak_rss_mb']} MB"
+        )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
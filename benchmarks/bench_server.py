@@ -0,0 +1,167 @@
+"""Load test for the HTTP rendering service.
+
+Usage: python benchmarks/bench_server.py [--requests 200] [--concurrency 8]
+                                         [--mode json|docx|text-pdf|scan-pdf]
+                                         [--workers N] [--url http://127.0.0.1:8765]
+
+Without ``--url`` a server is started with a synthetic act template and
+stopped afterwards. Each client keeps one connection open and sends its
+requests back to back. ``json`` posts placeholder data; the other modes
+upload synthetic source documents of that kind, cycling through
+``--sources`` different files (repeated files hit the extracted data cache
+unless ``--no-cache`` is given). Reports requests per second and latency
+percentiles.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+import corpus
+from bench_pipeline import build_template, percentile
+
+
+def make_payloads(mode, count, directory):
+    """Return (path, headers, body) tuples for the requests of one mode."""
+    payloads = []
+    for i in range(count):
+        fields = corpus.make_contract_data(i)
+        if mode == "json":
+            data = {
+                "Номер документа": fields["number"],
+                "Адрес загрузки": fields["load_address"],
+                "Адрес разгрузки": fields["unload_address"],
+                "Стоимость перевозки": fields["cost"],
+                "ФИО водителя": fields["driver"],
+            }
+            body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+            payloads.append(("/render/act", {"Content-Type": "application/json"}, body))
+            continue
+        name = f"{mode}_{i}" + (".docx" if mode == "docx" else ".pdf")
+        path = os.path.join(directory, name)
+        corpus.write_source(path, mode, fields)
+        with open(path, "rb") as f:
+            payloads.append((f"/render/act?name={name}", {}, f.read()))
+    return payloads
+
+
+async def client(host, port, payloads, queue, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while True:
+            try:
+                path, headers, body = payloads[queue.pop()]
+            except IndexError:
+                return
+            head = [f"POST {path} HTTP/1.1", f"Host: {host}", f"Content-Length: {len(body)}"]
+            head += [f"{key}: {value}" for key, value in headers.items()]
+            start = time.perf_counter()
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode("utf-8") + body)
+            await writer.drain()
+            status_line = await reader.readline()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b""):
+                    break
+                key, _, value = line.decode("latin-1").partition(":")
+                if key.lower() == "content-length":
+                    length = int(value)
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+            if b" 200 " not in status_line:
+                errors.append(status_line.decode("latin-1").strip())
+    finally:
+        writer.close()
+
+
+async def load(host, port, payloads, requests, concurrency):
+    # Request indexes to send, shared by all clients
+    queue = [i % len(payloads) for i in range(requests)][::-1]
+    latencies, errors = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        client(host, port, payloads, queue, latencies, errors) for _ in range(concurrency)
+    ))
+    return time.perf_counter() - start, latencies, errors
+
+
+def start_server(template, workers, no_cache):
+    command = [sys.executable, os.path.join(ROOT, "server.py"), "--act", template, "--port", "0"]
+    if workers:
+        command += ["--workers", str(workers)]
+    if no_cache:
+        command.append("--no-cache")
+    proc = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline()
+    if not line.startswith("Serving"):
+        proc.kill()
+        raise RuntimeError(f"server did not start: {line!r}")
+    return proc, line.rsplit("/", 1)[1].strip()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--mode", choices=("json",) + corpus.KINDS, default="json")
+    parser.add_argument("--sources", type=int, default=20, help="different payloads to cycle through")
+    parser.add_argument("--workers", type=int, default=None, help="server worker processes")
+    parser.add_argument("--no-cache", action="store_true", help="start the server without the data cache")
+    parser.add_argument("--url", help="use a running server instead of starting one")
+    parser.add_argument("--output", help="write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        payloads = make_payloads(args.mode, args.sources, tmp)
+        proc = None
+        if args.url:
+            address = urlsplit(args.url).netloc
+        else:
+            template = os.path.join(tmp, "act.xlsx")
+            build_template(template)
+            proc, address = start_server(template, args.workers, args.no_cache)
+        host, _, port = address.rpartition(":")
+        try:
+            elapsed, latencies, errors = asyncio.run(
+                load(host, int(port), payloads, args.requests, args.concurrency)
+            )
+        finally:
+            if proc is not None:
+                proc.terminate()
+                proc.wait()
+
+    result = {
+        "mode": args.mode,
+        "requests": len(latencies),
+        "concurrency": args.concurrency,
+        "errors": len(errors),
+        "requests_per_second": round(len(latencies) / elapsed, 2),
+        "p50_seconds": round(statistics.median(latencies), 4),
+        "p95_seconds": round(percentile(latencies, 0.95), 4),
+        "p99_seconds": round(percentile(latencies, 0.99), 4),
+    }
+    print(
+        f"{result['requests']} {args.mode} requests, concurrency {args.concurrency}: "
+        f"{result['requests_per_second']} req/s, p50 {result['p50_seconds']}s, "
+        f"p95 {result['p95_seconds']}s, p99 {result['p99_seconds']}s, {len(errors)} error(s)"
+    )
+    if errors:
+        print(f"first error: {errors[0]}", file=sys.stderr)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "result": result}, f, indent=2)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""Measure cold-start time of the GUI and break it down by imported module.
+
+Usage: python benchmarks/bench_startup.py [--runs 5] [--exe dist/word_copywriter/word_copywriter.exe]
+
+Time to window is read from the log main.py writes when
+``WORD_COPYWRITER_STARTUP_LOG`` is set, so it also works for the packaged
+executable (``--exe``). The import breakdown uses ``python -X importtime`` and
+is only available when running from source.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def import_breakdown(module="main", top=15):
+    """Return (package, seconds) pairs of the top-level packages slowest to import.
+
+    Each module's own import time is attributed to its top-level package.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    totals = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        own, _cumulative, name = line[len("import time:"):].split("|")
+        if not own.strip().isdigit():
+            continue
+        package = name.strip().split(".")[0]
+        totals[package] = totals.get(package, 0) + int(own) / 1e6
+    ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)
+    return [(name, round(seconds, 4)) for name, seconds in ranked[:top]]
+
+
+def time_to_window(command, timeout=60):
+    """Start the app, wait until it logs that the window is shown, then stop it."""
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = os.path.join(tmp, "startup.json")
+        env = dict(os.environ, WORD_COPYWRITER_STARTUP_LOG=log_path)
+        env.setdefault("QT_QPA_PLATFORM", "offscreen")
+        start = time.perf_counter()
+        proc = subprocess.Popen(command, cwd=ROOT, env=env, stderr=subprocess.DEVNULL)
+        try:
+            while not os.path.exists(log_path):
+                if proc.poll() is not None or time.perf_counter() - start > timeout:
+                    raise RuntimeError("application exited before showing its window")
+                time.sleep(0.01)
+            wall = time.perf_counter() - start
+            time.sleep(0.05)
+            with open(log_path, encoding="utf-8") as f:
+                log = json.load(f)
+        finally:
+            proc.kill()
+            proc.wait()
+    return wall, log
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--exe", help="packaged executable to measure instead of main.py")
+    parser.add_argument("--output", help="write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    command = [args.exe] if args.exe else [sys.executable, os.path.join(ROOT, "main.py")]
+    walls = []
+    in_process = []
+    log = {}
+    for _ in range(args.runs):
+        wall, log = time_to_window(command)
+        walls.append(wall)
+        in_process.append(log["window_shown_seconds"])
+    heavy = sorted(
+        m for m in log.get("modules", [])
+        if m in ("docx", "openpyxl", "pdfplumber", "pdf2image", "pytesseract")
+    )
+    result = {
+        "command": command,
+        "wall_to_window_median_seconds": round(statistics.median(walls), 4),
+        "in_process_to_window_median_seconds": round(statistics.median(in_process), 4),
+        "heavy_modules_loaded_before_window": heavy,
+        "imports": [] if args.exe else import_breakdown(),
+    }
+
+    print(f"time to window: {result['wall_to_window_median_seconds']:.3f}s wall, "
+          f"{result['in_process_to_window_median_seconds']:.3f}s after interpreter start")
+    print(f"heavy modules loaded before window: {', '.join(heavy) or 'none'}")
+    for name, seconds in result["imports"]:
+        print(f"  {seconds:8.4f}s  {name}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""Synthetic договор-заявка generator for benchmarks.
+
+Produces three kinds of sources from the same field values:
+
+* ``docx`` - tables laid out the way ``parsers.read_data_from_docx`` expects;
+* ``text-pdf`` - PDFs with a text layer for ``parse_data_from_text``;
+* ``scan-pdf`` - image-only PDFs that go through OCR.
+
+Size is controlled by the number of extra pages (or paragraphs for docx) of
+terms and conditions appended after the fields.
+
+Usage: python benchmarks/corpus.py OUTPUT_DIR [--count 10] [--pages 3] [--kinds docx,text-pdf]
+"""
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+KINDS = ("docx", "text-pdf", "scan-pdf")
+
+CITIES = ["Москва", "Казань", "Тверь", "Самара", "Пермь", "Омск"]
+STREETS = ["ул. Ленина", "ул. Мира", "пр. Победы", "ул. Садовая", "ш. Энтузиастов"]
+NAMES = ["Иванов Иван Иванович", "Петров Пётр Петрович", "Сидоров Сидор Сидорович"]
+TRUCKS = ["Volvo", "Scania", "MAN", "КАМАЗ"]
+TERMS = (
+    "Перевозчик обязуется доставить вверенный ему груз в пункт назначения и выдать "
+    "его уполномоченному лицу, а Заказчик обязуется уплатить за перевозку груза "
+    "установленную плату в порядке и сроки, предусмотренные настоящей заявкой."
+)
+
+
+def make_contract_data(index, seed=0):
+    """Return deterministic field values for the index-th synthetic contract."""
+    rng = random.Random(seed * 100003 + index)
+    day = rng.randint(1, 25)
+    price = rng.randint(10, 300) * 1000
+    customer = rng.choice(NAMES)
+    return {
+        "number": f"№ {1000 + index} от {day} марта 2024 г.",
+        "load_address": f"{rng.choice(CITIES)}, {rng.choice(STREETS)}, д. {rng.randint(1, 99)}",
+        "unload_address": f"{rng.choice(CITIES)}, {rng.choice(STREETS)}, д. {rng.randint(1, 99)}",
+        "load_date": f"{day:02d}.03.2024",
+        "unload_date": f"{day + 2:02d}.03.2024",
+        "cost": f"{price:,}".replace(",", " ") + " руб.",
+        "truck": rng.choice(TRUCKS),
+        "trailer": f"АВ{rng.randint(1000, 9999)}77",
+        "driver": rng.choice(NAMES),
+        "customer": f"Индивидуальный предприниматель {customer}",
+        "legal_address": f"Юридический адрес: г. {rng.choice(CITIES)}, {rng.choice(STREETS)}, д. 1",
+        "inn": f"ИНН получателя {rng.randint(10**9, 10**10 - 1)}",
+        "ogrn": f"ОГРН {rng.randint(10**12, 10**13 - 1)}",
+    }
+
+
+def contract_lines(fields):
+    """Return the contract as text lines; columns are separated by tabs.
+
+    Text layers of real contracts come out of pdfplumber with the columns
+    joined by single spaces, so, as there, the unloading address starts with
+    a capitalized city right after the loading address's house number, the
+    truck make is one word and the document number carries no numeric date
+    (the parser takes the first two dates of the text as the route dates).
+    """
+    return [
+        f"Договор-заявка {fields['number']}",
+        "Адрес загрузки\tАдрес разгрузки",
+        f"{fields['load_address']}\t{fields['unload_address']}",
+        "Дата\tВремя\tДата\tВремя",
+        f"{fields['load_date']}\t10:00\t{fields['unload_date']}\t12:00",
+        f"Стоимость перевозки {fields['cost']}",
+        f"Марка, номер а/м, номер полуприцепа\t{fields['truck']}\t{fields['trailer']}",
+        f"ФИО водителя\t{fields['driver']}",
+        f"Заказчик: {fields['customer']}",
+        fields["legal_address"],
+        "Почтовый адрес: тот же",
+        fields["inn"],
+        fields["ogrn"],
+    ]
+
+
+def expected_data(fields):
+    """Return the data ``parsers`` should extract from a source with these fields."""
+    import parsers
+
+    data = {
+        "Данные заказчика": f"{fields['customer']}\n{fields['legal_address']}",
+        "ИНН получателя": fields["inn"],
+        "ОГРН получателя": fields["ogrn"],
+        "Номер документа": fields["number"],
+        "Адрес загрузки": fields["load_address"],
+        "Адрес разгрузки": fields["unload_address"],
+        "Марка автомобиля": fields["truck"],
+        "Номер полуприцепа": fields["trailer"],
+        "ФИО водителя": fields["driver"],
+        "Дата погрузки": fields["load_date"],
+        "Дата разгрузки": fields["unload_date"],
+        "Стоимость перевозки": fields["cost"],
+    }
+    data["Цена"] = parsers.extract_price(fields["cost"])
+    return data
+
+
+def terms_lines(count):
+    return [f"{i + 1}. {TERMS}" for i in range(count)]
+
+
+def write_docx(path, fields, extra_paragraphs=0):
+    from docx import Document
+
+    doc = Document()
+    doc.add_paragraph(f"Договор-заявка {fields['number']}")
+    route = doc.add_table(rows=12, cols=5)
+    route.cell(7, 0).text = "Адрес загрузки"
+    route.cell(7, 4).text = "Адрес разгрузки"
+    route.cell(8, 0).text = fields["load_address"]
+    route.cell(8, 4).text = fields["unload_address"]
+    route.cell(10, 0).text = fields["load_date"]
+    route.cell(10, 4).text = fields["unload_date"]
+    route.cell(11, 0).text = "Стоимость перевозки"
+    route.cell(11, 4).text = fields["cost"]
+    vehicle = doc.add_table(rows=2, cols=3)
+    vehicle.cell(0, 0).text = "Марка, номер а/м, номер полуприцепа"
+    vehicle.cell(0, 1).text = fields["truck"]
+    vehicle.cell(0, 2).text = fields["trailer"]
+    vehicle.cell(1, 0).text = "ФИО водителя"
+    vehicle.cell(1, 1).text = fields["driver"]
+    parties = doc.add_table(rows=1, cols=2)
+    parties.cell(0, 0).text = "Перевозчик: ООО Перевозчик"
+    parties.cell(0, 1).text = "\n".join([
+        f"Заказчик: {fields['customer']}",
+        fields["legal_address"],
+        "Почтовый адрес: тот же",
+        fields["inn"],
+        fields["ogrn"],
+    ])
+    for line in terms_lines(extra_paragraphs):
+        doc.add_paragraph(line)
+    doc.save(path)
+
+
+def _pdf_string(text, codes):
+    out = bytearray()
+    for ch in text:
+        if ch in "\\()":
+            out += b"\\" + ch.encode("ascii")
+        elif " " <= ch <= "~":
+            out += ch.encode("ascii")
+        else:
+            out.append(codes[ch])
+    return b"(" + bytes(out) + b")"
+
+
+def write_text_pdf(path, pages):
+    """Write a PDF with a text layer; pages is a list of lists of text lines.
+
+    Non-ASCII characters are mapped to codes 128-255 through the font's
+    ``/Differences`` encoding using ``uniXXXX`` glyph names, which is enough for
+    text extraction without embedding a font.
+    """
+    chars = sorted({ch for lines in pages for line in lines for ch in line if not " " <= ch <= "~"} - {"\t"})
+    if len(chars) > 128:
+        raise ValueError("too many distinct non-ASCII characters")
+    codes = {ch: 128 + i for i, ch in enumerate(chars)}
+    differences = " ".join(f"/uni{ord(ch):04X}" for ch in chars)
+
+    objects = []
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    descriptor = add(
+        b"<< /Type /FontDescriptor /FontName /SyntheticSans /Flags 32 /FontBBox [0 -200 1000 900] "
+        b"/ItalicAngle 0 /Ascent 900 /Descent -200 /CapHeight 700 /StemV 80 >>"
+    )
+    font = add(
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /SyntheticSans /FirstChar 32 /LastChar 255 "
+        b"/FontDescriptor %d 0 R " % descriptor +
+        b"/Widths [" + b" ".join([b"520"] * 224) + b"] "
+        b"/Encoding << /Type /Encoding /Differences [128 " + differences.encode("ascii") + b"] >> >>"
+    )
+    pages_id = len(objects) + 1
+    objects.append(None)
+    page_ids = []
+    for lines in pages:
+        ops = [b"BT /F1 9 Tf 11 TL 40 800 Td"]
+        for line in lines:
+            x = 0
+            for column in line.split("\t"):
+                text = _pdf_string(column, codes)
+                ops.append(b"%d 0 Td " % x + text + b" Tj %d 0 Td" % -x)
+                x += max(180, len(column) * 5 + 20)
+            ops.append(b"T*")
+        ops.append(b"ET")
+        stream = b"\n".join(ops)
+        content = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] " % pages_id
+            + b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (font, content)
+        ))
+    kids = b" ".join(b"%d 0 R" % i for i in page_ids)
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(page_ids)
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, catalog, xref
+    )
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def _load_font(size):
+    from PIL import ImageFont
+
+    for name in ("DejaVuSans.ttf", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", "arial.ttf"):
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default()
+
+
+def write_scan_pdf(path, pages, dpi=150, skew=0.0):
+    """Write an image-only PDF, one rendered A4 bitmap per page, rotated by skew degrees."""
+    from PIL import Image, ImageDraw
+
+    width, height = int(8.27 * dpi), int(11.69 * dpi)
+    font = _load_font(int(dpi / 7))
+    step = int(dpi / 5)
+    images = []
+    for lines in pages:
+        img = Image.new("L", (width, height), 255)
+        draw = ImageDraw.Draw(img)
+        y = int(dpi / 2)
+        for line in lines:
+            draw.text((int(dpi / 2), y), line.replace("\t", "    "), fill=0, font=font)
+            y += step
+            if y > height - dpi:
+                break
+        if skew:
+            img = img.rotate(skew, resample=Image.BICUBIC, fillcolor=255)
+        images.append(img)
+    images[0].save(path, save_all=True, append_images=images[1:], resolution=dpi)
+
+
+def paginate(lines, per_page=60):
+    return [lines[i:i + per_page] for i in range(0, len(lines), per_page)] or [[]]
+
+
+def write_source(path, kind, fields, pages=1, skew=0.0):
+    """Write one synthetic source of the given kind with ``pages - 1`` pages of terms.
+
+    ``skew`` rotates the pages of scanned PDFs by that many degrees.
+    """
+    extra = terms_lines(max(0, pages - 1) * 40)
+    if kind == "docx":
+        write_docx(path, fields, extra_paragraphs=len(extra))
+    elif kind == "text-pdf":
+        write_text_pdf(path, [contract_lines(fields)] + paginate(extra, 40)[: pages - 1])
+    elif kind == "scan-pdf":
+        write_scan_pdf(path, [contract_lines(fields)] + paginate(extra, 40)[: pages - 1], skew=skew)
+    else:
+        raise ValueError(f"Unknown kind: {kind}")
+
+
+def generate_corpus(directory, count=10, pages=1, kinds=KINDS, seed=0):
+    """Write count sources of every kind into directory and return their paths by kind."""
+    os.makedirs(directory, exist_ok=True)
+    paths = {kind: [] for kind in kinds}
+    for kind in kinds:
+        ext = ".docx" if kind == "docx" else ".pdf"
+        for i in range(count):
+            path = os.path.join(directory, f"{kind}_{i:04d}{ext}")
+            write_source(path, kind, make_contract_data(i, seed), pages)
+            paths[kind].append(path)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("output")
+    parser.add_argument("--count", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=1)
+    parser.add_argument("--kinds", default=",".join(KINDS))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    paths = generate_corpus(args.output, args.count, args.pages, args.kinds.split(","), args.seed)
+    for kind, files in paths.items():
+        print(f"{kind}: {len(files)} file(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,198 @@
+import re
+import threading
+from bisect import bisect_right
+from io import BytesIO
+
+from excel_utils import PLACEHOLDER_RE
+from tracing import span
+
+# WordprocessingML names; python-docx itself is imported only when a template is compiled
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_P = _W + "p"
+_T = _W + "t"
+_XML_SPACE = "{http://www.w3.org/XML/1998/namespace}space"
+_BREAKS = {"\n": _W + "br", "\t": _W + "tab"}
+_BREAK_RE = re.compile(r"(\n|\t)")
+_STORY_RELTYPES = ("/header", "/footer")
+
+
+def _story_roots(doc):
+    """Yield the XML roots of the body and of every header and footer part."""
+    yield doc.element
+    seen = set()
+    for rel in doc.part.rels.values():
+        if rel.is_external or not rel.reltype.endswith(_STORY_RELTYPES):
+            continue
+        part = rel.target_part
+        if part.partname not in seen:
+            seen.add(part.partname)
+            yield part.element
+
+
+def _owner_paragraph(element):
+    parent = element.getparent()
+    while parent is not None and parent.tag != _P:
+        parent = parent.getparent()
+    return parent
+
+
+def _placeholder_paragraphs(doc):
+    """Return the text elements of every paragraph that holds a placeholder.
+
+    Paragraphs are found anywhere in the body, headers and footers, including
+    nested tables and text boxes. Each list only has the ``w:t`` elements of
+    its own paragraph, not of paragraphs nested inside it.
+    """
+    found = []
+    for root in _story_roots(doc):
+        for p in root.iter(_P):
+            if "{{" not in "".join(p.itertext()):
+                continue
+            texts = [t for t in p.iter(_T) if _owner_paragraph(t) is p]
+            if PLACEHOLDER_RE.search("".join(t.text or "" for t in texts)):
+                found.append(texts)
+    return found
+
+
+def _set_text(t, text, undo):
+    """Set the text of a ``w:t``, turning newlines and tabs into ``w:br``/``w:tab``."""
+    if undo is not None:
+        undo.append(("text", t, t.text, t.get(_XML_SPACE)))
+    parts = _BREAK_RE.split(text)
+    t.text = parts[0]
+    t.set(_XML_SPACE, "preserve")
+    anchor = t
+    for part in parts[1:]:
+        if not part:
+            continue
+        if part in _BREAKS:
+            element = t.makeelement(_BREAKS[part], {})
+        else:
+            element = t.makeelement(_T, {_XML_SPACE: "preserve"})
+            element.text = part
+        anchor.addnext(element)
+        anchor = element
+        if undo is not None:
+            undo.append(("added", element, None, None))
+
+
+def _undo(changes):
+    for kind, element, text, space in reversed(changes):
+        if kind == "added":
+            element.getparent().remove(element)
+            continue
+        element.text = text
+        if space is None:
+            element.attrib.pop(_XML_SPACE, None)
+        else:
+            element.set(_XML_SPACE, space)
+
+
+def _substitute_paragraph(texts, values, undo=None):
+    """Replace the placeholders of one paragraph in a single pass.
+
+    Word often splits ``{{Key}}`` over several runs, so the paragraph text is
+    matched as a whole. Each value goes into the run where its placeholder
+    starts, keeping that run's formatting, and the rest of the placeholder is
+    cut out of the following runs. Unknown keys are left untouched.
+    """
+    chunks = [t.text or "" for t in texts]
+    full = "".join(chunks)
+    matches = [m for m in PLACEHOLDER_RE.finditer(full) if m.group(1) in values]
+    if not matches:
+        return False
+    starts = []
+    pos = 0
+    for chunk in chunks:
+        starts.append(pos)
+        pos += len(chunk)
+    pieces = [[] for _ in chunks]
+
+    def copy(a, b):
+        i = bisect_right(starts, a) - 1
+        while a < b:
+            end = min(b, starts[i] + len(chunks[i]))
+            pieces[i].append(full[a:end])
+            a = end
+            i += 1
+
+    cursor = 0
+    for match in matches:
+        copy(cursor, match.start())
+        pieces[bisect_right(starts, match.start()) - 1].append(values[match.group(1)])
+        cursor = match.end()
+    copy(cursor, len(full))
+    for t, chunk, piece in zip(texts, chunks, pieces):
+        text = "".join(piece)
+        if text != chunk:
+            _set_text(t, text, undo)
+    return True
+
+
 def replace_placeholders(doc, data):
-    """Replace placeholders in doc with values from data."""
-    for para in doc.paragraphs:
-        for run in para.runs:
-            for key, value in data.items():
-                placeholder = f"{{{{{key}}}}}"
-                if placeholder in run.text:
-                    run.text = run.text.replace(placeholder, value)
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                replace_placeholders(cell, data)
+    """Replace placeholders in doc with values from data.
+
+    Covers the body, headers, footers, nested tables and text boxes, including
+    placeholders that Word split across several runs.
+    """
+    values = {key: str(value) for key, value in data.items()}
+    for texts in _placeholder_paragraphs(doc):
+        _substitute_paragraph(texts, values)
+
+
+def create_document(template_bytes, ext, data, output_path):
+    if ext != ".docx":
+        raise ValueError("Only .docx templates are supported")
+    CompiledDocument(template_bytes).render(data, output_path)
+
+
+class CompiledDocument:
+    """Loaded .docx template with the text runs of every placeholder paragraph.
+
+    The document is parsed and scanned once; each render rewrites only the
+    indexed paragraphs, saves, and restores their original text.
+    """
+
+    ext = ".docx"
+
+    def __init__(self, template_bytes, path=None):
+        self.template_bytes = template_bytes
+        self.path = path
+        self._lock = threading.Lock()
+        from docx import Document
+
+        with span("template.compile", backend="docx"):
+            self._doc = Document(BytesIO(template_bytes))
+            self.paragraphs = _placeholder_paragraphs(self._doc)
+
+    @property
+    def placeholders(self):
+        """Set of placeholder keys used anywhere in the template."""
+        return {
+            key
+            for texts in self.paragraphs
+            for key in PLACEHOLDER_RE.findall("".join(t.text or "" for t in texts))
+        }
+
+    def render(self, data, output_path):
+        """Fill the template with data and save it to output_path."""
+        values = {key: str(value) for key, value in data.items()}
+        with self._lock:
+            undo = []
+            try:
+                with span("render.fill", paragraphs=len(self.paragraphs)):
+                    for texts in self.paragraphs:
+                        _substitute_paragraph(texts, values, undo)
+                with span("render.save"):
+                    self._doc.save(output_path)
+            finally:
+                _undo(undo)
+
+    def __getstate__(self):
+        return {"template_bytes": self.template_bytes, "path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state["template_bytes"], state["path"])
 
 
 def format_preview(data):
@@ -0,0 +1,404 @@
+"""Declarative field layouts for .docx contracts.
+
+A layout describes where each field lives in a document, so supporting a new
+customer's template means adding a layout instead of new parsing code. The
+document is read once into a ``DocumentIndex`` (paragraph texts and the text
+of every table cell by grid position) and all fields are resolved against it.
+``read_index`` builds the index by streaming ``word/document.xml`` and stops
+as soon as the rest of the document can no longer change the fields.
+
+Layout format (plain data, so layouts can also be loaded from JSON)::
+
+    {
+        "name": "default",
+        "detect": {"min_tables": 1, "min_rows": {"0": 12}, "anchors": ["..."]},
+        "fields": {
+            "Field": {"table": 0, "cell": [8, 0]},                   # absolute cell
+            "Field": {"anchor": "Адрес загрузки", "offset": [1, 0]},  # relative to a label cell
+            "Field": {"paragraph": "Договор-заявка", "from": "№"},    # first paragraph with prefix
+            ...
+        },
+    }
+
+A field may post-process the text it found with ``"between": [start, end]``,
+``"pattern": regex`` (whole match) or ``"from": marker``; otherwise the text
+is stripped. Layouts are tried in order and the first whose ``detect`` rules
+pass is used; the first layout is the fallback.
+"""
+import json
+import posixpath
+import re
+import zipfile
+from xml.etree import ElementTree
+
+DEFAULT_LAYOUT = {
+    "name": "default",
+    "detect": {"min_tables": 1, "min_rows": {"0": 12}},
+    "fields": {
+        "Номер документа": {"paragraph": "Договор-заявка", "from": "№"},
+        "Адрес загрузки": {"table": 0, "cell": [8, 0]},
+        "Адрес разгрузки": {"table": 0, "cell": [8, 4]},
+        "Дата погрузки": {"table": 0, "cell": [10, 0]},
+        "Дата разгрузки": {"table": 0, "cell": [10, 4]},
+        "Стоимость перевозки": {"table": 0, "cell": [11, 4]},
+        "Марка автомобиля": {"table": 1, "cell": [0, 1]},
+        "Номер полуприцепа": {"table": 1, "cell": [0, 2]},
+        "ФИО водителя": {"table": 1, "cell": [1, 1]},
+        "Данные заказчика": {"table": 2, "cell": [0, 1], "between": ["Заказчик:", "Почтовый адрес"]},
+        "ИНН получателя": {"table": 2, "cell": [0, 1], "pattern": r"ИНН получателя \d+"},
+        "ОГРН получателя": {"table": 2, "cell": [0, 1], "pattern": r"ОГРН \d+"},
+    },
+}
+
+# Contracts where values sit next to (or under) their label cells, wherever the
+# rows happen to be.
+LABELLED_LAYOUT = {
+    "name": "labelled",
+    "detect": {"anchors": ["Адрес загрузки", "Адрес разгрузки", "ФИО водителя"]},
+    "fields": {
+        "Номер документа": {"paragraph": "Договор-заявка", "from": "№"},
+        "Адрес загрузки": {"anchor": "Адрес загрузки", "offset": [1, 0]},
+        "Адрес разгрузки": {"anchor": "Адрес разгрузки", "offset": [1, 0]},
+        "Дата погрузки": {"anchor": "Дата погрузки", "offset": [0, 1]},
+        "Дата разгрузки": {"anchor": "Дата разгрузки", "offset": [0, 1]},
+        "Стоимость перевозки": {"anchor": "Стоимость перевозки", "offset": [0, 1]},
+        "Марка автомобиля": {"anchor": "Марка", "offset": [0, 1]},
+        "Номер полуприцепа": {"anchor": "Марка", "offset": [0, 2]},
+        "ФИО водителя": {"anchor": "ФИО водителя", "offset": [0, 1]},
+        "Данные заказчика": {"anchor": "Заказчик:", "between": ["Заказчик:", "Почтовый адрес"]},
+        "ИНН получателя": {"anchor": "Заказчик:", "pattern": r"ИНН получателя \d+"},
+        "ОГРН получателя": {"anchor": "Заказчик:", "pattern": r"ОГРН \d+"},
+    },
+}
+
+LAYOUTS = [DEFAULT_LAYOUT, LABELLED_LAYOUT]
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_BODY = _W + "body"
+_P = _W + "p"
+_R = _W + "r"
+_HYPERLINK = _W + "hyperlink"
+_TBL = _W + "tbl"
+_TBL_GRID = _W + "tblGrid"
+_GRID_COL = _W + "gridCol"
+_TR = _W + "tr"
+_TC = _W + "tc"
+_TC_PR = _W + "tcPr"
+_GRID_SPAN = _W + "gridSpan"
+_V_MERGE = _W + "vMerge"
+_VAL = _W + "val"
+_TYPE = _W + "type"
+_T = _W + "t"
+# Run children other than w:t and their text, as python-docx reads them
+_RUN_TEXT = {
+    _W + "tab": "\t",
+    _W + "ptab": "\t",
+    _W + "cr": "\n",
+    _W + "noBreakHyphen": "-",
+}
+_BR = _W + "br"
+_RELS = "_rels/.rels"
+_RELS_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+_OFFICE_DOCUMENT = (
+    "http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"
+)
+
+
+class DocumentIndex:
+    """Paragraph texts and table cell texts of a document, read once.
+
+    Each table is stored as a flat row-major grid of cell texts, the same
+    layout python-docx uses for ``Table.cell`` (spanned cells repeat).
+    """
+
+    def __init__(self, paragraphs, tables):
+        self.paragraphs = paragraphs
+        # [(column_count, [cell text, ...]), ...]
+        self.tables = tables
+        self._labels = None
+
+    @classmethod
+    def from_document(cls, doc):
+        """Build the index from a python-docx ``Document``."""
+        tables = []
+        for table in doc.tables:
+            texts = {}
+            grid = []
+            # Table.cell() rebuilds this grid on every call; build it once
+            for cell in table._cells:
+                key = id(cell._tc)
+                if key not in texts:
+                    texts[key] = cell.text
+                grid.append(texts[key])
+            tables.append((len(table.columns), grid))
+        return cls([p.text for p in doc.paragraphs], tables)
+
+    def add_table(self, column_count, grid):
+        self.tables.append((column_count, grid))
+        self._labels = None
+
+    def row_count(self, table):
+        column_count, grid = self.tables[table]
+        return len(grid) // column_count if column_count else 0
+
+    def cell(self, table, row, col):
+        """Return the text at (row, col) of a table, or None outside the grid."""
+        if table >= len(self.tables):
+            return None
+        column_count, grid = self.tables[table]
+        idx = col + row * column_count
+        if row < 0 or col < 0 or idx >= len(grid):
+            return None
+        return grid[idx]
+
+    def find_label(self, anchor, table=None):
+        """Return (table, row, col) of the first cell whose text starts with anchor."""
+        if self._labels is None:
+            self._labels = []
+            for t, (column_count, grid) in enumerate(self.tables):
+                seen = set()
+                for idx, text in enumerate(grid):
+                    stripped = text.strip()
+                    if stripped and (stripped, t) not in seen:
+                        seen.add((stripped, t))
+                        self._labels.append((stripped, t, idx // column_count, idx % column_count))
+        for text, t, row, col in self._labels:
+            if (table is None or t == table) and text.startswith(anchor):
+                return t, row, col
+        return None
+
+    def paragraph(self, prefix):
+        """Return the first paragraph (stripped) that starts with prefix."""
+        for text in self.paragraphs:
+            text = text.strip()
+            if text.startswith(prefix):
+                return text
+        return None
+
+
+def _postprocess(text, spec):
+    if "between" in spec:
+        start_label, end_label = spec["between"]
+        start = text.find(start_label)
+        end = text.find(end_label)
+        if start != -1 and end != -1 and end > start:
+            return text[start + len(start_label):end].strip()
+        return ""
+    if "pattern" in spec:
+        match = re.search(spec["pattern"], text)
+        return match.group(0).strip() if match else ""
+    if "from" in spec:
+        pos = text.find(spec["from"])
+        return text[pos:].strip() if pos != -1 else ""
+    return text.strip()
+
+
+def resolve_field(index, spec):
+    """Return the value of one field spec, or "" if it cannot be found."""
+    if "paragraph" in spec:
+        text = index.paragraph(spec["paragraph"])
+    elif "anchor" in spec:
+        found = index.find_label(spec["anchor"], spec.get("table"))
+        if found is None:
+            return ""
+        table, row, col = found
+        d_row, d_col = spec.get("offset", (0, 0))
+        text = index.cell(table, row + d_row, col + d_col)
+    else:
+        row, col = spec["cell"]
+        text = index.cell(spec["table"], row, col)
+    if text is None:
+        return ""
+    return _postprocess(text, spec)
+
+
+def matches_layout(index, layout):
+    detect = layout.get("detect", {})
+    if len(index.tables) < detect.get("min_tables", 0):
+        return False
+    for table, rows in detect.get("min_rows", {}).items():
+        table = int(table)
+        if table >= len(index.tables) or index.row_count(table) < rows:
+            return False
+    return all(index.find_label(anchor) for anchor in detect.get("anchors", ()))
+
+
+def _layout_status(index, layout):
+    """Like ``matches_layout`` for a partly read document: True, False or None (not yet known)."""
+    detect = layout.get("detect", {})
+    known = len(index.tables) >= detect.get("min_tables", 0)
+    for table, rows in detect.get("min_rows", {}).items():
+        table = int(table)
+        if table >= len(index.tables):
+            known = False
+        elif index.row_count(table) < rows:
+            return False
+    if known and all(index.find_label(anchor) for anchor in detect.get("anchors", ())):
+        return True
+    return None
+
+
+def pending_paragraphs(index, layout=None, layouts=None):
+    """Tell whether reading more of the document could change its fields.
+
+    ``index`` holds the paragraphs and tables read so far. Returns None while
+    more tables could still change the detected layout or a field, otherwise
+    the set of paragraph prefixes that have not been found yet (empty once
+    every field is settled).
+    """
+    if layout is None:
+        layouts = layouts or LAYOUTS
+        for candidate in layouts:
+            status = _layout_status(index, candidate)
+            if status is None:
+                return None
+            if status:
+                layout = candidate
+                break
+        else:
+            layout = layouts[0]
+    missing = set()
+    for spec in layout["fields"].values():
+        if "paragraph" in spec:
+            if index.paragraph(spec["paragraph"]) is None:
+                missing.add(spec["paragraph"])
+        elif "anchor" in spec:
+            if index.find_label(spec["anchor"], spec.get("table")) is None:
+                return None
+        elif spec["table"] >= len(index.tables):
+            return None
+    return missing
+
+
+def detect_layout(index, layouts=None):
+    """Return the first layout whose detection rules match, else the first one."""
+    layouts = layouts or LAYOUTS
+    for layout in layouts:
+        if matches_layout(index, layout):
+            return layout
+    return layouts[0]
+
+
+def extract_fields(index, layout=None):
+    """Resolve every field of a layout (auto-detected by default) against index."""
+    layout = layout or detect_layout(index)
+    return {name: resolve_field(index, spec) for name, spec in layout["fields"].items()}
+
+
+def register_layout(layout, first=False):
+    """Add a layout; with ``first`` it is tried right after the default layout."""
+    if first:
+        LAYOUTS.insert(1, layout)
+    else:
+        LAYOUTS.append(layout)
+
+
+def load_layouts(path):
+    """Register the layouts listed in a JSON file (a list of layout objects)."""
+    with open(path, encoding="utf-8") as f:
+        layouts = json.load(f)
+    for layout in layouts:
+        register_layout(layout)
+    return layouts
+
+
+def _run_text(run, parts):
+    for child in run:
+        if child.tag == _T:
+            parts.append(child.text or "")
+        elif child.tag == _BR:
+            if child.get(_TYPE, "textWrapping") == "textWrapping":
+                parts.append("\n")
+        elif child.tag in _RUN_TEXT:
+            parts.append(_RUN_TEXT[child.tag])
+
+
+def _paragraph_text(p):
+    # Runs directly in the paragraph or a hyperlink, like python-docx's Paragraph.text
+    parts = []
+    for child in p:
+        if child.tag == _R:
+            _run_text(child, parts)
+        elif child.tag == _HYPERLINK:
+            for run in child:
+                if run.tag == _R:
+                    _run_text(run, parts)
+    return "".join(parts)
+
+
+def _table_grid(tbl):
+    """Return (column_count, grid) of a w:tbl element, spanned cells repeated."""
+    grid_element = tbl.find(_TBL_GRID)
+    column_count = 0 if grid_element is None else len(grid_element.findall(_GRID_COL))
+    grid = []
+    for tr in tbl.iterfind(_TR):
+        for tc in tr.iterfind(_TC):
+            span, merge = 1, None
+            tc_pr = tc.find(_TC_PR)
+            if tc_pr is not None:
+                grid_span = tc_pr.find(_GRID_SPAN)
+                if grid_span is not None:
+                    span = int(grid_span.get(_VAL))
+                v_merge = tc_pr.find(_V_MERGE)
+                if v_merge is not None:
+                    merge = v_merge.get(_VAL, "continue")
+            for i in range(span):
+                if merge == "continue" and column_count and len(grid) >= column_count:
+                    # Vertically merged cells show the text of the cell above
+                    grid.append(grid[-column_count])
+                elif i > 0:
+                    grid.append(grid[-1])
+                else:
+                    grid.append("\n".join(_paragraph_text(p) for p in tc.iterfind(_P)))
+    return column_count, grid
+
+
+def _main_part(package):
+    """Return the name of the main document part of an opened .docx package."""
+    try:
+        rels = ElementTree.fromstring(package.read(_RELS))
+    except KeyError:
+        return "word/document.xml"
+    for rel in rels.iter(_RELS_NS + "Relationship"):
+        if rel.get("Type") == _OFFICE_DOCUMENT:
+            return posixpath.normpath(rel.get("Target").lstrip("/"))
+    return "word/document.xml"
+
+
+def read_index(path, layout=None, layouts=None):
+    """Build a ``DocumentIndex`` of a .docx file without loading the whole document.
+
+    Top-level paragraphs and tables of ``word/document.xml`` are parsed one at
+    a time and dropped once indexed. Reading stops as soon as the fields of
+    ``layout`` (or of the layout that will be detected) are settled; for the
+    default layout that is after the third table. The result gives the same
+    fields as ``DocumentIndex.from_document``.
+    """
+    index = DocumentIndex([], [])
+    # Paragraph prefixes still missing once the tables are settled
+    waiting = None
+    with zipfile.ZipFile(path) as package, package.open(_main_part(package)) as xml:
+        depth = 0
+        body = None
+        for event, element in ElementTree.iterparse(xml, events=("start", "end")):
+            if event == "start":
+                depth += 1
+                if depth == 2 and element.tag == _BODY:
+                    body = element
+                continue
+            depth -= 1
+            if depth != 2 or body is None:
+                continue
+            if element.tag == _P:
+                text = _paragraph_text(element)
+                index.paragraphs.append(text)
+                if waiting and any(text.strip().startswith(prefix) for prefix in waiting):
+                    waiting = pending_paragraphs(index, layout, layouts)
+            elif element.tag == _TBL:
+                index.add_table(*_table_grid(element))
+                waiting = pending_paragraphs(index, layout, layouts)
+            # The body keeps only the element being parsed
+            body.clear()
+            if waiting is not None and not waiting:
+                break
+    return index
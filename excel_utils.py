@@ -1,23 +1,297 @@
+import html
+import re
+import struct
+import threading
+import zipfile
+import zlib
+from collections import namedtuple
 from io import BytesIO
-from openpyxl import load_workbook
+
+from tracing import span
+
+PLACEHOLDER_RE = re.compile(r"\{\{([^{}]*)\}\}")
+
+RENDER_BACKENDS = ("openpyxl", "stream")
+
+# Raw XML patterns used by the streaming backend
+_STRING_ITEM_RE = re.compile(rb"<si>.*?</si>|<si/>", re.S)
+_INLINE_STRING_RE = re.compile(rb"<is>.*?</is>", re.S)
+_PHONETIC_RE = re.compile(rb"<rPh\b.*?</rPh>", re.S)
+_TEXT_RE = re.compile(rb"<t(?:\s[^>]*)?>(.*?)</t>", re.S)
+_HIDDEN_SHEET_RE = re.compile(rb'(<sheet\b[^>]*?\sstate=")(?:hidden|veryHidden)(")')
+
+# Zip records written by the streaming backend (PKWARE APPNOTE 4.3.7, 4.3.12, 4.3.16)
+_LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+_CENTRAL_HEADER = struct.Struct("<4s6H3L5H2L")
+_END_RECORD = struct.Struct("<4s4H2LH")
+_UTF8_FLAG = 0x800
+
+PlaceholderCell = namedtuple("PlaceholderCell", "sheet coordinate text keys")
+# A zip member ready to be written: data is already compressed with method
+_ZipEntry = namedtuple("_ZipEntry", "info method crc size data")
+
+
+def compile_substitution(data):
+    """Return a function that replaces all ``{{Key}}`` tokens of a string in one pass.
+
+    Placeholders whose key is not in data are left untouched.
+    """
+    values = {key: str(value) for key, value in data.items()}
+
+    def substitute_match(match):
+        return values.get(match.group(1), match.group(0))
+
+    def substitute(text):
+        if "{{" not in text:
+            return text
+        return PLACEHOLDER_RE.sub(substitute_match, text)
+
+    return substitute
 
 
 def replace_placeholders(wb, data):
+    substitute = compile_substitution(data)
     for ws in wb.worksheets:
         for row in ws.iter_rows():
             for cell in row:
-                if isinstance(cell.value, str):
-                    for key, value in data.items():
-                        placeholder = f"{{{{{key}}}}}"
-                        if placeholder in cell.value:
-                            cell.value = cell.value.replace(placeholder, value)
+                value = cell.value
+                if isinstance(value, str) and "{{" in value:
+                    new_value = substitute(value)
+                    if new_value != value:
+                        cell.value = new_value
 
 
-def create_document(template_bytes, ext, data, output_path):
+def create_document(template_bytes, ext, data, output_path, backend="openpyxl"):
     if ext != ".xlsx":
         raise ValueError("Only .xlsx templates are supported")
-    wb = load_workbook(BytesIO(template_bytes))
-    replace_placeholders(wb, data)
-    for ws in wb.worksheets:
-        ws.sheet_state = "visible"
-    wb.save(output_path)
+    compile_workbook(template_bytes, backend=backend).render(data, output_path)
+
+
+def compile_workbook(template_bytes, path=None, backend="openpyxl"):
+    """Compile an .xlsx template with the given rendering backend."""
+    if backend == "openpyxl":
+        with span("template.compile", backend=backend):
+            return CompiledWorkbook(template_bytes, path)
+    if backend == "stream":
+        with span("template.compile", backend=backend):
+            return StreamingWorkbook(template_bytes, path)
+    raise ValueError(f"Unknown rendering backend: {backend}")
+
+
+class CompiledWorkbook:
+    """Loaded .xlsx template with the coordinates of every placeholder cell.
+
+    The workbook is parsed and scanned once; each render only rewrites the
+    indexed cells, saves, and restores their original text.
+    """
+
+    ext = ".xlsx"
+
+    def __init__(self, template_bytes, path=None):
+        self.template_bytes = template_bytes
+        self.path = path
+        self._lock = threading.Lock()
+        # Imported here so that the streaming backend and startup don't need openpyxl
+        from openpyxl import load_workbook
+
+        wb = load_workbook(BytesIO(template_bytes))
+        self.cells = []
+        self._cell_objects = []
+        for ws in wb.worksheets:
+            ws.sheet_state = "visible"
+            for row in ws.iter_rows():
+                for cell in row:
+                    value = cell.value
+                    if not (isinstance(value, str) and "{{" in value):
+                        continue
+                    keys = tuple(PLACEHOLDER_RE.findall(value))
+                    if keys:
+                        self.cells.append(PlaceholderCell(ws.title, cell.coordinate, value, keys))
+                        self._cell_objects.append(cell)
+        self._wb = wb
+
+    @property
+    def placeholders(self):
+        """Set of placeholder keys used anywhere in the template."""
+        return {key for cell in self.cells for key in cell.keys}
+
+    def render(self, data, output_path):
+        """Fill the template with data and save it to output_path."""
+        substitute = compile_substitution(data)
+        with self._lock:
+            touched = []
+            try:
+                with span("render.fill", cells=len(self.cells)):
+                    for plan, cell in zip(self.cells, self._cell_objects):
+                        new_value = substitute(plan.text)
+                        if new_value != plan.text:
+                            cell.value = new_value
+                            touched.append((cell, plan.text))
+                with span("render.save"):
+                    self._wb.save(output_path)
+            finally:
+                for cell, text in touched:
+                    cell.value = text
+
+    def __getstate__(self):
+        return {"template_bytes": self.template_bytes, "path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state["template_bytes"], state["path"])
+
+
+class StreamingWorkbook:
+    """.xlsx template rendered by patching its XML parts directly.
+
+    Only string items containing placeholders (in ``sharedStrings.xml`` and
+    inline strings of worksheets) are rewritten; every other zip member is
+    copied unchanged, so formatting openpyxl does not model is preserved.
+    Unchanged members are copied as their compressed bytes and only the
+    parts with placeholders are compressed again on each render.
+    Hidden sheets are made visible to match the openpyxl backend.
+    """
+
+    ext = ".xlsx"
+
+    def __init__(self, template_bytes, path=None):
+        self.template_bytes = template_bytes
+        self.path = path
+        # (ZipInfo, parts) for members with placeholders, else a _ZipEntry
+        self._members = []
+        keys = set()
+        with zipfile.ZipFile(BytesIO(template_bytes)) as zf:
+            for info in zf.infolist():
+                name = info.filename
+                content = None
+                if name.endswith("sharedStrings.xml"):
+                    content = _split_string_items(zf.read(info), _STRING_ITEM_RE)
+                elif name.startswith("xl/worksheets/") and name.endswith(".xml"):
+                    content = _split_string_items(zf.read(info), _INLINE_STRING_RE)
+                elif name == "xl/workbook.xml":
+                    original = zf.read(info)
+                    visible = _HIDDEN_SHEET_RE.sub(rb"\1visible\2", original)
+                    if visible != original:
+                        self._members.append(_deflated_entry(info, visible))
+                        continue
+                if isinstance(content, list):
+                    for part in content:
+                        if isinstance(part, tuple):
+                            keys.update(PLACEHOLDER_RE.findall(part[1]))
+                    self._members.append((info, content))
+                else:
+                    self._members.append(_raw_entry(template_bytes, info))
+        self._placeholders = keys
+
+    @property
+    def placeholders(self):
+        """Set of placeholder keys used anywhere in the template."""
+        return set(self._placeholders)
+
+    def render(self, data, output_path):
+        """Fill the template with data and write it to output_path."""
+        substitute = compile_substitution(data)
+
+        def entries():
+            for member in self._members:
+                if isinstance(member, _ZipEntry):
+                    yield member
+                    continue
+                info, parts = member
+                content = b"".join(
+                    _render_string_item(part, substitute) if isinstance(part, tuple) else part
+                    for part in parts
+                )
+                yield _deflated_entry(info, content)
+
+        with span("render.write"), open(output_path, "wb") as f:
+            _write_zip(f, entries())
+
+    def __getstate__(self):
+        return {"template_bytes": self.template_bytes, "path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state["template_bytes"], state["path"])
+
+
+def _raw_entry(package, info):
+    """Return a member of a zip package in bytes as it is stored, without decompressing it."""
+    fields = _LOCAL_HEADER.unpack_from(package, info.header_offset)
+    start = info.header_offset + _LOCAL_HEADER.size + fields[9] + fields[10]
+    data = memoryview(package)[start:start + info.compress_size]
+    return _ZipEntry(info, info.compress_type, info.CRC, info.file_size, data)
+
+
+def _deflated_entry(info, content):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+    data = compressor.compress(content) + compressor.flush()
+    return _ZipEntry(info, zipfile.ZIP_DEFLATED, zlib.crc32(content), len(content), data)
+
+
+def _write_zip(f, entries):
+    """Write a zip archive of already compressed ``_ZipEntry`` members to a binary file."""
+    central = []
+    offset = 0
+    for entry in entries:
+        info = entry.info
+        name = info.filename.encode("utf-8")
+        flags = _UTF8_FLAG if not info.filename.isascii() else 0
+        year, month, day, hour, minute, second = info.date_time
+        dos_time = hour << 11 | minute << 5 | second // 2
+        dos_date = (year - 1980) << 9 | month << 5 | day
+        version = 20
+        header = _LOCAL_HEADER.pack(
+            b"PK\x03\x04", version, flags, entry.method, dos_time, dos_date,
+            entry.crc, len(entry.data), entry.size, len(name), 0,
+        )
+        f.write(header)
+        f.write(name)
+        f.write(entry.data)
+        central.append(_CENTRAL_HEADER.pack(
+            b"PK\x01\x02", info.create_system << 8 | version, version, flags, entry.method,
+            dos_time, dos_date, entry.crc, len(entry.data), entry.size, len(name), 0, 0, 0,
+            info.internal_attr, info.external_attr, offset,
+        ) + name)
+        offset += len(header) + len(name) + len(entry.data)
+    directory = b"".join(central)
+    f.write(directory)
+    f.write(_END_RECORD.pack(b"PK\x05\x06", 0, 0, len(central), len(central), len(directory), offset, 0))
+
+
+def _string_item_text(item):
+    """Return the plain text of an ``<si>``/``<is>`` element, ignoring phonetic runs."""
+    item = _PHONETIC_RE.sub(b"", item)
+    return "".join(html.unescape(t.decode("utf-8")) for t in _TEXT_RE.findall(item))
+
+
+def _split_string_items(content, pattern):
+    """Split XML into literal byte chunks and ``(tag, text)`` items with placeholders.
+
+    Returns the content unchanged when it holds no placeholders at all.
+    """
+    if b"{{" not in content:
+        return content
+    parts = []
+    pos = 0
+    for match in pattern.finditer(content):
+        item = match.group(0)
+        if b"{{" not in item:
+            continue
+        text = _string_item_text(item)
+        if not PLACEHOLDER_RE.search(text):
+            continue
+        parts.append(content[pos:match.start()])
+        parts.append((item[1:3], text, item))
+        pos = match.end()
+    if not parts:
+        return content
+    parts.append(content[pos:])
+    return parts
+
+
+def _render_string_item(item, substitute):
+    tag, text, original = item
+    new_text = substitute(text)
+    if new_text == text:
+        return original
+    value = html.escape(new_text, quote=False).encode("utf-8")
+    return b"<" + tag + b'><t xml:space="preserve">' + value + b"</t></" + tag + b">"
@@ -1,11 +1,17 @@
-from PyQt5 import QtWidgets, QtGui
+from PyQt5 import QtCore, QtWidgets, QtGui
 from PyQt5.QtWidgets import QFileDialog, QMessageBox
 from PyQt5.QtCore import QSettings, Qt
 import os
+import threading
 
-from parsers import read_data_from_file
+import tracing
+from parsers import ExtractionCancelled
+from source_cache import read_data_cached
 from doc_utils import format_preview
-from excel_utils import create_document as generate_document
+from templates import DEFAULT_NAME_PATTERN, TEMPLATE_EXTENSIONS, compile_template, output_names, render_all
+
+TEMPLATE_FILTER = "Templates (*.xlsx *.docx)"
+OUTPUT_FILTERS = {".xlsx": "Excel Workbook (*.xlsx)", ".docx": "Word Document (*.docx)"}
 
 
 class AboutWidget(QtWidgets.QWidget):
@@ -43,17 +49,57 @@ class AboutWidget(QtWidgets.QWidget):
         self.setLayout(layout)
 
 
+class TaskSignals(QtCore.QObject):
+    progress = QtCore.pyqtSignal(str, int, int)
+    finished = QtCore.pyqtSignal(object)
+    failed = QtCore.pyqtSignal(object)
+    cancelled = QtCore.pyqtSignal()
+
+
+class Task(QtCore.QRunnable):
+    """Runs ``fn(progress, cancel)`` on the global thread pool.
+
+    Results, errors and progress are delivered to the GUI thread via signals.
+    With tracing on, ``timing`` holds a summary of the spans recorded by fn.
+    """
+
+    def __init__(self, fn, name="task"):
+        super().__init__()
+        self.fn = fn
+        self.name = name
+        self.timing = ""
+        self.cancel_event = threading.Event()
+        self.signals = TaskSignals()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+        try:
+            with tracing.collect() as spans, tracing.span(self.name):
+                result = self.fn(self.signals.progress.emit, self.cancel_event)
+        except ExtractionCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            self.signals.failed.emit(e)
+        else:
+            self.timing = tracing.summarize(spans)
+            self.signals.finished.emit(result)
+
+
 class MainWindow(QtWidgets.QMainWindow):
     def __init__(self):
         super().__init__()
         self.settings = QSettings("word_copywriter", "templates")
         self.templates = {}
         self.data = {}
+        self.task = None
         self.status_label = QtWidgets.QLabel()
         icon_path = os.path.join(os.path.dirname(__file__), "resources", "icon.png")
         self.setWindowIcon(QtGui.QIcon(icon_path))
         self.init_ui()
-        self.load_templates()
+        # Templates are compiled (and openpyxl imported) after the window is shown
+        QtCore.QTimer.singleShot(0, self.load_templates)
 
     def init_ui(self):
         self.setWindowTitle("Word Copywriter")
@@ -67,11 +113,27 @@ class MainWindow(QtWidgets.QMainWindow):
         act_action.triggered.connect(self.browse_act_template)
         invoice_action = settings_menu.addAction("Загрузить шаблон счёта")
         invoice_action.triggered.connect(self.browse_invoice_template)
+        settings_menu.addSeparator()
+        self.early_exit_action = settings_menu.addAction("Читать PDF до первых найденных данных")
+        self.early_exit_action.setCheckable(True)
+        self.early_exit_action.setChecked(self.settings.value("early_exit", False, type=bool))
+        self.early_exit_action.toggled.connect(
+            lambda checked: self.settings.setValue("early_exit", checked)
+        )
+        self.bundle_action = settings_menu.addAction("Упаковывать все документы в zip")
+        self.bundle_action.setCheckable(True)
+        self.bundle_action.setChecked(self.settings.value("bundle", False, type=bool))
+        self.bundle_action.toggled.connect(lambda checked: self.settings.setValue("bundle", checked))
         settings_button.setMenu(settings_menu)
         settings_button.setPopupMode(QtWidgets.QToolButton.InstantPopup)
         toolbar.addWidget(settings_button)
         toolbar.addSeparator()
         toolbar.addWidget(self.status_label)
+        self.cancel_button = QtWidgets.QToolButton()
+        self.cancel_button.setText("Отмена")
+        self.cancel_button.clicked.connect(self.cancel_task)
+        self.cancel_action = toolbar.addWidget(self.cancel_button)
+        self.cancel_action.setVisible(False)
 
         spacer = QtWidgets.QWidget()
         spacer.setSizePolicy(
@@ -94,9 +156,9 @@ class MainWindow(QtWidgets.QMainWindow):
         self.source_edit = QtWidgets.QLineEdit()
         self.source_edit.setReadOnly(True)
         source_layout.addWidget(self.source_edit)
-        source_btn = QtWidgets.QPushButton("Найти")
-        source_btn.clicked.connect(self.browse_source)
-        source_layout.addWidget(source_btn)
+        self.source_btn = QtWidgets.QPushButton("Найти")
+        self.source_btn.clicked.connect(self.browse_source)
+        source_layout.addWidget(self.source_btn)
         layout.addLayout(source_layout)
 
         self.preview_edit = QtWidgets.QTextEdit()
@@ -113,6 +175,11 @@ class MainWindow(QtWidgets.QMainWindow):
         self.create_invoice_btn.clicked.connect(self.create_invoice)
         self.create_invoice_btn.setEnabled(False)
         buttons_layout.addWidget(self.create_invoice_btn)
+
+        self.create_all_btn = QtWidgets.QPushButton("Создать все")
+        self.create_all_btn.clicked.connect(self.create_all)
+        self.create_all_btn.setEnabled(False)
+        buttons_layout.addWidget(self.create_all_btn)
         layout.addLayout(buttons_layout)
         
         central.setLayout(layout)
@@ -120,18 +187,52 @@ class MainWindow(QtWidgets.QMainWindow):
     def set_status(self, message):
         self.status_label.setText(message)
 
+    def start_task(self, fn, on_finished, on_failed, cancellable=False, name="task"):
+        """Run fn(progress, cancel) in the background, keeping the window responsive."""
+        task = Task(fn, name)
+        task.signals.progress.connect(self.show_progress)
+        task.signals.finished.connect(on_finished)
+        task.signals.failed.connect(on_failed)
+        task.signals.cancelled.connect(self.task_cancelled)
+        for signal in (task.signals.finished, task.signals.failed, task.signals.cancelled):
+            signal.connect(self.task_done)
+        self.task = task
+        self.cancel_action.setVisible(cancellable)
+        self.source_btn.setEnabled(False)
+        self.update_create_buttons_state()
+        QtCore.QThreadPool.globalInstance().start(task)
+
+    def task_done(self, *args):
+        if self.task and self.task.timing:
+            self.set_status(f"{self.status_label.text()} · {self.task.timing}")
+        self.task = None
+        self.cancel_action.setVisible(False)
+        self.source_btn.setEnabled(True)
+        self.update_create_buttons_state()
+
+    def cancel_task(self):
+        if self.task:
+            self.task.cancel()
+            self.set_status("Отмена...")
+
+    def task_cancelled(self):
+        self.set_status("Загрузка отменена")
+
+    def show_progress(self, stage, done, total):
+        action = "Распознавание" if stage == "ocr" else "Чтение"
+        self.set_status(f"{action} страниц: {done}/{total}")
+
     def load_template(self, key):
         path = self.settings.value(f"{key}_template", "", type=str)
         name = "акта" if key == "act" else "счёта"
         if path and os.path.exists(path):
             ext = os.path.splitext(path)[1].lower()
-            if ext != ".xlsx":
+            if ext not in TEMPLATE_EXTENSIONS:
                 self.templates[key] = None
                 self.set_status(f"Неверный формат шаблона {name}")
                 return
             try:
-                with open(path, "rb") as f:
-                    self.templates[key] = {"bytes": f.read(), "ext": ext}
+                self.templates[key] = compile_template(path)
                 self.set_status(f"Шаблон {name} загружен")
             except Exception as e:
                 self.templates[key] = None
@@ -151,17 +252,37 @@ class MainWindow(QtWidgets.QMainWindow):
             "Select source",
             filter="Documents (*.docx *.pdf)",
         )
-        if path:
-            self.source_edit.setText(path)
-            self.data = read_data_from_file(path)
-            self.preview_edit.setPlainText(format_preview(self.data))
-        self.update_create_buttons_state()
+        if not path:
+            return
+        self.source_edit.setText(path)
+        self.data = {}
+        self.preview_edit.clear()
+        self.set_status("Чтение документа...")
+        early_exit = self.early_exit_action.isChecked()
+        self.start_task(
+            lambda progress, cancel: read_data_cached(
+                path, progress=progress, cancel=cancel, early_exit=early_exit
+            ),
+            self.source_loaded,
+            self.source_failed,
+            cancellable=True,
+            name="gui.load",
+        )
+
+    def source_loaded(self, data):
+        self.data = data
+        self.preview_edit.setPlainText(format_preview(data))
+        self.set_status("Документ загружен")
+
+    def source_failed(self, error):
+        self.set_status("Ошибка чтения документа")
+        QMessageBox.critical(self, "Error", f"Failed to read document: {error}")
 
     def browse_act_template(self):
         path, _ = QFileDialog.getOpenFileName(
             self,
             "Select act template",
-            filter="Excel Files (*.xlsx)",
+            filter=TEMPLATE_FILTER,
         )
         if path:
             self.settings.setValue("act_template", path)
@@ -172,7 +293,7 @@ class MainWindow(QtWidgets.QMainWindow):
         path, _ = QFileDialog.getOpenFileName(
             self,
             "Select invoice template",
-            filter="Excel Files (*.xlsx)",
+            filter=TEMPLATE_FILTER,
         )
         if path:
             self.settings.setValue("invoice_template", path)
@@ -186,41 +307,97 @@ class MainWindow(QtWidgets.QMainWindow):
         self.create_document("invoice")
 
     def create_document(self, key):
-        template_info = self.templates.get(key)
-        source_path = self.source_edit.text()
-        if not (template_info and source_path):
+        template = self.templates.get(key)
+        if not (template and self.data):
             QMessageBox.warning(self, "Warning", "Please select source and templates")
             return
         output_path, _ = QFileDialog.getSaveFileName(
             self,
             "Save document",
-            filter="Excel Workbook (*.xlsx)",
+            filter=OUTPUT_FILTERS[template.ext],
         )
         if not output_path:
             return
-        if not output_path.lower().endswith(".xlsx"):
-            output_path += ".xlsx"
-        data = self.data or read_data_from_file(source_path)
+        if not output_path.lower().endswith(template.ext):
+            output_path += template.ext
+        data = self.data
         try:
-            generate_document(
-                template_info["bytes"], template_info["ext"], data, output_path
-            )
-            QMessageBox.information(self, "Success", f"Document saved to {output_path}")
-        except PermissionError:
+            # Recompiles only if the template file changed since it was loaded
+            template = self.templates[key] = compile_template(template.path)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to load template: {e}")
+            return
+
+        def render(progress, cancel):
+            template.render(data, output_path)
+            return output_path
+
+        self.set_status("Сохранение...")
+        self.start_task(render, self.document_saved, self.document_failed, name="gui.save")
+
+    def create_all(self):
+        """Render every loaded template from the parsed source into one folder."""
+        keys = [key for key, template in self.templates.items() if template]
+        if not (keys and self.data):
+            QMessageBox.warning(self, "Warning", "Please select source and templates")
+            return
+        output_dir = QFileDialog.getExistingDirectory(
+            self, "Select output folder", self.settings.value("output_dir", "", type=str)
+        )
+        if not output_dir:
+            return
+        self.settings.setValue("output_dir", output_dir)
+        try:
+            # Recompiles only if a template file changed since it was loaded
+            templates = {key: compile_template(self.templates[key].path) for key in keys}
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to load template: {e}")
+            return
+        self.templates.update(templates)
+        data = self.data
+        bundle = self.bundle_action.isChecked()
+        names = output_names(templates, data, DEFAULT_NAME_PATTERN, bundle)
+        if bundle:
+            names = {"zip": names["zip"]}
+        existing = [name for name in names.values() if os.path.exists(os.path.join(output_dir, name))]
+        if existing and QMessageBox.question(
+            self, "Replace files", "Replace existing files?\n" + "\n".join(existing)
+        ) != QMessageBox.Yes:
+            return
+
+        def render(progress, cancel):
+            outputs = render_all(templates, data, output_dir, DEFAULT_NAME_PATTERN, bundle)
+            return sorted(set(outputs.values()))
+
+        self.set_status("Сохранение...")
+        self.start_task(render, self.documents_saved, self.document_failed, name="gui.save_all")
+
+    def documents_saved(self, output_paths):
+        self.set_status("Документы сохранены")
+        QMessageBox.information(self, "Success", "Documents saved:\n" + "\n".join(output_paths))
+
+    def document_saved(self, output_path):
+        self.set_status("Документ сохранён")
+        QMessageBox.information(self, "Success", f"Document saved to {output_path}")
+
+    def document_failed(self, error):
+        self.set_status("Ошибка сохранения")
+        if isinstance(error, PermissionError):
             QMessageBox.critical(
                 self,
                 "Error",
                 "Cannot save file. It may be open in another program.",
             )
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to save file: {e}")
+        else:
+            QMessageBox.critical(self, "Error", f"Failed to save file: {error}")
 
     def update_create_buttons_state(self):
-        source_selected = bool(self.source_edit.text())
+        source_selected = bool(self.data) and self.task is None
         self.create_act_btn.setEnabled(source_selected and bool(self.templates.get("act")))
         self.create_invoice_btn.setEnabled(
             source_selected and bool(self.templates.get("invoice"))
         )
+        self.create_all_btn.setEnabled(source_selected and any(self.templates.values()))
 
     def show_about(self):
         self.about_widget = AboutWidget()
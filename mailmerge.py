@@ -0,0 +1,332 @@
+"""Mail merge: render one template for every row of a CSV or XLSX register.
+
+Rows are keyed by the ``DEFAULT_DATA`` field names in the header row. The
+template is compiled once; rows are read lazily and handed to a process pool
+a few at a time, so memory stays flat however long the register is.
+
+This module must not import PyQt5 so it can run on servers without a display.
+"""
+import argparse
+import csv
+import datetime
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from excel_utils import PLACEHOLDER_RE, RENDER_BACKENDS, compile_substitution
+from parsers import DEFAULT_DATA, extract_price
+from templates import NameClaims, compile_template, output_name
+
+ROW_EXTENSIONS = (".csv", ".xlsx")
+DEFAULT_NAME_PATTERN = "{{#}}"
+# Rows submitted to the pool ahead of the results, per worker
+QUEUE_DEPTH = 4
+
+_INVALID_SHEET_RE = re.compile(r"[\[\]:*?/\\]")
+MAX_SHEET_TITLE = 31
+
+_worker_template = None
+
+
+def _cell_text(value):
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, datetime.datetime):
+        return value.strftime("%d.%m.%Y")
+    return str(value).strip()
+
+
+def _iter_csv_rows(path, encoding):
+    with open(path, encoding=encoding, newline="") as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=";,\t")
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.reader(f, dialect)
+        header = next(reader, None)
+        if header is None:
+            return
+        header = [name.strip() for name in header]
+        for values in reader:
+            if any(values):
+                yield dict(zip(header, (v.strip() for v in values)))
+
+
+def _iter_xlsx_rows(path, sheet=None):
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet] if sheet else wb.worksheets[0]
+        rows = ws.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        header = [_cell_text(name) for name in header]
+        for values in rows:
+            if any(v is not None and v != "" for v in values):
+                yield {name: _cell_text(v) for name, v in zip(header, values) if name}
+    finally:
+        wb.close()
+
+
+def prepare_row(row):
+    """Return placeholder data for one register row.
+
+    Fields missing from the register are empty, as after parsing a source;
+    ``Цена`` is derived from ``Стоимость перевозки`` when not given.
+    """
+    data = DEFAULT_DATA.copy()
+    data.update(row)
+    if not data["Цена"]:
+        data["Цена"] = extract_price(data["Стоимость перевозки"])
+    return data
+
+
+def iter_rows(path, sheet=None, encoding="utf-8-sig"):
+    """Yield prepared data dicts from a CSV or XLSX register, one row at a time."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        rows = _iter_csv_rows(path, encoding)
+    elif ext == ".xlsx":
+        rows = _iter_xlsx_rows(path, sheet)
+    else:
+        raise ValueError("Only .csv and .xlsx registers are supported")
+    for row in rows:
+        yield prepare_row(row)
+
+
+def render_row(template, number, data, output_path):
+    """Render one row, returning a result record instead of raising."""
+    result = {"row": number, "output": output_path, "ok": False, "error": ""}
+    try:
+        template.render(data, output_path)
+        result["ok"] = True
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+def _init_worker(template):
+    # The compiled template is recompiled from its bytes once per worker on unpickling
+    global _worker_template
+    _worker_template = template
+
+
+def _render_in_worker(number, data, output_path):
+    return render_row(_worker_template, number, data, output_path)
+
+
+def _new_pool(workers, template):
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(template,))
+
+
+def merge_files(template, rows, output_dir, pattern=DEFAULT_NAME_PATTERN, workers=None, on_result=None):
+    """Render template once per row into output_dir and return a summary.
+
+    ``rows`` may be any iterable of data dicts and is consumed lazily. Only
+    failed rows are kept in the summary; ``on_result`` receives every result.
+    Output names are claimed on disk (see ``templates.NameClaims``), so memory
+    does not grow with the register either. If a worker process dies, the rows
+    that were on its pool are rendered again one at a time by a new pool, so
+    only the row that killed it fails.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    summary = {"rendered": 0, "failed": []}
+    claims = NameClaims()
+
+    def jobs():
+        for number, data in enumerate(rows, 1):
+            path = claims.unique(os.path.join(output_dir, output_name(pattern, data, number, template.ext)))
+            yield number, data, path
+
+    def handle(result):
+        if result["ok"]:
+            summary["rendered"] += 1
+        else:
+            summary["failed"].append(result)
+        if on_result:
+            on_result(result)
+
+    if workers == 1:
+        try:
+            for job in jobs():
+                handle(render_row(template, *job))
+        finally:
+            claims.close()
+        return summary
+
+    pool = _new_pool(workers, template)
+    pending = {}
+
+    def rerun_alone(suspects):
+        nonlocal pool
+        for job in suspects:
+            try:
+                result = pool.submit(_render_in_worker, *job).result()
+            except BrokenProcessPool as e:
+                number, _data, output_path = job
+                result = {
+                    "row": number, "output": output_path, "ok": False, "error": f"{type(e).__name__}: {e}"
+                }
+                pool.shutdown(wait=False)
+                pool = _new_pool(workers, template)
+            handle(result)
+
+    def collect(futures):
+        nonlocal pool
+        suspects = []
+        while futures:
+            for future in futures:
+                job = pending.pop(future)
+                try:
+                    handle(future.result())
+                except BrokenProcessPool:
+                    suspects.append(job)
+            # Every row still on a broken pool fails with it
+            futures = list(pending) if suspects else []
+        if suspects:
+            # Any of them may have killed the worker, so they run again one at a time
+            pool.shutdown(wait=False)
+            pool = _new_pool(workers, template)
+            rerun_alone(sorted(suspects, key=lambda job: job[0]))
+
+    def submit(job):
+        nonlocal pool
+        try:
+            pending[pool.submit(_render_in_worker, *job)] = job
+        except BrokenProcessPool:
+            broken = pool
+            collect(list(pending))
+            if pool is broken:
+                pool.shutdown(wait=False)
+                pool = _new_pool(workers, template)
+            pending[pool.submit(_render_in_worker, *job)] = job
+
+    try:
+        for job in jobs():
+            if len(pending) >= workers * QUEUE_DEPTH:
+                collect(wait(pending, return_when=FIRST_COMPLETED).done)
+            submit(job)
+        collect(list(pending))
+    finally:
+        pool.shutdown()
+        claims.close()
+    return summary
+
+
+def _sheet_title(pattern, data, number, used):
+    title = compile_substitution({**data, "#": number})(pattern)
+    title = _INVALID_SHEET_RE.sub("_", title).strip().strip("'")[:MAX_SHEET_TITLE] or str(number)
+    candidate = title
+    n = 2
+    while candidate.lower() in used:
+        suffix = f" ({n})"
+        candidate = title[:MAX_SHEET_TITLE - len(suffix)] + suffix
+        n += 1
+    used.add(candidate.lower())
+    return candidate
+
+
+def merge_sheets(template_path, rows, output_path, pattern=DEFAULT_NAME_PATTERN):
+    """Render an .xlsx template into one workbook with a copy of its sheets per row.
+
+    Sheet titles come from the pattern (a template with several sheets gets
+    each one copied, titled ``<pattern> <sheet>``). The whole workbook is held
+    in memory, so prefer ``merge_files`` for very long registers.
+    """
+    from openpyxl import load_workbook
+
+    if not template_path.lower().endswith(".xlsx"):
+        raise ValueError("Only .xlsx templates can be merged into sheets")
+    wb = load_workbook(template_path)
+    originals = list(wb.worksheets)
+    placeholders = {
+        ws.title: [
+            (cell.coordinate, cell.value)
+            for row in ws.iter_rows()
+            for cell in row
+            if isinstance(cell.value, str) and PLACEHOLDER_RE.search(cell.value)
+        ]
+        for ws in originals
+    }
+    # Copies are titled before the template sheets are removed, so they must not take their titles
+    used = {title.lower() for title in wb.sheetnames}
+    count = 0
+    for number, data in enumerate(rows, 1):
+        substitute = compile_substitution(data)
+        title = _sheet_title(pattern, data, number, used) if len(originals) == 1 else None
+        for ws in originals:
+            copy = wb.copy_worksheet(ws)
+            copy.sheet_state = "visible"
+            copy.title = title or _sheet_title(f"{pattern} {ws.title}", data, number, used)
+            for coordinate, text in placeholders[ws.title]:
+                copy[coordinate].value = substitute(text)
+        count += 1
+    if not count:
+        raise ValueError("The register has no rows")
+    for ws in originals:
+        wb.remove(ws)
+    wb.active = 0
+    wb.save(output_path)
+    return count
+
+
+def _print_result(result):
+    if not result["ok"]:
+        print(f"FAIL row {result['row']}  {result['output']}  [{result['error']}]", flush=True)
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(
+        description="Render a template for every row of a CSV or XLSX register."
+    )
+    parser.add_argument("--template", "-t", required=True, help="template (.xlsx or .docx)")
+    parser.add_argument("--rows", required=True, help="register with one row per document (.csv or .xlsx)")
+    parser.add_argument("--sheet", help="register sheet to read (default: the first)")
+    parser.add_argument("--encoding", default="utf-8-sig", help="CSV encoding (default: utf-8-sig)")
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument("--output", "-o", help="output directory, one file per row")
+    output.add_argument("--sheets", help="single .xlsx output with one sheet per row")
+    parser.add_argument(
+        "--name",
+        default=DEFAULT_NAME_PATTERN,
+        help="file or sheet name pattern with {{Field}} placeholders; {{#}} is the row number",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=RENDER_BACKENDS,
+        default="openpyxl",
+        help="xlsx rendering backend (default: openpyxl)",
+    )
+    parser.add_argument("--workers", "-j", type=int, default=None, help="worker processes (default: CPU count)")
+    return parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    rows = iter_rows(args.rows, args.sheet, args.encoding)
+    start = time.perf_counter()
+    if args.sheets:
+        count = merge_sheets(args.template, rows, args.sheets, args.name)
+        print(f"Wrote {count} sheet(s) to {args.sheets} in {time.perf_counter() - start:.2f}s")
+        return 0
+    template = compile_template(args.template, args.backend)
+    summary = merge_files(template, rows, args.output, args.name, args.workers, _print_result)
+    failed = len(summary["failed"])
+    print(
+        f"Rendered {summary['rendered']} file(s) in {time.perf_counter() - start:.2f}s, {failed} failed"
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,48 @@
-import sys
-import os
-from PyQt5 import QtWidgets, QtGui
+import time
 
-from gui import MainWindow
+# Taken before the other imports, so the startup log includes loading them
+_START = time.perf_counter()
+
+import sys  # noqa: E402
+import os  # noqa: E402
+import json  # noqa: E402
+import multiprocessing  # noqa: E402
+import threading  # noqa: E402
+from PyQt5 import QtCore, QtWidgets, QtGui  # noqa: E402
+
+from gui import MainWindow  # noqa: E402
+from parsers import preload_backends, shutdown_ocr_pools  # noqa: E402
+
+
+def write_startup_log(path):
+    """Record how long it took to show the window and which modules were loaded."""
+    log = {
+        "window_shown_seconds": round(time.perf_counter() - _START, 4),
+        "frozen": bool(getattr(sys, "frozen", False)),
+        "modules": sorted(sys.modules),
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(log, f, indent=2)
 
 
 def main():
+    # Needed for OCR worker processes in the frozen executable
+    multiprocessing.freeze_support()
     app = QtWidgets.QApplication(sys.argv)
     icon_path = os.path.join(os.path.dirname(__file__), "resources", "icon.png")
     app.setWindowIcon(QtGui.QIcon(icon_path))
+    startup_log = os.environ.get("WORD_COPYWRITER_STARTUP_LOG")
+    if startup_log:
+        # Scheduled before the window's own deferred work so it fires first
+        QtCore.QTimer.singleShot(0, lambda: write_startup_log(startup_log))
     window = MainWindow()
     window.show()
+    # Do not wait for OCR of a cancelled document when the window is closed
+    app.aboutToQuit.connect(lambda: shutdown_ocr_pools(wait=False))
+    # Warm up document backends once the window is on screen
+    QtCore.QTimer.singleShot(
+        500, lambda: threading.Thread(target=preload_backends, daemon=True).start()
+    )
     sys.exit(app.exec_())
 
 
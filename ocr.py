@@ -0,0 +1,369 @@
+"""OCR of scanned PDF pages: image cleanup and regions of interest.
+
+A page is rendered by poppler (pdf2image), cleaned up with Pillow when its
+layout asks for it and recognized by tesseract. Cleanup converts to
+grayscale, reduces resolution to ``max_dpi``, straightens pages scanned at a
+slight angle and binarizes with Otsu's threshold.
+
+An OCR layout may restrict recognition to regions of a page, such as the
+route table and the customer block the parser reads, each with its own
+tesseract page segmentation (``psm``) and engine (``oem``) mode. Layout
+format (plain data, so layouts can also be loaded from JSON)::
+
+    {
+        "name": "contract",
+        "psm": 6,                                   # defaults for every region
+        "preprocess": {"deskew": False},            # cleanup, overriding DEFAULT_PREPROCESS
+        "regions": [
+            {"name": "route", "page": 1, "box": [0.0, 0.0, 1.0, 0.5], "psm": 4},
+            {"name": "requisites", "page": -1, "box": [0.0, 0.6, 1.0, 1.0]},
+        ],
+    }
+
+``box`` is ``[left, top, right, bottom]`` as fractions of the page; ``page``
+is 1-based, negative from the end, and omitted for every page. Regions are
+recognized in the listed order. Pages without a region are not OCR'd at all;
+a layout without regions reads every page whole. Without ``preprocess`` (or
+with ``None``) pages go to tesseract as rendered; ``{}`` applies every step
+of ``DEFAULT_PREPROCESS``.
+
+Recognition goes through a backend: ``tesserocr`` keeps the engine and the
+language data loaded for the life of the process, ``pytesseract`` (the
+fallback) starts the tesseract command for every region.
+"""
+import importlib.util
+import json
+import os
+import tempfile
+import threading
+
+from tracing import span
+
+OCR_LANG = "rus"
+
+DEFAULT_PREPROCESS = {
+    "grayscale": True,
+    # Pages rendered above this resolution are scaled down first
+    "max_dpi": 300,
+    "deskew": True,
+    # Largest skew in degrees that deskewing looks for
+    "max_skew": 5.0,
+    "binarize": True,
+}
+
+# Width of the thumbnail the skew angle is estimated on, and the angle steps
+# of the coarse and the fine search in degrees
+_DESKEW_WIDTH = 500
+_DESKEW_STEPS = (1.0, 0.25)
+
+# Whole pages as rendered, as before regions and cleanup existed
+PAGE_LAYOUT = {"name": "page", "regions": [], "preprocess": None}
+
+# The route table, vehicle, driver and customer requisites of the contract
+# template sit in the upper part of the first page; terms pages are skipped.
+CONTRACT_LAYOUT = {
+    "name": "contract",
+    "preprocess": {},
+    "regions": [
+        {"name": "contract", "page": 1, "box": [0.0, 0.0, 1.0, 0.45], "psm": 6},
+    ],
+}
+
+OCR_LAYOUTS = {layout["name"]: layout for layout in (PAGE_LAYOUT, CONTRACT_LAYOUT)}
+
+
+def register_layout(layout):
+    """Add an OCR layout, replacing any layout of the same name."""
+    OCR_LAYOUTS[layout["name"]] = layout
+
+
+def load_layouts(path):
+    """Register the OCR layouts listed in a JSON file (a list of layout objects)."""
+    with open(path, encoding="utf-8") as f:
+        layouts = json.load(f)
+    for layout in layouts:
+        register_layout(layout)
+    return layouts
+
+
+def get_layout(layout=None):
+    """Return a layout given as a dict, a registered name or None (whole pages)."""
+    if layout is None:
+        return PAGE_LAYOUT
+    if isinstance(layout, dict):
+        return layout
+    try:
+        return OCR_LAYOUTS[layout]
+    except KeyError:
+        raise ValueError(f"Unknown OCR layout: {layout}") from None
+
+
+def regions_for(layout, page_number, page_count):
+    """Return the regions of layout to recognize on a page, in order."""
+    regions = layout.get("regions")
+    if not regions:
+        return [{"name": "page"}]
+    found = []
+    for region in regions:
+        page = region.get("page")
+        if page is not None and page < 0:
+            page += page_count + 1
+        if page is None or page == page_number:
+            found.append(region)
+    return found
+
+
+def otsu_threshold(histogram):
+    """Return the gray level that best separates a 256-bin histogram into two classes."""
+    total = sum(histogram)
+    weighted_total = sum(i * count for i, count in enumerate(histogram))
+    best, best_variance = 127, -1.0
+    weight = weighted = 0
+    for level, count in enumerate(histogram):
+        weight += count
+        if not weight:
+            continue
+        rest = total - weight
+        if not rest:
+            break
+        weighted += level * count
+        mean_dark = weighted / weight
+        mean_light = (weighted_total - weighted) / rest
+        variance = weight * rest * (mean_dark - mean_light) ** 2
+        if variance > best_variance:
+            best, best_variance = level, variance
+    return best
+
+
+def binarize(image):
+    """Return a black and white copy of a grayscale image using Otsu's threshold."""
+    threshold = otsu_threshold(image.histogram())
+    return image.point(lambda value: 255 if value > threshold else 0, mode="1")
+
+
+def _profile_score(image):
+    from PIL import Image
+
+    rows = image.resize((1, image.height), Image.BOX).tobytes()
+    return sum((a - b) ** 2 for a, b in zip(rows, rows[1:]))
+
+
+def estimate_skew(image, max_skew=DEFAULT_PREPROCESS["max_skew"]):
+    """Return the rotation in degrees that makes the text lines of image horizontal.
+
+    Lines are horizontal when the row sums of ink change most sharply from
+    row to row, so candidate angles are scored on a small inverted thumbnail,
+    first in whole degrees and then around the best one. Ties (such as a
+    blank page) go to the smaller rotation.
+    """
+    from PIL import Image, ImageOps
+
+    scale = min(1.0, _DESKEW_WIDTH / image.width)
+    thumb = image.resize((max(1, int(image.width * scale)), max(1, int(image.height * scale))), Image.BILINEAR)
+    thumb = ImageOps.invert(binarize(thumb).convert("L"))
+    scores = {0.0: _profile_score(thumb)}
+
+    def score(angle):
+        if angle not in scores:
+            scores[angle] = _profile_score(thumb.rotate(angle, resample=Image.BILINEAR, fillcolor=0))
+        return scores[angle], -abs(angle)
+
+    coarse, fine = _DESKEW_STEPS
+    steps = int(max_skew / coarse)
+    best_angle = max((i * coarse for i in range(-steps, steps + 1)), key=score)
+    candidates = [best_angle + i * fine for i in range(-int(coarse / fine) + 1, int(coarse / fine))]
+    return max((a for a in candidates if abs(a) <= max_skew), key=score)
+
+
+def prepare_page(image, dpi, options=None):
+    """Return the cleaned up page image and its resolution, before binarization."""
+    from PIL import Image
+
+    options = {**DEFAULT_PREPROCESS, **(options or {})}
+    if options["grayscale"] and image.mode != "L":
+        image = image.convert("L")
+    max_dpi = options["max_dpi"]
+    if max_dpi and dpi > max_dpi:
+        scale = max_dpi / dpi
+        image = image.resize((int(image.width * scale), int(image.height * scale)), Image.LANCZOS)
+        dpi = max_dpi
+    if options["deskew"] and image.mode == "L":
+        angle = estimate_skew(image, options["max_skew"])
+        if angle:
+            image = image.rotate(angle, resample=Image.BICUBIC, fillcolor=255)
+    return image, dpi
+
+
+def crop_region(image, region):
+    box = region.get("box")
+    if not box:
+        return image
+    left, top, right, bottom = box
+    return image.crop((
+        int(left * image.width),
+        int(top * image.height),
+        int(right * image.width),
+        int(bottom * image.height),
+    ))
+
+
+def tesseract_options(layout, region):
+    """Return the ``psm`` and ``oem`` set for a region or its layout."""
+    options = {}
+    for key in ("psm", "oem"):
+        value = region.get(key, layout.get(key))
+        if value is not None:
+            options[key] = int(value)
+    return options
+
+
+class PytesseractBackend:
+    """Runs the tesseract command for every image; the language data is loaded each time."""
+
+    name = "pytesseract"
+
+    def recognize(self, image, lang, dpi=None, psm=None, oem=None):
+        import pytesseract
+
+        config = []
+        for option, value in (("dpi", dpi), ("psm", psm), ("oem", oem)):
+            if value is not None:
+                config.append(f"--{option} {value}")
+        return pytesseract.image_to_string(image, lang=lang, config=" ".join(config))
+
+
+class TesserocrBackend:
+    """Keeps tesseract loaded in this process through the tesserocr bindings.
+
+    One engine is created per language and engine mode and reused for every
+    image, so the language data is read once per process.
+    """
+
+    name = "tesserocr"
+
+    def __init__(self):
+        import tesserocr
+
+        self._tesserocr = tesserocr
+        self._apis = {}
+        # An engine must not recognize two images at once
+        self._lock = threading.Lock()
+
+    def _api(self, lang, oem):
+        api = self._apis.get((lang, oem))
+        if api is None:
+            options = {"lang": lang}
+            if oem is not None:
+                options["oem"] = oem
+            api = self._apis[(lang, oem)] = self._tesserocr.PyTessBaseAPI(**options)
+        return api
+
+    def recognize(self, image, lang, dpi=None, psm=None, oem=None):
+        psm = self._tesserocr.PSM.AUTO if psm is None else psm
+        with self._lock:
+            api = self._api(lang, oem)
+            api.SetPageSegMode(psm)
+            api.SetImage(image)
+            if dpi:
+                api.SetSourceResolution(dpi)
+            return api.GetUTF8Text()
+
+    def close(self):
+        with self._lock:
+            for api in self._apis.values():
+                api.End()
+            self._apis.clear()
+
+
+OCR_BACKENDS = {"tesserocr": TesserocrBackend, "pytesseract": PytesseractBackend}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Return this process's OCR backend.
+
+    ``WORD_COPYWRITER_OCR_BACKEND`` picks ``tesserocr`` or ``pytesseract``;
+    by default tesserocr is used when it is installed.
+    """
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            name = os.environ.get("WORD_COPYWRITER_OCR_BACKEND", "auto")
+            if name == "auto":
+                try:
+                    _backend = TesserocrBackend()
+                except ImportError:
+                    _backend = PytesseractBackend()
+            elif name in OCR_BACKENDS:
+                _backend = OCR_BACKENDS[name]()
+            else:
+                raise ValueError(f"Unknown OCR backend: {name}")
+        return _backend
+
+
+def backend_warning():
+    """Return why scans will be OCR'd with the slower pytesseract fallback, or None.
+
+    Checks for tesserocr without importing it, so the main process of the
+    headless tools can report it before any worker starts.
+    """
+    if os.environ.get("WORD_COPYWRITER_OCR_BACKEND", "auto") != "auto":
+        return None
+    if importlib.util.find_spec("tesserocr") is not None:
+        return None
+    return (
+        "tesserocr is not installed; scanned pages are OCR'd by starting "
+        "the tesseract command for every region"
+    )
+
+
+def recognize_image(image, dpi, layout=None, page_number=1, page_count=1):
+    """Recognize the regions of one page image and return their text, one region per block."""
+    backend = get_backend()
+    layout = get_layout(layout)
+    preprocess = layout.get("preprocess")
+    options = None if preprocess is None else {**DEFAULT_PREPROCESS, **preprocess}
+    if options is not None:
+        with span("ocr.preprocess", page=page_number):
+            image, dpi = prepare_page(image, dpi, options)
+    texts = []
+    for region in regions_for(layout, page_number, page_count):
+        crop = crop_region(image, region)
+        if options is not None and options["binarize"] and crop.mode == "L":
+            crop = binarize(crop)
+        with span("ocr.tesseract", page=page_number, region=region.get("name", ""), backend=backend.name):
+            texts.append(backend.recognize(crop, OCR_LANG, dpi, **tesseract_options(layout, region)))
+    return "\n".join(text.strip("\n") for text in texts)
+
+
+def recognize_page(path, page_number, dpi, layout=None, page_count=1):
+    """Rasterize one PDF page and return the recognized text of its regions.
+
+    Returns an empty string without rendering when the layout has no region
+    on the page.
+    """
+    from pdf2image import convert_from_path
+    from PIL import Image
+
+    layout = get_layout(layout)
+    if not regions_for(layout, page_number, page_count):
+        return ""
+    with tempfile.TemporaryDirectory(prefix="word_copywriter_ocr_") as tmp:
+        with span("ocr.rasterize", page=page_number, dpi=dpi):
+            image_paths = convert_from_path(
+                path,
+                dpi=dpi,
+                first_page=page_number,
+                last_page=page_number,
+                output_folder=tmp,
+                paths_only=True,
+                grayscale=True,
+            )
+        texts = []
+        for image_path in image_paths:
+            with Image.open(image_path) as image:
+                texts.append(recognize_image(image, dpi, layout, page_number, page_count))
+        return "".join(texts)
+
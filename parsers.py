@@ -1,8 +1,19 @@
+import os
 import re
-from docx import Document
-import pdfplumber
-from pdf2image import convert_from_path
-import pytesseract
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import docx_layouts
+import ocr
+from tracing import span
+
+# Format backends (pdfplumber, pdf2image, pytesseract) are imported
+# on first use so that starting the GUI or opening a .docx does not pay for them.
+
+# Bump when parsing output changes so cached results are re-parsed
+PARSER_VERSION = "2"
 
 DEFAULT_DATA = {
     "Данные заказчика": "",
@@ -20,6 +31,19 @@ DEFAULT_DATA = {
     "Цена": "",
 }
 
+# Pages with fewer non-whitespace characters in their text layer are OCR'd
+MIN_TEXT_LAYER_CHARS = 10
+OCR_DPI = 200
+OCR_LANG = ocr.OCR_LANG
+# Fields that must be filled before early-exit extraction stops reading pages
+EARLY_EXIT_FIELDS = tuple(key for key in DEFAULT_DATA if key != "Цена")
+# Scanned pages submitted for OCR ahead of the consumer, per worker
+OCR_LOOKAHEAD = 2
+
+# Worker count -> process pool kept for OCR across documents
+_ocr_pools = {}
+_ocr_pools_lock = threading.Lock()
+
 
 def extract_price(cost: str) -> str:
     """Extract numeric price from a cost string."""
@@ -27,200 +51,292 @@ def extract_price(cost: str) -> str:
     return match.group(0).replace(" ", "") if match else ""
 
 
-def read_data_from_docx(path):
-    """Parse contract-like document and return values for placeholders."""
-    doc = Document(path)
+def read_data_from_docx(path, layout=None):
+    """Parse contract-like document and return values for placeholders.
+
+    Fields are located by a ``docx_layouts`` layout, detected automatically
+    unless one is given. The document is streamed from its XML and only read
+    as far as the fields need.
+    """
+    with span("docx.open"):
+        index = docx_layouts.read_index(path, layout)
+    with span("docx.fields"):
+        fields = docx_layouts.extract_fields(index, layout)
 
     data = DEFAULT_DATA.copy()
+    data.update(fields)
+    data["Цена"] = extract_price(data["Стоимость перевозки"])
+    return data
 
-    # First paragraph with number
-    for para in doc.paragraphs:
-        text = para.text.strip()
-        if text.startswith("Договор-заявка"):
-            num_start = text.find("№")
-            if num_start != -1:
-                data["Номер документа"] = text[num_start:].strip()
-            break
 
-    # First table with route and cost info
-    if doc.tables:
-        t = doc.tables[0]
-        try:
-            data["Адрес загрузки"] = t.cell(8, 0).text.strip()
-            data["Адрес разгрузки"] = t.cell(8, 4).text.strip()
-            data["Дата погрузки"] = t.cell(10, 0).text.strip()
-            data["Дата разгрузки"] = t.cell(10, 4).text.strip()
-            data["Стоимость перевозки"] = t.cell(11, 4).text.strip()
-        except IndexError:
-            pass
-
-    # Second table with vehicle info
-    if len(doc.tables) > 1:
-        t = doc.tables[1]
-        try:
-            data["Марка автомобиля"] = t.cell(0, 1).text.strip()
-            data["Номер полуприцепа"] = t.cell(0, 2).text.strip()
-            data["ФИО водителя"] = t.cell(1, 1).text.strip()
-        except IndexError:
-            pass
-
-    # Third table with customer info
-    if len(doc.tables) > 2:
-        t = doc.tables[2]
-        try:
-            cell_text = t.cell(0, 1).text
-        except IndexError:
-            cell_text = ""
-        if cell_text:
-            start = cell_text.find("Заказчик:")
-            end = cell_text.find("Почтовый адрес")
-            if start != -1 and end != -1 and end > start:
-                data["Данные заказчика"] = cell_text[start + len("Заказчик:"):end].strip()
-            inn_match = re.search(r"ИНН получателя \d+", cell_text)
-            if inn_match:
-                data["ИНН получателя"] = inn_match.group(0).strip()
-            ogrn_match = re.search(r"ОГРН \d+", cell_text)
-            if ogrn_match:
-                data["ОГРН получателя"] = ogrn_match.group(0).strip()
+_COLUMN_SPLIT_RE = re.compile(r"\t+|\s{2,}")
+_NUMBER_RE = re.compile(r"Договор-заявка.*?(№\s*[^\n\r]+)")
+_ADDRESS_HEADER_RE = re.compile(r"Адрес загрузки\s+Адрес разгрузки")
+_ADDRESS_SPLIT_RE = re.compile(r"\d\s+(?=[А-ЯЁ])")
+_DATES_HEADER_RE = re.compile(r"Дата\s+Время\s+Дата\s+Время")
+_COST_RE = re.compile(r"Стоимость перевозки(?:\s*\(прописью\))?\s*([^\n\r]+)")
+_ADDRESSES_RE = re.compile(r"Адрес загрузки[:\s]+([^\n\r]+)\s+Адрес разгрузки[:\s]+([^\n\r]+)")
+_LOAD_ADDRESS_RE = re.compile(r"(?m)^Адрес загрузки[:\s]+([^\n\r]+)")
+_UNLOAD_ADDRESS_RE = re.compile(r"(?m)^Адрес разгрузки[:\s]+([^\n\r]+)")
+_DATE_RE = re.compile(r"\d{2}\.\d{2}\.\d{4}")
+_VEHICLE_RE = re.compile(r"Марка[,\s]+номер а/м, номер полуприцепа\s+([^\s\n]+)\s+([^\s\n]+)", re.I)
+_TRUCK_RE = re.compile(r"(?m)^Марка автомобиля[:\s]+([^\n\r]+)")
+_TRAILER_RE = re.compile(r"(?m)^Номер полуприцепа[:\s]+([^\n\r]+)")
+_DRIVER_RE = re.compile(r"(?m)^ФИО водителя[:\s]*([^\n\r]+)")
+_CUSTOMER_RE = re.compile(r"Заказчик:")
+_CUSTOMER_LOOSE_RE = re.compile(r"Заказчик\s+")
+_LEGAL_ADDRESS_RE = re.compile(r"Юридический адрес[^\n]*(?=\n|Почтовый адрес|$)")
+_INN_RE = re.compile(r"(ИНН получателя\s*\d+)")
+_OGRN_RE = re.compile(r"(ОГРН\s*\d+)")
 
-    data["Цена"] = extract_price(data["Стоимость перевозки"])
-    return data
+_IP_PREFIX = "Индивидуальный предприниматель"
+
+
+def _split_cols(line: str):
+    """Split a line into columns by tabs or 2+ spaces."""
+    return [p.strip() for p in _COLUMN_SPLIT_RE.split(line) if p.strip()]
+
+
+def _parse_address_header(lines, i, scan):
+    if i + 1 >= len(lines):
+        return None
+    if not scan["address_tail"]:
+        # Joining the value lines could neither be split nor give two columns
+        return {}
+    # The first value line is always taken, then lines up to the next "Дата..."
+    addr_line = " ".join(lines[i + 1:scan["next_date"]])
+    split_match = _ADDRESS_SPLIT_RE.search(addr_line)
+    if split_match:
+        idx = split_match.end()
+        return {"Адрес загрузки": addr_line[:idx].strip(), "Адрес разгрузки": addr_line[idx:].strip()}
+    vals = _split_cols(addr_line)
+    if len(vals) >= 2:
+        return {"Адрес загрузки": vals[0], "Адрес разгрузки": vals[1]}
+    return {}
+
+
+def _parse_dates_header(lines, i, scan):
+    if i + 1 >= len(lines):
+        return None
+    vals_line = lines[i + 1]
+    if i + 2 < len(lines) and not lines[i + 2].startswith("Стоимость перевозки"):
+        vals_line += " " + lines[i + 2]
+    vals = _split_cols(vals_line)
+    if len(vals) >= 3:
+        return {"Дата погрузки": vals[0], "Дата разгрузки": vals[2]}
+    return {}
+
+
+def _parse_cost_line(lines, i, scan):
+    line = lines[i]
+    if not line.startswith("Стоимость перевозки"):
+        return None
+    cost_match = _COST_RE.search(line)
+    return {"Стоимость перевозки": cost_match.group(1).strip()} if cost_match else {}
+
+
+def _parse_vehicle_line(lines, i, scan):
+    line = lines[i]
+    if not (line.startswith("Марка") and "полуприцеп" in line):
+        return None
+    vals = _split_cols(line)
+    found = {}
+    if len(vals) > 1:
+        found["Марка автомобиля"] = vals[1]
+    if len(vals) > 2:
+        found["Номер полуприцепа"] = vals[2]
+    return found
+
+
+def _parse_driver_line(lines, i, scan):
+    line = lines[i]
+    if not line.startswith("ФИО водителя"):
+        return None
+    vals = _split_cols(line)
+    return {"ФИО водителя": vals[1]} if len(vals) > 1 else {}
+
+
+# Line handlers keyed by the first four characters of a line, with an optional
+# anchor pattern and the fields they fill. A handler returns None when the line
+# is not its label or a dict of the fields it found.
+_LINE_HANDLERS = {
+    "Адре": (_ADDRESS_HEADER_RE, _parse_address_header, ("Адрес загрузки", "Адрес разгрузки")),
+    "Дата": (_DATES_HEADER_RE, _parse_dates_header, ("Дата погрузки", "Дата разгрузки")),
+    "Стои": (None, _parse_cost_line, ("Стоимость перевозки",)),
+    "Марк": (None, _parse_vehicle_line, ("Марка автомобиля", "Номер полуприцепа")),
+    "ФИО ": (None, _parse_driver_line, ("ФИО водителя",)),
+}
+_LINE_FIELD_COUNT = len({f for _, _, fields in _LINE_HANDLERS.values() for f in fields})
+
+
+def _scan_lines(lines):
+    """Run the line handlers over lines and return the fields they found.
+
+    When a label repeats its last occurrence wins, so lines are scanned from
+    the end, keeping the first value found for each field. Alongside, the scan
+    tracks where the next "Дата..." line is and whether the address value lines
+    after a header could be split at all, so repeated headers in noisy text do
+    not re-join the rest of the text each time.
+    """
+    found = {}
+    n = len(lines)
+    # First "Дата..." line at or after i + 1 and at or after i + 2
+    date_after = date_after_next = n
+    # Whether the address value lines starting at i + 1 have a split point or
+    # more than one column
+    tail_splittable = False
+    scan = {"next_date": n, "address_tail": False}
+    for i in range(n - 1, -1, -1):
+        line = lines[i]
+        entry = _LINE_HANDLERS.get(line[:4])
+        if entry is not None:
+            pattern, handler, fields = entry
+            if not all(f in found for f in fields) and (pattern is None or pattern.match(line)):
+                scan["next_date"] = date_after_next
+                scan["address_tail"] = tail_splittable
+                for key, value in (handler(lines, i, scan) or {}).items():
+                    found.setdefault(key, value)
+                if len(found) == _LINE_FIELD_COUNT:
+                    break
+
+        splittable = bool(_ADDRESS_SPLIT_RE.search(line)) or len(_split_cols(line)) > 1
+        if i + 1 < n and date_after != i + 1:
+            # The next line is joined to this one with a single space
+            splittable = splittable or tail_splittable or bool(
+                _ADDRESS_SPLIT_RE.match(line[-1] + " " + lines[i + 1][0])
+            )
+        tail_splittable = splittable
+        date_after_next = date_after
+        if line.startswith("Дата"):
+            date_after = i
+    return found
+
+
+def _last_customer_block(text):
+    """Return the text after the last "Заказчик" label up to "Почтовый адрес".
+
+    Blocks do not overlap: a block without "Почтовый адрес" runs to the end of
+    the text (before a final newline). Returns None if there is no label.
+    """
+    for label_re in (_CUSTOMER_RE, _CUSTOMER_LOOSE_RE):
+        block = None
+        pos = 0
+        while True:
+            match = label_re.search(text, pos)
+            if not match:
+                break
+            start = match.end()
+            end = text.find("Почтовый адрес", start)
+            if end == -1:
+                end = len(text) - 1 if text.endswith("\n") and start < len(text) else len(text)
+                block = text[start:end]
+                break
+            block = text[start:end]
+            pos = end + len("Почтовый адрес")
+        if block is not None:
+            return block
+    return None
+
+
+def _parse_customer(block):
+    lines_cust = [ln.strip() for ln in block.splitlines() if ln.strip()]
+    name = ""
+    address = ""
+    for idx in range(len(lines_cust) - 1, -1, -1):
+        if not lines_cust[idx].startswith(_IP_PREFIX):
+            continue
+        after = lines_cust[idx][len(_IP_PREFIX):].strip()
+        if not after or after == _IP_PREFIX:
+            if idx + 1 < len(lines_cust):
+                parts = lines_cust[idx + 1].split()
+                if len(parts) >= 3:
+                    name = _IP_PREFIX + " " + " ".join(parts[-3:])
+        else:
+            for delim in ["Юридический адрес", "Почтовый адрес"]:
+                pos = after.find(delim)
+                if pos != -1:
+                    after = after[:pos].strip()
+                    break
+            name = _IP_PREFIX + " " + after
+        break
+    for j, ln in enumerate(lines_cust):
+        if ln.startswith("Юридический адрес"):
+            address = ln
+            for extra in lines_cust[j + 1:]:
+                if "литера" in extra or "офис" in extra:
+                    address = address.rstrip(",") + ", " + extra
+                    break
+            break
+    if not address:
+        addr_match = _LEGAL_ADDRESS_RE.search(block)
+        if addr_match:
+            address = addr_match.group(0).strip()
+    if not name:
+        return ""
+    return name + "\n" + address if address else name
 
 
 def parse_data_from_text(text: str):
-    """Parse plain text of contract-like document and return values."""
+    """Parse plain text of contract-like document and return values.
+
+    Lines are scanned once, dispatching on their label to a handler; whole-text
+    fallbacks only run for fields that are still empty afterwards.
+    """
     data = DEFAULT_DATA.copy()
 
     # Split text into non-empty lines for easier table-like parsing
     lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
 
-    def split_cols(line: str):
-        """Split a line into columns by tabs or 2+ spaces."""
-        return [p.strip() for p in re.split(r"\t+|\s{2,}", line) if p.strip()]
-
-    def find(pattern, flags=0):
-        match = re.search(pattern, text, flags)
+    def find(pattern):
+        match = pattern.search(text)
         return match.group(1).strip() if match else ""
 
     # Document number can appear anywhere
-    num_match = re.search(r"Договор-заявка.*?(№\s*[^\n\r]+)", text)
+    num_match = _NUMBER_RE.search(text)
     if num_match:
         data["Номер документа"] = num_match.group(1).strip()
 
-    for i, line in enumerate(lines):
-        cols = split_cols(line)
-        if re.match(r"Адрес загрузки\s+Адрес разгрузки", line) and i + 1 < len(lines):
-            addr_line = lines[i + 1]
-            j = i + 2
-            while j < len(lines) and not lines[j].startswith("Дата"):
-                addr_line += " " + lines[j]
-                j += 1
-            split_match = re.search(r"\d\s+(?=[А-ЯЁ])", addr_line)
-            if split_match:
-                idx = split_match.end()
-                data["Адрес загрузки"] = addr_line[:idx].strip()
-                data["Адрес разгрузки"] = addr_line[idx:].strip()
-            else:
-                vals = split_cols(addr_line)
-                if len(vals) >= 2:
-                    data["Адрес загрузки"], data["Адрес разгрузки"] = vals[0], vals[1]
-        elif re.match(r"Дата\s+Время\s+Дата\s+Время", line) and i + 1 < len(lines):
-            vals_line = lines[i + 1]
-            if i + 2 < len(lines) and not lines[i + 2].startswith("Стоимость перевозки"):
-                vals_line += " " + lines[i + 2]
-            vals = split_cols(vals_line)
-            if len(vals) >= 3:
-                data["Дата погрузки"] = vals[0]
-                data["Дата разгрузки"] = vals[2]
-        elif line.startswith("Стоимость перевозки"):
-            cost_match = re.search(r"Стоимость перевозки(?:\s*\(прописью\))?\s*([^\n\r]+)", line)
-            if cost_match:
-                data["Стоимость перевозки"] = cost_match.group(1).strip()
-        elif line.startswith("Марка") and "полуприцеп" in line:
-            vals = split_cols(line)
-            if len(vals) > 1:
-                data["Марка автомобиля"] = vals[1]
-            if len(vals) > 2:
-                data["Номер полуприцепа"] = vals[2]
-        elif line.startswith("ФИО водителя"):
-            vals = split_cols(line)
-            if len(vals) > 1:
-                data["ФИО водителя"] = vals[1]
+    data.update(_scan_lines(lines))
 
     # Fallback regex-based extraction if table parsing failed
     if not (data["Адрес загрузки"] and data["Адрес разгрузки"]):
-        addr_match = re.search(r"Адрес загрузки[:\s]+([^\n\r]+)\s+Адрес разгрузки[:\s]+([^\n\r]+)", text)
+        addr_match = _ADDRESSES_RE.search(text)
         if addr_match:
             data["Адрес загрузки"], data["Адрес разгрузки"] = addr_match.group(1).strip(), addr_match.group(2).strip()
     if not data["Адрес загрузки"]:
-        data["Адрес загрузки"] = find(r"(?m)^Адрес загрузки[:\s]+([^\n\r]+)")
+        data["Адрес загрузки"] = find(_LOAD_ADDRESS_RE)
     if not data["Адрес разгрузки"]:
-        data["Адрес разгрузки"] = find(r"(?m)^Адрес разгрузки[:\s]+([^\n\r]+)")
+        data["Адрес разгрузки"] = find(_UNLOAD_ADDRESS_RE)
     if not (data["Дата погрузки"] and data["Дата разгрузки"]):
-        dates = re.findall(r"\d{2}\.\d{2}\.\d{4}", text)
+        dates = [m.group(0) for _, m in zip(range(2), _DATE_RE.finditer(text))]
         if len(dates) >= 2:
             data["Дата погрузки"], data["Дата разгрузки"] = dates[0], dates[1]
     if not data["Стоимость перевозки"]:
-        cost_match = re.search(r"Стоимость перевозки(?:\s*\(прописью\))?\s*([^\n\r]+)", text)
+        cost_match = _COST_RE.search(text)
         if cost_match:
             data["Стоимость перевозки"] = cost_match.group(1).strip()
     if not (data["Марка автомобиля"] and data["Номер полуприцепа"]):
-        car_match = re.search(r"Марка[,\s]+номер а/м, номер полуприцепа\s+([^\s\n]+)\s+([^\s\n]+)", text, re.I)
+        car_match = _VEHICLE_RE.search(text)
         if car_match:
             data["Марка автомобиля"], data["Номер полуприцепа"] = car_match.group(1).strip(), car_match.group(2).strip()
     if not data["Марка автомобиля"]:
-        data["Марка автомобиля"] = find(r"(?m)^Марка автомобиля[:\s]+([^\n\r]+)")
+        data["Марка автомобиля"] = find(_TRUCK_RE)
     if not data["Номер полуприцепа"]:
-        data["Номер полуприцепа"] = find(r"(?m)^Номер полуприцепа[:\s]+([^\n\r]+)")
+        data["Номер полуприцепа"] = find(_TRAILER_RE)
     if not data["ФИО водителя"]:
-        data["ФИО водителя"] = find(r"(?m)^ФИО водителя[:\s]*([^\n\r]+)")
-
-    cust_matches = re.findall(r"Заказчик:(.*?)(?:Почтовый адрес|$)", text, re.S)
-    if not cust_matches:
-        cust_matches = re.findall(r"Заказчик\s+(.*?)(?:Почтовый адрес|$)", text, re.S)
-    if cust_matches:
-        block = cust_matches[-1]
-        lines_cust = [ln.strip() for ln in block.splitlines() if ln.strip()]
-        name = ""
-        address = ""
-        idxs = [i for i, ln in enumerate(lines_cust) if ln.startswith("Индивидуальный предприниматель")]
-        if idxs:
-            idx = idxs[-1]
-            after = lines_cust[idx][len("Индивидуальный предприниматель"):].strip()
-            if not after or after == "Индивидуальный предприниматель":
-                if idx + 1 < len(lines_cust):
-                    parts = lines_cust[idx + 1].split()
-                    if len(parts) >= 3:
-                        name = "Индивидуальный предприниматель " + " ".join(parts[-3:])
-            else:
-                for delim in ["Юридический адрес", "Почтовый адрес"]:
-                    pos = after.find(delim)
-                    if pos != -1:
-                        after = after[:pos].strip()
-                        break
-                name = "Индивидуальный предприниматель " + after
-        for j, ln in enumerate(lines_cust):
-            if ln.startswith("Юридический адрес"):
-                address = ln
-                for extra in lines_cust[j + 1:]:
-                    if "литера" in extra or "офис" in extra:
-                        address = address.rstrip(",") + ", " + extra
-                        break
-                break
-        if not address:
-            addr_match = re.search(r"Юридический адрес[^\n]*(?=\n|Почтовый адрес|$)", block)
-            if addr_match:
-                address = addr_match.group(0).strip()
-        if name:
-            data["Данные заказчика"] = name
-            if address:
-                data["Данные заказчика"] += "\n" + address
-
-    inn_match = re.search(r"(ИНН получателя\s*\d+)", text)
+        data["ФИО водителя"] = find(_DRIVER_RE)
+
+    block = _last_customer_block(text)
+    if block is not None:
+        customer = _parse_customer(block)
+        if customer:
+            data["Данные заказчика"] = customer
+
+    inn_match = _INN_RE.search(text)
     if inn_match:
         data["ИНН получателя"] = inn_match.group(1).strip()
 
-    ogrn_match = re.search(r"(ОГРН\s*\d+)", text)
+    ogrn_match = _OGRN_RE.search(text)
     if ogrn_match:
         data["ОГРН получателя"] = ogrn_match.group(1).strip()
 
@@ -228,32 +344,283 @@ def parse_data_from_text(text: str):
     return data
 
 
-def extract_text_from_pdf(path: str) -> str:
-    """Extract text from PDF, using OCR for scanned documents."""
-    text = ""
-    with pdfplumber.open(path) as pdf:
-        for page in pdf.pages:
-            page_text = page.extract_text() or ""
-            if page_text:
-                text += page_text + "\n"
-    if text.strip():
-        return text
+class ExtractionCancelled(Exception):
+    """Raised when extraction is stopped through its ``cancel`` event."""
+
+
+def _check_cancel(cancel):
+    if cancel is not None and cancel.is_set():
+        raise ExtractionCancelled()
+
+
+def _init_ocr_worker():
+    # Tesseract's own OpenMP threads would oversubscribe cores across workers
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+    # Load the OCR engine now rather than with the first page
+    ocr.get_backend()
+
+
+def _get_ocr_pool(workers):
+    """Return the shared OCR process pool with the given number of workers.
+
+    Pools outlive a document, so the workers (and the OCR engine loaded in
+    each of them) are reused for every following PDF.
+    """
+    with _ocr_pools_lock:
+        pool = _ocr_pools.get(workers)
+        if pool is None:
+            pool = _ocr_pools[workers] = ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_ocr_worker
+            )
+        return pool
+
+
+def _discard_ocr_pool(workers, pool):
+    with _ocr_pools_lock:
+        if _ocr_pools.get(workers) is pool:
+            del _ocr_pools[workers]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_ocr_pools(wait=True):
+    """Stop the worker processes kept for OCR."""
+    with _ocr_pools_lock:
+        pools = list(_ocr_pools.values())
+        _ocr_pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=wait, cancel_futures=True)
+
+
+def _ocr_page(path, page_number, dpi, layout=None, page_count=1):
+    """Rasterize a single PDF page and return the recognized text of its OCR layout regions."""
+    return ocr.recognize_page(path, page_number, dpi, layout, page_count)
+
+
+def _iter_ocr_pages(
+    path, page_numbers, dpi, workers, progress=None, cancel=None, layout=None, page_count=1
+):
+    """Yield the OCR text of the given 1-based pages in order.
+
+    With more than one worker, pages are recognized in parallel by a shared
+    pool but only ``OCR_LOOKAHEAD`` pages per worker are submitted ahead of
+    the consumer, so memory does not grow with the page count.
+    """
+    total = len(page_numbers)
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or total <= 1:
+        for i, number in enumerate(page_numbers):
+            _check_cancel(cancel)
+            text = _ocr_page(path, number, dpi, layout, page_count)
+            if progress:
+                progress("ocr", i + 1, total)
+            yield text
+        return
+
+    pool = _get_ocr_pool(workers)
+    futures = deque()
+    try:
+        completed = set()
+        submitted = 0
+        while futures or submitted < total:
+            while submitted < total and len(futures) < workers * OCR_LOOKAHEAD:
+                futures.append(
+                    pool.submit(_ocr_page, path, page_numbers[submitted], dpi, layout, page_count)
+                )
+                submitted += 1
+            running = [f for f in futures if f not in completed]
+            if running:
+                with span("ocr.wait"):
+                    done, _ = wait(running, timeout=0.2, return_when=FIRST_COMPLETED)
+                for future in done:
+                    completed.add(future)
+                    if progress:
+                        progress("ocr", submitted - len(futures) + len(completed), total)
+            _check_cancel(cancel)
+            while futures and futures[0] in completed:
+                future = futures.popleft()
+                completed.discard(future)
+                yield future.result()
+    except BrokenProcessPool:
+        _discard_ocr_pool(workers, pool)
+        raise
+    finally:
+        # On cancel, pages already being recognized finish in the background
+        for future in futures:
+            future.cancel()
+
+
+def _iter_text_layers(path, progress=None, cancel=None):
+    """Yield the text layer of every page, releasing each page's parsed objects."""
+    import pdfplumber
+
+    with span("pdf.open"):
+        pdf = pdfplumber.open(path)
+    with pdf:
+        total = len(pdf.pages)
+        for number, page in enumerate(pdf.pages, 1):
+            _check_cancel(cancel)
+            with span("pdf.text", page=number):
+                page_text = page.extract_text() or ""
+            # pdfplumber keeps every parsed page cached until the file is closed
+            release = getattr(page, "close", None) or getattr(page, "flush_cache", None)
+            if release:
+                release()
+            if progress:
+                progress("text", number, total)
+            yield page_text
+
+
+def _needs_ocr(page_text):
+    return len("".join(page_text.split())) < MIN_TEXT_LAYER_CHARS
+
+
+def iter_text_from_pdf(
+    path: str, dpi: int = OCR_DPI, workers: int = None, progress=None, cancel=None, ocr_layout=None
+):
+    """Yield the text of each PDF page in order, using OCR for pages without a text layer.
+
+    Text layers are read page by page until the first scanned page; the rest
+    are then read at once so that scanned pages can be rasterized (at ``dpi``)
+    and recognized ahead, one page at a time per worker (up to ``workers``
+    processes, default: CPU count), so peak memory does not depend on the
+    page count. ``ocr_layout`` (a name from ``ocr.OCR_LAYOUTS`` or a layout
+    dict) limits OCR to regions of the pages. ``progress(stage, done, total)``
+    is called after each page, with stage ``"text"`` or ``"ocr"``; setting the
+    ``cancel`` event raises ``ExtractionCancelled`` at the next page boundary.
+    Closing the generator early stops reading and OCR of the remaining pages.
+    """
+    layers = _iter_text_layers(path, progress, cancel)
+    ocr_texts = None
+    try:
+        for number, page_text in enumerate(layers, 1):
+            if not _needs_ocr(page_text):
+                yield page_text
+                continue
+            page_texts = [page_text, *layers]
+            page_count = number + len(page_texts) - 1
+            layout = ocr.get_layout(ocr_layout)
+            scanned = [
+                number + i
+                for i, text in enumerate(page_texts)
+                if _needs_ocr(text) and ocr.regions_for(layout, number + i, page_count)
+            ]
+            ocr_texts = _iter_ocr_pages(
+                path, scanned, dpi, workers, progress, cancel, layout, page_count
+            )
+            scanned = set(scanned)
+            for i, page_text in enumerate(page_texts):
+                if number + i in scanned:
+                    ocr_text = next(ocr_texts)
+                    if ocr_text.strip():
+                        page_text = ocr_text
+                yield page_text
+    finally:
+        layers.close()
+        if ocr_texts is not None:
+            ocr_texts.close()
+
+
+class IncrementalParse:
+    """Parses a document page by page and tells when reading can stop.
+
+    Each fed page is appended to the text read so far, which is parsed again
+    (parsing is cheap next to OCR). Reading is complete once every field in
+    ``required`` is filled and the last page changed nothing, so a customer
+    block cut by a page break is not taken half-read.
+    """
+
+    def __init__(self, required=EARLY_EXIT_FIELDS):
+        self.required = required
+        self.parts = []
+        self.data = DEFAULT_DATA.copy()
+        self.complete = False
+
+    @property
+    def text(self):
+        return "".join(self.parts)
+
+    @property
+    def missing(self):
+        """Required fields that are still empty."""
+        return [key for key in self.required if not self.data[key]]
+
+    def feed(self, page_text):
+        """Add the text of the next page; return True once reading can stop."""
+        if not page_text:
+            return self.complete
+        self.parts.append(page_text + "\n")
+        previous = self.data
+        with span("parse.page"):
+            self.data = parse_data_from_text(self.text)
+        self.complete = not self.missing and self.data == previous
+        return self.complete
+
+
+def extract_text_from_pdf(
+    path: str,
+    dpi: int = OCR_DPI,
+    workers: int = None,
+    progress=None,
+    cancel=None,
+    early_exit=False,
+    ocr_layout=None,
+) -> str:
+    """Extract text from PDF, using OCR for pages without a text layer.
+
+    With ``early_exit``, pages are parsed as they arrive and reading (and OCR
+    of the remaining pages) stops once the fields in ``EARLY_EXIT_FIELDS`` (or
+    in ``early_exit`` itself, if it is a list of names) are found; only the
+    text read up to that point is returned. See ``iter_text_from_pdf`` for
+    the other options.
+    """
+    pages = iter_text_from_pdf(
+        path, dpi=dpi, workers=workers, progress=progress, cancel=cancel, ocr_layout=ocr_layout
+    )
+    if not early_exit:
+        return "".join(page_text + "\n" for page_text in pages if page_text)
+    parse = IncrementalParse(EARLY_EXIT_FIELDS if early_exit is True else tuple(early_exit))
+    try:
+        for page_text in pages:
+            if parse.feed(page_text):
+                break
+    finally:
+        pages.close()
+    return parse.text
+
 
-    # Fallback to OCR for scanned PDFs
-    images = convert_from_path(path)
-    for img in images:
-        text += pytesseract.image_to_string(img, lang="rus") + "\n"
-    return text
+def read_data_from_pdf(
+    path: str,
+    dpi: int = OCR_DPI,
+    workers: int = None,
+    progress=None,
+    cancel=None,
+    early_exit=False,
+    ocr_layout=None,
+):
+    text = extract_text_from_pdf(
+        path,
+        dpi=dpi,
+        workers=workers,
+        progress=progress,
+        cancel=cancel,
+        early_exit=early_exit,
+        ocr_layout=ocr_layout,
+    )
+    with span("parse"):
+        return parse_data_from_text(text)
 
 
-def read_data_from_pdf(path: str):
-    text = extract_text_from_pdf(path)
-    return parse_data_from_text(text)
+def preload_backends():
+    """Import the document backends ahead of time, e.g. from a background thread."""
+    import docx  # noqa: F401
+    import pdfplumber  # noqa: F401
 
 
-def read_data_from_file(path: str):
-    if path.lower().endswith(".docx"):
-        return read_data_from_docx(path)
-    if path.lower().endswith(".pdf"):
-        return read_data_from_pdf(path)
-    raise ValueError("Unsupported file format")
+def read_data_from_file(path: str, **pdf_options):
+    """Parse a .docx or .pdf source; pdf_options are passed to the PDF reader."""
+    with span("read", file=os.path.basename(path)):
+        if path.lower().endswith(".docx"):
+            return read_data_from_docx(path)
+        if path.lower().endswith(".pdf"):
+            return read_data_from_pdf(path, **pdf_options)
+        raise ValueError("Unsupported file format")
@@ -0,0 +1,388 @@
+"""Local HTTP service that renders acts and invoices for other tools.
+
+Templates are compiled once at startup. Endpoints::
+
+    GET  /health          {"status": "ok", "templates": {"act": ".xlsx", ...}}
+    POST /parse           source document in the body -> extracted data as JSON
+    POST /render/<name>   source document or a JSON data dict -> rendered file
+
+A source document is sent as the raw request body with its file name in the
+``name`` query parameter (``/render/act?name=contract.pdf``); a body with
+``Content-Type: application/json`` is taken as the placeholder data instead.
+Parsing, OCR and rendering run in a process pool, so requests are handled
+concurrently while the event loop only moves bytes.
+
+This module must not import PyQt5 so it can run on servers without a display.
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import batch
+import ocr
+from excel_utils import RENDER_BACKENDS
+from mailmerge import prepare_row
+from parsers import OCR_DPI, read_data_from_file
+from source_cache import read_data_cached
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_BODY_BYTES = 50 * 1024 * 1024
+MAX_HEADER_BYTES = 64 * 1024
+
+CONTENT_TYPES = {
+    ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+}
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    411: "Length Required",
+    413: "Payload Too Large",
+    415: "Unsupported Media Type",
+    422: "Unprocessable Entity",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _source_path(directory, name, source):
+    name = os.path.basename(name or "")
+    if not name.lower().endswith(batch.SOURCE_EXTENSIONS):
+        raise ValueError("name must end with .docx or .pdf")
+    path = os.path.join(directory, name)
+    with open(path, "wb") as f:
+        f.write(source)
+    return path
+
+
+def json_fields(data):
+    """Return the fields of a JSON render request as placeholder text.
+
+    ``null`` is an empty field and numbers and booleans are written as in
+    JSON; lists and objects are rejected with a 400.
+    """
+    fields = {}
+    for key, value in data.items():
+        if value is None:
+            fields[key] = ""
+        elif isinstance(value, str):
+            fields[key] = value
+        elif isinstance(value, (bool, int, float)):
+            fields[key] = json.dumps(value)
+        else:
+            raise HttpError(400, f"field {key!r} must be a string, number, boolean or null")
+    return fields
+
+
+def parse_source(source, name, pdf_options=None, use_cache=True):
+    """Extract data from the bytes of an uploaded source document."""
+    read_data = read_data_cached if use_cache else read_data_from_file
+    with tempfile.TemporaryDirectory(prefix="word_copywriter_http_") as tmp:
+        return read_data(_source_path(tmp, name, source), **(pdf_options or {}))
+
+
+def render(template, data=None, source=None, name="", pdf_options=None, use_cache=True):
+    """Render template from a data dict or an uploaded source and return the file bytes."""
+    if source is not None:
+        data = parse_source(source, name, pdf_options, use_cache)
+    else:
+        data = prepare_row(data)
+    with tempfile.TemporaryDirectory(prefix="word_copywriter_http_") as tmp:
+        output_path = os.path.join(tmp, "output" + template.ext)
+        template.render(data, output_path)
+        with open(output_path, "rb") as f:
+            return f.read()
+
+
+def _render_in_worker(key, data, source, name, pdf_options, use_cache):
+    return render(batch._worker_templates[key], data, source, name, pdf_options, use_cache)
+
+
+class RenderServer:
+    def __init__(
+        self,
+        templates,
+        workers=None,
+        dpi=OCR_DPI,
+        ocr_layout=None,
+        use_cache=True,
+        max_body=MAX_BODY_BYTES,
+    ):
+        self.templates = templates
+        self.workers = workers or os.cpu_count() or 1
+        # Every request is a single document, so it is OCR'd serially in its worker
+        self.pdf_options = {"dpi": dpi, "workers": 1, "ocr_layout": ocr.get_layout(ocr_layout)}
+        self.use_cache = use_cache
+        self.max_body = max_body
+        self.pool = None
+        self.server = None
+        self._connections = set()
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """Start the worker processes and listen; returns the bound (host, port)."""
+        self.pool = self._new_pool()
+        self.server = await asyncio.start_server(
+            self.handle_connection, host, port, limit=MAX_HEADER_BYTES
+        )
+        return self.server.sockets[0].getsockname()[:2]
+
+    def _new_pool(self):
+        return ProcessPoolExecutor(
+            max_workers=self.workers, initializer=batch._init_worker, initargs=(self.templates,)
+        )
+
+    async def close(self):
+        """Stop listening, drop open connections and stop the workers."""
+        if self.server is not None:
+            self.server.close()
+            for task in self._connections:
+                task.cancel()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+            await self.server.wait_closed()
+        if self.pool is not None:
+            # Queued requests are dropped; ones already running are let finish
+            self.pool.shutdown(wait=True, cancel_futures=True)
+
+    async def handle_connection(self, reader, writer):
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HttpError as e:
+                    await self._respond(writer, e.status, _json_body({"error": str(e)}), keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, target, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                try:
+                    status, content_type, payload = await self.dispatch(method, target, headers, body)
+                except HttpError as e:
+                    status, content_type, payload = e.status, "application/json", _json_body({"error": str(e)})
+                except Exception as e:
+                    status, content_type = 500, "application/json"
+                    payload = _json_body({"error": f"{type(e).__name__}: {e}"})
+                await self._respond(writer, status, payload, content_type, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    async def _read_request(self, reader):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError as e:
+            if e.partial.strip():
+                raise HttpError(400, "incomplete request") from None
+            return None
+        except asyncio.LimitOverrunError:
+            raise HttpError(400, "request headers too large") from None
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _version = lines[0].split(" ", 2)
+        except ValueError:
+            raise HttpError(400, "malformed request line") from None
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                key, value = line.split(":", 1)
+                headers[key.strip().lower()] = value.strip()
+        body = b""
+        if "transfer-encoding" in headers:
+            raise HttpError(411, "send the body with Content-Length")
+        if "content-length" in headers:
+            try:
+                length = int(headers["content-length"])
+            except ValueError:
+                raise HttpError(400, "invalid Content-Length") from None
+            if length > self.max_body:
+                raise HttpError(413, f"body larger than {self.max_body} bytes")
+            body = await reader.readexactly(length)
+        elif method == "POST":
+            raise HttpError(411, "send the body with Content-Length")
+        return method, target, headers, body
+
+    async def _respond(self, writer, status, payload, content_type="application/json", keep_alive=True):
+        head = [
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(payload)}",
+            "Connection: " + ("keep-alive" if keep_alive else "close"),
+        ]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + payload)
+        await writer.drain()
+
+    async def dispatch(self, method, target, headers, body):
+        """Handle one request and return (status, content type, payload)."""
+        url = urlsplit(target)
+        path = unquote(url.path).rstrip("/")
+        query = parse_qs(url.query)
+        name = query.get("name", [""])[0]
+
+        if path == "/health":
+            if method != "GET":
+                raise HttpError(405, "use GET")
+            templates = {key: template.ext for key, template in self.templates.items()}
+            return 200, "application/json", _json_body({"status": "ok", "templates": templates})
+
+        if path == "/parse":
+            if method != "POST":
+                raise HttpError(405, "use POST")
+            _check_name(name)
+            data = await self._run(parse_source, body, name, self.pdf_options, self.use_cache)
+            return 200, "application/json", _json_body(data)
+
+        if path.startswith("/render/"):
+            key = path[len("/render/"):]
+            if key not in self.templates:
+                raise HttpError(404, f"unknown template: {key}")
+            if method != "POST":
+                raise HttpError(405, "use POST")
+            data, source = None, body
+            if headers.get("content-type", "").split(";")[0].strip() == "application/json":
+                try:
+                    data = json.loads(body.decode("utf-8"))
+                except ValueError:
+                    raise HttpError(400, "invalid JSON") from None
+                if not isinstance(data, dict):
+                    raise HttpError(400, "JSON body must be an object")
+                data = json_fields(data)
+                source = None
+            else:
+                _check_name(name)
+            payload = await self._run(
+                _render_in_worker, key, data, source, name, self.pdf_options, self.use_cache
+            )
+            ext = self.templates[key].ext
+            return 200, CONTENT_TYPES[ext], payload
+
+        raise HttpError(404, "not found")
+
+    async def _run(self, fn, *args):
+        """Run fn in the worker pool; documents that fail to process give a 422.
+
+        If a worker process dies (out of memory, a crash in OCR), the pool is
+        replaced and the requests it was running get a 503 and can be retried.
+        """
+        pool = self.pool
+        try:
+            return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+        except BrokenProcessPool:
+            if self.pool is pool:
+                pool.shutdown(wait=False)
+                self.pool = self._new_pool()
+            raise HttpError(503, "a worker process died, retry the request") from None
+        except Exception as e:
+            raise HttpError(422, f"{type(e).__name__}: {e}") from None
+
+
+def _check_name(name):
+    if not name.lower().endswith(batch.SOURCE_EXTENSIONS):
+        raise HttpError(415, "the name parameter must end with .docx or .pdf")
+
+
+def _json_body(value):
+    return json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(
+        description="Serve act and invoice rendering over HTTP on the local machine."
+    )
+    parser.add_argument("--act", help="act template (.xlsx or .docx)")
+    parser.add_argument("--invoice", help="invoice template (.xlsx or .docx)")
+    parser.add_argument(
+        "--template",
+        action="append",
+        default=[],
+        metavar="NAME=PATH",
+        help="another template served at /render/NAME (repeatable)",
+    )
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"address to listen on (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"port (default: {DEFAULT_PORT})")
+    parser.add_argument(
+        "--backend",
+        choices=RENDER_BACKENDS,
+        default="openpyxl",
+        help="xlsx rendering backend (default: openpyxl)",
+    )
+    parser.add_argument("--workers", "-j", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--dpi", type=int, default=OCR_DPI, help=f"OCR resolution (default: {OCR_DPI})")
+    parser.add_argument(
+        "--ocr-layout",
+        choices=sorted(ocr.OCR_LAYOUTS),
+        default="page",
+        help="regions of scanned pages to recognize (default: page, the whole page)",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="do not use the extracted data cache")
+    return parser
+
+
+async def _serve(server, host, port):
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+    host, port = await server.start(host, port)
+    print(f"Serving {', '.join(sorted(server.templates))} on http://{host}:{port}", flush=True)
+    try:
+        await stop.wait()
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    parser = build_arg_parser()
+    args = parser.parse_args(argv)
+    paths = {"act": args.act, "invoice": args.invoice}
+    for item in args.template:
+        key, sep, path = item.partition("=")
+        if not sep or not key or not path:
+            parser.error(f"--template expects NAME=PATH, got {item!r}")
+        paths[key] = path
+    templates = batch.load_templates(paths, args.backend)
+    if not templates:
+        parser.error("no templates given")
+    warning = ocr.backend_warning()
+    if warning:
+        print(f"warning: {warning}", file=sys.stderr, flush=True)
+    server = RenderServer(
+        templates,
+        workers=args.workers,
+        dpi=args.dpi,
+        ocr_layout=args.ocr_layout,
+        use_cache=not args.no_cache,
+    )
+    try:
+        asyncio.run(_serve(server, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
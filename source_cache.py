@@ -0,0 +1,195 @@
+"""Content-addressed on-disk cache of data extracted from source documents.
+
+Entries are keyed by the SHA-256 of the source file plus what else changes
+the result: the PDF reading options (see ``pdf_options_key``) or the
+registered .docx layouts (see ``docx_options_key``). They hold both the raw
+extracted text (for PDFs) and the parsed ``DEFAULT_DATA``-shaped dict. When
+``parsers.PARSER_VERSION`` changes, cached text is re-parsed instead of being
+extracted (and possibly OCR'd) again. The cache is bounded in size and evicts
+the least recently used entries first.
+
+Set ``WORD_COPYWRITER_CACHE=0`` to bypass it and ``WORD_COPYWRITER_CACHE_DIR``
+to move it.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+import docx_layouts
+import ocr
+import parsers
+from tracing import span
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def default_cache_dir():
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "word_copywriter", "sources")
+
+
+def file_digest(path):
+    """Return the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def pdf_options_key(pdf_options):
+    """Return the PDF reading options that change the extracted text, as plain data."""
+    early_exit = pdf_options.get("early_exit") or False
+    if early_exit:
+        # Early-exit text stops at the last page read, so it is kept apart from full reads
+        early_exit = sorted(parsers.EARLY_EXIT_FIELDS if early_exit is True else early_exit)
+    return {
+        "dpi": pdf_options.get("dpi") or parsers.OCR_DPI,
+        "early_exit": early_exit,
+        # The whole layout, so a changed layout registered under the same name is not mixed up
+        "ocr_layout": ocr.get_layout(pdf_options.get("ocr_layout")),
+    }
+
+
+def docx_options_key():
+    """Return the .docx layouts that decide the parsed fields, as plain data."""
+    return {"layouts": docx_layouts.LAYOUTS}
+
+
+def entry_key(path, digest, pdf_options):
+    """Return the cache key of a source with the given content digest and options."""
+    if path.lower().endswith(".pdf"):
+        key = pdf_options_key(pdf_options)
+    else:
+        key = docx_options_key()
+    options = json.dumps(key, sort_keys=True, ensure_ascii=False)
+    return digest + "-" + hashlib.sha256(options.encode("utf-8")).hexdigest()[:16]
+
+
+class SourceCache:
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES, enabled=True):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+
+    def _entry_path(self, key):
+        return os.path.join(self.directory, key + ".json")
+
+    def lookup(self, key):
+        """Return the cached entry for key or None, marking it as recently used."""
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(entry_path)
+        except (OSError, ValueError):
+            return None
+        return entry
+
+    def store(self, key, text, data):
+        """Atomically write an entry and evict old ones if the cache is too big."""
+        os.makedirs(self.directory, exist_ok=True)
+        entry = {"parser_version": parsers.PARSER_VERSION, "text": text, "data": data}
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, self._entry_path(key))
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        total = 0
+        try:
+            with os.scandir(self.directory) as it:
+                for item in it:
+                    if not item.name.endswith(".json"):
+                        continue
+                    try:
+                        st = item.stat()
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, item.path))
+                    total += st.st_size
+        except OSError:
+            return
+        entries.sort()
+        for _mtime, size, entry_path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(entry_path)
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        """Remove every cached entry."""
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            if name.endswith((".json", ".tmp")):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def read_data(self, path, **pdf_options):
+        """Return parsed data for a source file, extracting it only on a cache miss."""
+        if not self.enabled:
+            return parsers.read_data_from_file(path, **pdf_options)
+        with span("cache.lookup"):
+            key = entry_key(path, file_digest(path), pdf_options)
+            entry = self.lookup(key)
+        if entry and entry.get("parser_version") == parsers.PARSER_VERSION:
+            return entry["data"]
+
+        is_pdf = path.lower().endswith(".pdf")
+        if entry and entry.get("text") is not None and is_pdf:
+            text = entry["text"]
+        elif is_pdf:
+            text = parsers.extract_text_from_pdf(path, **pdf_options)
+        else:
+            text = None
+        if text is not None:
+            with span("parse"):
+                data = parsers.parse_data_from_text(text)
+        else:
+            data = parsers.read_data_from_file(path)
+        try:
+            with span("cache.store"):
+                self.store(key, text, data)
+        except OSError:
+            pass
+        return data
+
+
+def get_default_cache():
+    """Return the process-wide cache configured from the environment."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = SourceCache(
+                os.environ.get("WORD_COPYWRITER_CACHE_DIR") or None,
+                enabled=os.environ.get("WORD_COPYWRITER_CACHE", "1") != "0",
+            )
+        return _default_cache
+
+
+def read_data_cached(path, **pdf_options):
+    """Cached equivalent of ``parsers.read_data_from_file``."""
+    return get_default_cache().read_data(path, **pdf_options)
@@ -0,0 +1,194 @@
+"""Compiled output templates shared by the GUI and the headless entry points.
+
+Also names the output files and renders every template from one source
+(``render_all``), so the GUI does not depend on the batch CLI.
+"""
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from doc_utils import CompiledDocument
+from excel_utils import compile_substitution, compile_workbook
+
+TEMPLATE_EXTENSIONS = (".xlsx", ".docx")
+# File names for render_all; {{Шаблон}} is the template's title
+DEFAULT_NAME_PATTERN = "{{Шаблон}} {{Номер документа}}"
+TEMPLATE_TITLES = {"act": "Акт", "invoice": "Счёт"}
+BUNDLE_TITLE = "Документы"
+
+_INVALID_NAME_RE = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def compile_template_bytes(template_bytes, ext, path=None, backend="openpyxl"):
+    """Compile raw template contents according to their extension."""
+    if ext == ".xlsx":
+        return compile_workbook(template_bytes, path, backend)
+    if ext == ".docx":
+        return CompiledDocument(template_bytes, path)
+    raise ValueError("Only .xlsx and .docx templates are supported")
+
+
+def compile_template(path, backend="openpyxl"):
+    """Return the compiled template for path, reusing it while the file is unchanged.
+
+    The cache is keyed by absolute path and backend and validated by mtime and
+    size; when those change the file is re-read and only recompiled if its
+    SHA-256 differs. ``backend`` selects how .xlsx templates are rendered:
+    ``"openpyxl"`` or ``"stream"`` (direct XML patching); .docx templates
+    have a single renderer and ignore it.
+    """
+    path = os.path.abspath(path)
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in TEMPLATE_EXTENSIONS:
+        raise ValueError("Only .xlsx and .docx templates are supported")
+    st = os.stat(path)
+    signature = (st.st_mtime_ns, st.st_size)
+    with _cache_lock:
+        entry = _cache.get((path, backend))
+    if entry and entry["signature"] == signature:
+        return entry["template"]
+
+    with open(path, "rb") as f:
+        template_bytes = f.read()
+    digest = hashlib.sha256(template_bytes).hexdigest()
+    if entry and entry["digest"] == digest:
+        template = entry["template"]
+    else:
+        template = compile_template_bytes(template_bytes, ext, path, backend)
+    with _cache_lock:
+        _cache[(path, backend)] = {"signature": signature, "digest": digest, "template": template}
+    return template
+
+
+def clear_template_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def output_name(pattern, data, number, ext):
+    """Return a file name for a row from a pattern such as ``Акт {{Номер документа}}``.
+
+    ``{{#}}`` is the 1-based row number. Characters not allowed in file names
+    are replaced with ``_``.
+    """
+    name = compile_substitution({**data, "#": number})(pattern)
+    name = _INVALID_NAME_RE.sub("_", name).strip().rstrip(". ")
+    if not name:
+        name = str(number)
+    if not name.lower().endswith(ext):
+        name += ext
+    return name
+
+
+def unique_name(name, used):
+    """Return name, or name with a ``_2``, ``_3``... suffix if it is in used, and add it to used.
+
+    ``used`` holds lower-cased names, as file names are case-insensitive on Windows.
+    """
+    stem, ext = os.path.splitext(name)
+    candidate = name
+    n = 2
+    while candidate.lower() in used:
+        candidate = f"{stem}_{n}{ext}"
+        n += 1
+    used.add(candidate.lower())
+    return candidate
+
+
+class NameClaims:
+    """Output paths taken during one batch, shared by its worker processes.
+
+    A path is claimed by creating a marker file for it exclusively, which is
+    atomic across processes, so two sources never get the same output. With
+    ``skip_existing``, files already on disk count as claimed too, so outputs
+    of earlier runs are not overwritten either.
+    """
+
+    def __init__(self, directory=None, skip_existing=False):
+        self.directory = directory or tempfile.mkdtemp(prefix="word_copywriter_names_")
+        self.skip_existing = skip_existing
+
+    def claim(self, path):
+        """Claim path; return False if it was already claimed."""
+        if self.skip_existing and os.path.exists(path):
+            return False
+        key = os.path.normcase(os.path.abspath(path)).lower().encode("utf-8")
+        marker = os.path.join(self.directory, hashlib.sha256(key).hexdigest())
+        try:
+            os.close(os.open(marker, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            return False
+        return True
+
+    def unique(self, path):
+        """Claim and return path, or path with a ``_2``, ``_3``... suffix if it is taken."""
+        stem, ext = os.path.splitext(path)
+        candidate = path
+        n = 2
+        while not self.claim(candidate):
+            candidate = f"{stem}_{n}{ext}"
+            n += 1
+        return candidate
+
+    def close(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def output_names(templates, data, pattern=DEFAULT_NAME_PATTERN, bundle=False):
+    """Return the file names ``render_all`` writes, by template key (and ``"zip"``)."""
+    used = set()
+    names = {}
+    for key, template in templates.items():
+        values = {**data, "Шаблон": TEMPLATE_TITLES.get(key, key)}
+        names[key] = unique_name(output_name(pattern, values, 1, template.ext), used)
+    if bundle:
+        names["zip"] = output_name(pattern, {**data, "Шаблон": BUNDLE_TITLE}, 1, ".zip")
+    return names
+
+
+def render_all(templates, data, output_dir, pattern=DEFAULT_NAME_PATTERN, bundle=False, claims=None):
+    """Render every template from the same data at once and return their paths by key.
+
+    File names come from ``pattern`` (see ``output_name``), where
+    ``{{Шаблон}}`` is the template's title. With ``bundle`` the files are put
+    into a single zip in output_dir instead, and every key maps to the zip.
+    With ``claims`` (a ``NameClaims``), names already used by other sources
+    of the batch get a numeric suffix.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    if not templates:
+        return {}
+    names = output_names(templates, data, pattern, bundle)
+    if claims is not None:
+        for key in ["zip"] if bundle else templates:
+            names[key] = os.path.basename(claims.unique(os.path.join(output_dir, names[key])))
+    target_dir = tempfile.mkdtemp(prefix="word_copywriter_", dir=output_dir) if bundle else output_dir
+    outputs = {key: os.path.join(target_dir, names[key]) for key in templates}
+    try:
+        with ThreadPoolExecutor(max_workers=len(templates)) as pool:
+            futures = [
+                pool.submit(template.render, data, outputs[key]) for key, template in templates.items()
+            ]
+            for future in futures:
+                future.result()
+        if not bundle:
+            return outputs
+        zip_path = os.path.join(output_dir, names["zip"])
+        tmp_zip = os.path.join(target_dir, names["zip"])
+        # Office files are already compressed
+        with zipfile.ZipFile(tmp_zip, "w", zipfile.ZIP_STORED) as zf:
+            for path in outputs.values():
+                zf.write(path, os.path.basename(path))
+        os.replace(tmp_zip, zip_path)
+        return {key: zip_path for key in outputs}
+    finally:
+        if bundle:
+            shutil.rmtree(target_dir, ignore_errors=True)
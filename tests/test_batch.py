@@ -0,0 +1,154 @@
+import multiprocessing
+import os
+import sys
+import time
+import zipfile
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from docx import Document
+from openpyxl import Workbook, load_workbook
+
+import batch
+
+
+def make_source(path):
+    doc = Document()
+    doc.add_paragraph("Договор-заявка № 15 от 01.02.2024")
+    route = doc.add_table(rows=12, cols=5)
+    route.cell(8, 0).text = "г. Москва"
+    route.cell(8, 4).text = "г. Казань"
+    route.cell(10, 0).text = "01.02.2024"
+    route.cell(10, 4).text = "03.02.2024"
+    route.cell(11, 4).text = "50 000 руб."
+    doc.save(path)
+
+
+def make_template(path):
+    wb = Workbook()
+    wb.active["A1"] = "Маршрут {{Адрес загрузки}} - {{Адрес разгрузки}}"
+    wb.active["A2"] = "{{Цена}}"
+    wb.save(path)
+
+
+def test_run_batch_renders_templates_and_reports_missing(tmp_path):
+    src_dir = tmp_path / "in"
+    src_dir.mkdir()
+    make_source(src_dir / "contract.docx")
+    (src_dir / "notes.txt").write_text("ignored")
+    make_template(tmp_path / "act.xlsx")
+
+    sources = batch.find_sources(str(src_dir))
+    templates = batch.load_templates({"act": str(tmp_path / "act.xlsx"), "invoice": None})
+    results = batch.run_batch(
+        sources, templates, str(tmp_path / "out"), workers=1, use_cache=False
+    )
+
+    assert [os.path.basename(r["source"]) for r in results] == ["contract.docx"]
+    result = results[0]
+    assert result["ok"], result["error"]
+    assert "ФИО водителя" in result["missing"]
+    ws = load_workbook(result["outputs"]["act"]).active
+    assert ws["A1"].value == "Маршрут г. Москва - г. Казань"
+    assert ws["A2"].value == "50000"
+
+
+def test_read_manifest_resolves_relative_paths(tmp_path):
+    manifest = tmp_path / "list.txt"
+    manifest.write_text("# comment\n\na.pdf\nsub/b.docx\n", encoding="utf-8")
+    assert batch.read_manifest(str(manifest)) == [
+        str(tmp_path / "a.pdf"),
+        str(tmp_path / "sub" / "b.docx"),
+    ]
+
+
+def test_render_all_names_outputs_by_document_number_and_bundles(tmp_path):
+    make_template(tmp_path / "act.xlsx")
+    template = batch.load_templates({"act": str(tmp_path / "act.xlsx")})["act"]
+    templates = {"act": template, "invoice": template, "extra": template}
+    data = {"Номер документа": "№ 7/2 от 01.02.2024", "Адрес загрузки": "Тверь", "Цена": "10"}
+
+    outputs = batch.render_all(templates, data, str(tmp_path / "out"))
+    assert {k: os.path.basename(p) for k, p in outputs.items()} == {
+        "act": "Акт № 7_2 от 01.02.2024.xlsx",
+        "invoice": "Счёт № 7_2 от 01.02.2024.xlsx",
+        "extra": "extra № 7_2 от 01.02.2024.xlsx",
+    }
+    assert load_workbook(outputs["invoice"]).active["A2"].value == "10"
+
+    bundled = batch.render_all(templates, data, str(tmp_path / "zip"), "{{Шаблон}}", bundle=True)
+    zip_path = str(tmp_path / "zip" / "Документы.zip")
+    assert set(bundled.values()) == {zip_path}
+    assert os.listdir(tmp_path / "zip") == ["Документы.zip"]
+    with zipfile.ZipFile(zip_path) as zf:
+        assert sorted(zf.namelist()) == ["extra.xlsx", "Акт.xlsx", "Счёт.xlsx"]
+
+
+def test_recursive_sources_keep_their_subfolders(tmp_path):
+    for folder in ("a", "b"):
+        (tmp_path / "in" / folder).mkdir(parents=True)
+        make_source(tmp_path / "in" / folder / "contract.docx")
+    make_template(tmp_path / "act.xlsx")
+    sources = batch.find_sources(str(tmp_path / "in"), recursive=True)
+    templates = batch.load_templates({"act": str(tmp_path / "act.xlsx")})
+
+    results = batch.run_batch(sources, templates, str(tmp_path / "out"), workers=1, use_cache=False)
+    assert [r["outputs"]["act"] for r in results] == [
+        str(tmp_path / "out" / "a" / "contract_act.xlsx"),
+        str(tmp_path / "out" / "b" / "contract_act.xlsx"),
+    ]
+    assert all(os.path.exists(r["outputs"]["act"]) for r in results)
+    assert batch.output_dirs([str(tmp_path / "x.pdf")], "out") == ["out"]
+
+
+def test_run_batch_gives_sources_with_the_same_number_their_own_files(tmp_path):
+    src_dir = tmp_path / "in"
+    src_dir.mkdir()
+    make_source(src_dir / "a.docx")
+    make_source(src_dir / "b.docx")
+    make_template(tmp_path / "act.xlsx")
+    template = str(tmp_path / "act.xlsx")
+    templates = batch.load_templates({"act": template, "invoice": template})
+    sources = batch.find_sources(str(src_dir))
+
+    results = batch.run_batch(
+        sources,
+        templates,
+        str(tmp_path / "out"),
+        workers=2,
+        use_cache=False,
+        name_pattern=batch.DEFAULT_NAME_PATTERN,
+    )
+    outputs = [path for r in results for path in r["outputs"].values()]
+    assert len(set(outputs)) == 4
+    assert sorted(os.listdir(tmp_path / "out")) == sorted(os.path.basename(p) for p in outputs)
+    assert "Акт № 15 от 01.02.2024_2.xlsx" in os.listdir(tmp_path / "out")
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != "fork", reason="needs forked workers")
+def test_run_batch_survives_a_worker_crash(tmp_path, monkeypatch):
+    src_dir = tmp_path / "in"
+    src_dir.mkdir()
+    for name in ("a", "b", "c", "d", "e"):
+        make_source(src_dir / f"{name}.docx")
+    make_template(tmp_path / "act.xlsx")
+    templates = batch.load_templates({"act": str(tmp_path / "act.xlsx")})
+    process_file = batch.process_file
+
+    def crash_on_c(source, *args):
+        if source.endswith("b.docx"):
+            # Still running when c kills its worker
+            time.sleep(0.5)
+        if source.endswith("c.docx"):
+            os._exit(1)
+        return process_file(source, *args)
+
+    monkeypatch.setattr(batch, "process_file", crash_on_c)
+    sources = batch.find_sources(str(src_dir))
+    results = batch.run_batch(sources, templates, str(tmp_path / "out"), workers=2, use_cache=False)
+
+    assert [r["source"] for r in results] == sources
+    assert [r["ok"] for r in results] == [True, True, False, True, True]
+    assert results[2]["error"].startswith("BrokenProcessPool")
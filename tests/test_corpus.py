@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import corpus
+import parsers
+
+
+@pytest.mark.parametrize("kind", ["docx", "text-pdf"])
+def test_corpus_sources_parse_back_to_their_fields(tmp_path, kind):
+    for i in range(5):
+        fields = corpus.make_contract_data(i)
+        path = str(tmp_path / (f"{i}.docx" if kind == "docx" else f"{i}.pdf"))
+        corpus.write_source(path, kind, fields, pages=2)
+        assert parsers.read_data_from_file(path) == corpus.expected_data(fields)
@@ -0,0 +1,63 @@
+import os
+import pickle
+import sys
+from io import BytesIO
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from docx import Document
+
+import doc_utils
+import templates
+
+
+def make_template(path):
+    doc = Document()
+    para = doc.add_paragraph()
+    para.add_run("Счёт {{Но")
+    bold = para.add_run("мер документа}} на {")
+    bold.bold = True
+    para.add_run("{Цена}} руб. {{Неизвестно}}")
+    table = doc.add_table(rows=1, cols=1)
+    inner = table.cell(0, 0).add_table(rows=1, cols=1)
+    inner.cell(0, 0).text = "Заказчик: {{Данные заказчика}}"
+    doc.sections[0].header.paragraphs[0].text = "Договор {{Номер документа}}"
+    doc.sections[0].footer.paragraphs[0].text = "{{ФИО водителя}}"
+    doc.save(path)
+
+
+def test_replace_placeholders_handles_split_runs_nested_tables_and_headers(tmp_path):
+    make_template(tmp_path / "t.docx")
+    doc = Document(str(tmp_path / "t.docx"))
+    doc_utils.replace_placeholders(
+        doc,
+        {"Номер документа": "№ 5", "Цена": 100, "Данные заказчика": "ИП Иванов\nг. Москва", "ФИО водителя": "Петров"},
+    )
+    para = doc.paragraphs[0]
+    assert para.text == "Счёт № 5 на 100 руб. {{Неизвестно}}"
+    assert [run.text for run in para.runs] == ["Счёт № 5", " на 100", " руб. {{Неизвестно}}"]
+    assert para.runs[1].bold
+    inner = doc.tables[0].cell(0, 0).tables[0].cell(0, 0)
+    assert inner.text == "Заказчик: ИП Иванов\nг. Москва"
+    assert doc.sections[0].header.paragraphs[0].text == "Договор № 5"
+    assert doc.sections[0].footer.paragraphs[0].text == "Петров"
+
+
+def test_compiled_document_renders_repeatedly_and_pickles(tmp_path):
+    make_template(tmp_path / "t.docx")
+    template = templates.compile_template(str(tmp_path / "t.docx"))
+    assert template.ext == ".docx"
+    assert template.placeholders == {
+        "Номер документа", "Цена", "Неизвестно", "Данные заказчика", "ФИО водителя"
+    }
+
+    template.render({"Номер документа": "№ 1", "Данные заказчика": "А\nБ"}, str(tmp_path / "1.docx"))
+    template.render({"Номер документа": "№ 2"}, str(tmp_path / "2.docx"))
+    second = Document(str(tmp_path / "2.docx"))
+    assert second.paragraphs[0].text == "Счёт № 2 на {{Цена}} руб. {{Неизвестно}}"
+    assert second.tables[0].cell(0, 0).tables[0].cell(0, 0).text == "Заказчик: {{Данные заказчика}}"
+
+    clone = pickle.loads(pickle.dumps(template))
+    out = BytesIO()
+    clone.render({"Цена": "7"}, out)
+    assert Document(out).paragraphs[0].text == "Счёт {{Номер документа}} на 7 руб. {{Неизвестно}}"
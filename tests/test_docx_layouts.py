@@ -0,0 +1,99 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from docx import Document
+
+import docx_layouts
+import parsers
+
+
+def make_default_contract(path):
+    doc = Document()
+    doc.add_paragraph("Договор-заявка № 15 от 01.02.2024")
+    route = doc.add_table(rows=12, cols=5)
+    route.cell(8, 0).text = "г. Москва"
+    route.cell(8, 4).text = "г. Казань"
+    route.cell(10, 0).text = "01.02.2024"
+    route.cell(10, 4).text = "03.02.2024"
+    route.cell(11, 4).text = "50 000 руб."
+    vehicle = doc.add_table(rows=2, cols=3)
+    vehicle.cell(0, 1).text = "Volvo"
+    vehicle.cell(0, 2).text = "АВ1234"
+    vehicle.cell(1, 1).text = "Петров Пётр"
+    parties = doc.add_table(rows=1, cols=2)
+    parties.cell(0, 1).text = (
+        "Заказчик: ИП Иванов\nПочтовый адрес: г. Москва\nИНН получателя 7701234567\nОГРН 102770"
+    )
+    doc.save(path)
+
+
+def test_default_layout_reads_fixed_cells(tmp_path):
+    make_default_contract(tmp_path / "c.docx")
+    data = parsers.read_data_from_docx(str(tmp_path / "c.docx"))
+    assert data["Номер документа"] == "№ 15 от 01.02.2024"
+    assert data["Адрес загрузки"] == "г. Москва"
+    assert data["Адрес разгрузки"] == "г. Казань"
+    assert data["Стоимость перевозки"] == "50 000 руб."
+    assert data["Цена"] == "50000"
+    assert data["Номер полуприцепа"] == "АВ1234"
+    assert data["ФИО водителя"] == "Петров Пётр"
+    assert data["Данные заказчика"] == "ИП Иванов"
+    assert data["ИНН получателя"] == "ИНН получателя 7701234567"
+    assert data["ОГРН получателя"] == "ОГРН 102770"
+
+
+def test_labelled_layout_is_detected(tmp_path):
+    doc = Document()
+    table = doc.add_table(rows=4, cols=2)
+    table.cell(0, 0).text = "Адрес загрузки"
+    table.cell(0, 1).text = "Адрес разгрузки"
+    table.cell(1, 0).text = "г. Тверь"
+    table.cell(1, 1).text = "г. Омск"
+    table.cell(2, 0).text = "ФИО водителя"
+    table.cell(2, 1).text = "Сидоров Сидор"
+    table.cell(3, 0).text = "Стоимость перевозки"
+    table.cell(3, 1).text = "7 000 руб."
+    doc.save(tmp_path / "c.docx")
+
+    index = docx_layouts.DocumentIndex.from_document(Document(str(tmp_path / "c.docx")))
+    assert docx_layouts.detect_layout(index)["name"] == "labelled"
+    data = parsers.read_data_from_docx(str(tmp_path / "c.docx"))
+    assert data["Адрес загрузки"] == "г. Тверь"
+    assert data["Адрес разгрузки"] == "г. Омск"
+    assert data["ФИО водителя"] == "Сидоров Сидор"
+    assert data["Цена"] == "7000"
+
+
+def test_index_cells_follow_merged_grid():
+    index = docx_layouts.DocumentIndex([], [(3, ["a", "a", "b", "c", "d", "e"])])
+    assert index.cell(0, 0, 1) == "a"
+    assert index.cell(0, 1, 2) == "e"
+    assert index.cell(0, 2, 0) is None
+    assert index.cell(1, 0, 0) is None
+    assert index.find_label("b") == (0, 0, 2)
+
+
+def test_read_index_matches_python_docx_and_stops_after_fields(tmp_path):
+    make_default_contract(tmp_path / "c.docx")
+    doc = Document(str(tmp_path / "c.docx"))
+    route = doc.tables[0]
+    route.cell(0, 0).merge(route.cell(1, 2)).text = "merged\nheader"
+    route.cell(9, 0).add_table(rows=1, cols=1).cell(0, 0).text = "nested"
+    cost = route.cell(11, 4).paragraphs[0]
+    cost.add_run().add_break()
+    cost.add_run("прописью").add_tab()
+    doc.add_paragraph("Договор-заявка № 16")
+    doc.save(tmp_path / "c.docx")
+
+    expected = docx_layouts.DocumentIndex.from_document(Document(str(tmp_path / "c.docx")))
+    never = {"name": "never", "fields": {"x": {"paragraph": "-"}}}
+    full = docx_layouts.read_index(str(tmp_path / "c.docx"), never)
+    assert full.paragraphs == expected.paragraphs
+    assert full.tables == expected.tables
+
+    index = docx_layouts.read_index(str(tmp_path / "c.docx"))
+    assert len(index.tables) == 3
+    assert index.paragraphs == expected.paragraphs[:-1]
+    assert docx_layouts.extract_fields(index) == docx_layouts.extract_fields(expected)
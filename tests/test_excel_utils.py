@@ -0,0 +1,143 @@
+import os
+import sys
+import zipfile
+from io import BytesIO
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from openpyxl import Workbook, load_workbook
+
+import excel_utils
+
+
+def test_substitution_replaces_known_keys_in_one_pass():
+    substitute = excel_utils.compile_substitution(
+        {"Цена": "100", "Номер документа": "№ 7", "A": "{{Цена}}"}
+    )
+    assert substitute("Счёт {{Номер документа}} на {{Цена}} руб.") == "Счёт № 7 на 100 руб."
+    assert substitute("{{Неизвестно}} {{A}}") == "{{Неизвестно}} {{Цена}}"
+    assert substitute("без шаблона") == "без шаблона"
+
+
+def test_replace_placeholders_skips_non_string_cells():
+    wb = Workbook()
+    ws = wb.active
+    ws["A1"] = "{{Цена}} / {{Цена}}"
+    ws["A2"] = 42
+    ws["A3"] = "plain"
+    excel_utils.replace_placeholders(wb, {"Цена": "100"})
+    assert ws["A1"].value == "100 / 100"
+    assert ws["A2"].value == 42
+    assert ws["A3"].value == "plain"
+
+
+SHARED_STRINGS_XLSX = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet2.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/sharedStrings.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>'
+        "</Types>"
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        "</Relationships>"
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Акт" sheetId="1" r:id="rId1"/>'
+        '<sheet name="Скрытый" sheetId="2" state="hidden" r:id="rId2"/></sheets></workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet2.xml"/>'
+        '<Relationship Id="rId3" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings" Target="sharedStrings.xml"/>'
+        "</Relationships>"
+    ),
+    "xl/worksheets/sheet1.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+        '<row r="1"><c r="A1" t="s"><v>0</v></c><c r="B1" t="s"><v>1</v></c></row>'
+        '<row r="2"><c r="A2" t="s"><v>2</v></c><c r="B2"><v>5</v></c></row>'
+        '<row r="3"><c r="A3" t="inlineStr"><is><t>{{Номер документа}}</t></is></c></row>'
+        "</sheetData></worksheet>"
+    ),
+    "xl/worksheets/sheet2.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+        '<row r="1"><c r="A1" t="s"><v>0</v></c></row>'
+        "</sheetData></worksheet>"
+    ),
+    "xl/sharedStrings.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" count="4" uniqueCount="3">'
+        "<si><t>Счёт {{Номер документа}} &amp; {{Цена}}</t></si>"
+        "<si><t>без подстановок</t></si>"
+        '<si><r><t xml:space="preserve">Заказчик: {{Данные </t></r>'
+        "<r><rPr><b/></rPr><t>заказчика}}</t></r></si>"
+        "</sst>"
+    ),
+}
+
+
+def make_shared_strings_template():
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, content in SHARED_STRINGS_XLSX.items():
+            zf.writestr(name, content)
+    return buffer.getvalue()
+
+
+def read_values(path):
+    wb = load_workbook(path)
+    return {
+        (ws.title, cell.coordinate): cell.value
+        for ws in wb.worksheets
+        for row in ws.iter_rows()
+        for cell in row
+        if cell.value is not None
+    }, {ws.title: ws.sheet_state for ws in wb.worksheets}
+
+
+def test_stream_backend_matches_openpyxl_values(tmp_path):
+    template_bytes = make_shared_strings_template()
+    data = {
+        "Номер документа": "№ 5 <срочно>",
+        "Цена": "100",
+        "Данные заказчика": "ООО Ромашка\nг. Москва",
+    }
+    for backend in excel_utils.RENDER_BACKENDS:
+        excel_utils.create_document(
+            template_bytes, ".xlsx", data, str(tmp_path / f"{backend}.xlsx"), backend=backend
+        )
+    stream_values, stream_states = read_values(tmp_path / "stream.xlsx")
+    openpyxl_values, openpyxl_states = read_values(tmp_path / "openpyxl.xlsx")
+    assert stream_values == openpyxl_values
+    assert stream_states == openpyxl_states == {"Акт": "visible", "Скрытый": "visible"}
+    assert stream_values[("Акт", "A1")] == "Счёт № 5 <срочно> & 100"
+    assert stream_values[("Акт", "A2")] == "Заказчик: ООО Ромашка\nг. Москва"
+
+
+def test_stream_backend_copies_untouched_members(tmp_path):
+    template_bytes = make_shared_strings_template()
+    excel_utils.create_document(
+        template_bytes, ".xlsx", {}, str(tmp_path / "out.xlsx"), backend="stream"
+    )
+    with zipfile.ZipFile(tmp_path / "out.xlsx") as zf, zipfile.ZipFile(BytesIO(template_bytes)) as src:
+        assert zf.testzip() is None
+        for name, content in SHARED_STRINGS_XLSX.items():
+            if name != "xl/workbook.xml":
+                assert zf.read(name) == content.encode("utf-8")
+            if name not in ("xl/workbook.xml", "xl/sharedStrings.xml"):
+                # Copied as stored, not compressed again
+                assert zf.getinfo(name).compress_size == src.getinfo(name).compress_size
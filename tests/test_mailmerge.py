@@ -0,0 +1,99 @@
+import multiprocessing
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+from openpyxl import Workbook, load_workbook
+
+import mailmerge
+import templates
+
+
+def make_template(path):
+    wb = Workbook()
+    wb.active.title = "Акт"
+    wb.active["A1"] = "Акт {{Номер документа}}"
+    wb.active["A2"] = "{{Цена}}"
+    wb.save(path)
+
+
+def write_register(path, rows):
+    path.write_text(
+        "Номер документа;Стоимость перевозки\n" + "".join(f"{a};{b}\n" for a, b in rows),
+        encoding="utf-8-sig",
+    )
+
+
+def test_iter_rows_reads_csv_and_derives_price(tmp_path):
+    write_register(tmp_path / "r.csv", [("№ 1", "10 000 руб."), ("", "")])
+    rows = list(mailmerge.iter_rows(str(tmp_path / "r.csv")))
+    assert len(rows) == 1
+    assert rows[0]["Номер документа"] == "№ 1"
+    assert rows[0]["Цена"] == "10000"
+    assert rows[0]["ФИО водителя"] == ""
+
+
+def test_merge_files_names_outputs_from_pattern(tmp_path):
+    make_template(tmp_path / "act.xlsx")
+    write_register(tmp_path / "r.csv", [("№ 1/3", "100 руб."), ("№ 1/3", "200 руб."), ("", "5")])
+    template = templates.compile_template(str(tmp_path / "act.xlsx"))
+    summary = mailmerge.merge_files(
+        template,
+        mailmerge.iter_rows(str(tmp_path / "r.csv")),
+        str(tmp_path / "out"),
+        pattern="Акт {{Номер документа}}",
+        workers=1,
+    )
+    assert summary == {"rendered": 3, "failed": []}
+    assert set(os.listdir(tmp_path / "out")) == {"Акт.xlsx", "Акт № 1_3.xlsx", "Акт № 1_3_2.xlsx"}
+    assert load_workbook(tmp_path / "out" / "Акт № 1_3_2.xlsx").active["A2"].value == "200"
+
+
+def test_merge_sheets_writes_one_sheet_per_row(tmp_path):
+    make_template(tmp_path / "act.xlsx")
+    rows = [{"Номер документа": "№ 1"}, {"Номер документа": "№ 2"}]
+    count = mailmerge.merge_sheets(
+        str(tmp_path / "act.xlsx"),
+        (mailmerge.prepare_row(r) for r in rows),
+        str(tmp_path / "all.xlsx"),
+        pattern="{{Номер документа}}",
+    )
+    assert count == 2
+    wb = load_workbook(tmp_path / "all.xlsx")
+    assert wb.sheetnames == ["№ 1", "№ 2"]
+    assert wb["№ 2"]["A1"].value == "Акт № 2"
+
+
+def test_merge_sheets_does_not_rename_copies_after_template_sheets(tmp_path):
+    make_template(tmp_path / "act.xlsx")
+    rows = [{"Номер документа": "№ 1"}, {"Номер документа": "№ 2"}]
+    mailmerge.merge_sheets(
+        str(tmp_path / "act.xlsx"),
+        (mailmerge.prepare_row(r) for r in rows),
+        str(tmp_path / "all.xlsx"),
+        pattern="Акт",
+    )
+    assert load_workbook(tmp_path / "all.xlsx").sheetnames == ["Акт (2)", "Акт (3)"]
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != "fork", reason="needs forked workers")
+def test_merge_files_survives_a_worker_crash(tmp_path, monkeypatch):
+    make_template(tmp_path / "act.xlsx")
+    template = templates.compile_template(str(tmp_path / "act.xlsx"))
+    render_row = mailmerge.render_row
+
+    def crash_on_row_3(template, number, *args):
+        if number == 3:
+            os._exit(1)
+        return render_row(template, number, *args)
+
+    monkeypatch.setattr(mailmerge, "render_row", crash_on_row_3)
+    rows = [mailmerge.prepare_row({"Номер документа": f"№ {n}"}) for n in range(1, 21)]
+    summary = mailmerge.merge_files(template, rows, str(tmp_path / "out"), workers=2)
+
+    assert summary["rendered"] == 19
+    assert [r["row"] for r in summary["failed"]] == [3]
+    assert summary["failed"][0]["error"].startswith("BrokenProcessPool")
+    assert len(os.listdir(tmp_path / "out")) == 19
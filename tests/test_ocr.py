@@ -0,0 +1,87 @@
+import os
+import sys
+
+import pytest
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import ocr
+
+
+def make_page(skew=0.0):
+    img = Image.new("L", (800, 1100), 255)
+    draw = ImageDraw.Draw(img)
+    for i in range(20):
+        y = 60 + i * 40
+        draw.rectangle((60, y, 60 + 300 + (i * 37) % 380, y + 14), fill=20)
+    return img.rotate(skew, resample=Image.BICUBIC, fillcolor=255)
+
+
+def test_prepare_page_straightens_skewed_scans_and_binarizes():
+    assert ocr.estimate_skew(make_page()) == 0
+    assert ocr.estimate_skew(make_page(2.5)) == -2.5
+    assert ocr.estimate_skew(make_page(-1.25)) == 1.25
+    assert ocr.estimate_skew(Image.new("L", (800, 1100), 255)) == 0
+
+    image, dpi = ocr.prepare_page(make_page(3).convert("RGB"), 400, {"max_dpi": 200})
+    assert (image.mode, image.size, dpi) == ("L", (400, 550), 200)
+    assert ocr.estimate_skew(image) == 0
+    assert set(ocr.binarize(image).convert("L").tobytes()) == {0, 255}
+
+
+def test_regions_and_tesseract_options_come_from_the_layout():
+    layout = {
+        "name": "test",
+        "psm": 6,
+        "regions": [
+            {"name": "route", "page": 1, "box": [0, 0, 1, 0.5], "psm": 4, "oem": 1},
+            {"name": "requisites", "page": -1, "box": [0, 0.5, 1, 1]},
+        ],
+    }
+    assert [r["name"] for r in ocr.regions_for(layout, 1, 3)] == ["route"]
+    assert ocr.regions_for(layout, 2, 3) == []
+    assert [r["name"] for r in ocr.regions_for(layout, 1, 1)] == ["route", "requisites"]
+    assert ocr.regions_for(ocr.get_layout(), 5, 9) == [{"name": "page"}]
+    assert ocr.tesseract_options(layout, layout["regions"][0]) == {"psm": 4, "oem": 1}
+    assert ocr.tesseract_options(layout, layout["regions"][1]) == {"psm": 6}
+    assert ocr.crop_region(make_page(), layout["regions"][1]).size == (800, 550)
+
+
+def test_backend_is_chosen_once_per_process(monkeypatch):
+    monkeypatch.setattr(ocr, "_backend", None)
+    monkeypatch.setenv("WORD_COPYWRITER_OCR_BACKEND", "pytesseract")
+    backend = ocr.get_backend()
+    assert isinstance(backend, ocr.PytesseractBackend)
+    monkeypatch.setenv("WORD_COPYWRITER_OCR_BACKEND", "nope")
+    assert ocr.get_backend() is backend
+
+    monkeypatch.setattr(ocr, "_backend", None)
+    with pytest.raises(ValueError):
+        ocr.get_backend()
+
+
+def test_backend_warning_reports_the_pytesseract_fallback(monkeypatch):
+    monkeypatch.setattr(ocr.importlib.util, "find_spec", lambda name: None)
+    monkeypatch.delenv("WORD_COPYWRITER_OCR_BACKEND", raising=False)
+    assert "tesserocr is not installed" in ocr.backend_warning()
+    monkeypatch.setenv("WORD_COPYWRITER_OCR_BACKEND", "pytesseract")
+    assert ocr.backend_warning() is None
+
+
+def test_only_layouts_that_ask_for_it_clean_up_pages(monkeypatch):
+    seen = []
+
+    class Backend:
+        name = "test"
+
+        def recognize(self, image, lang, dpi=None, psm=None, oem=None):
+            seen.append((image.mode, image.size, dpi))
+            return ""
+
+    monkeypatch.setattr(ocr, "_backend", Backend())
+    page = make_page(2).convert("RGB")
+    ocr.recognize_image(page, 400)
+    ocr.recognize_image(page, 400, "contract")
+    assert seen[0] == ("RGB", (800, 1100), 400)
+    assert seen[1][0] == "1" and seen[1][2] == 300
@@ -1,5 +1,9 @@
 import os
 import sys
+import threading
+
+import pdfplumber
+import pytest
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
@@ -16,3 +20,167 @@ def test_parse_customer_address_inline():
         "Индивидуальный предприниматель Иванов Иван Иванович\n"
         "Юридический адрес: г. Москва, ул. Ленина, д. 1"
     )
+
+
+class FakePage:
+    def __init__(self, text):
+        self.text = text
+
+    def extract_text(self):
+        return self.text
+
+
+class FakePdf:
+    def __init__(self, pages):
+        self.pages = [FakePage(t) for t in pages]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def test_extract_text_from_pdf_ocrs_only_scanned_pages(monkeypatch):
+    pages = ["Договор-заявка № 1 от 01.01.2024", None, "  ", "Стоимость перевозки 1000 руб."]
+    monkeypatch.setattr(pdfplumber, "open", lambda path: FakePdf(pages))
+    ocr_calls = []
+
+    def fake_ocr(path, number, dpi, layout=None, page_count=1):
+        ocr_calls.append((number, dpi))
+        return f"скан {number}"
+
+    monkeypatch.setattr(parsers, "_ocr_page", fake_ocr)
+    text = parsers.extract_text_from_pdf("x.pdf", dpi=150, workers=1)
+    assert ocr_calls == [(2, 150), (3, 150)]
+    assert text == (
+        "Договор-заявка № 1 от 01.01.2024\nскан 2\nскан 3\nСтоимость перевозки 1000 руб.\n"
+    )
+
+
+def test_ocr_layout_skips_scanned_pages_without_regions(monkeypatch):
+    monkeypatch.setattr(pdfplumber, "open", lambda path: FakePdf(["", "", "", ""]))
+    ocr_calls = []
+
+    def fake_ocr(path, number, dpi, layout=None, page_count=1):
+        ocr_calls.append((number, layout["name"], page_count))
+        return f"скан {number}"
+
+    monkeypatch.setattr(parsers, "_ocr_page", fake_ocr)
+    layout = {"name": "ends", "regions": [{"page": 1}, {"page": -1, "box": [0, 0.5, 1, 1]}]}
+    text = parsers.extract_text_from_pdf("x.pdf", workers=1, ocr_layout=layout)
+    assert ocr_calls == [(1, "ends", 4), (4, "ends", 4)]
+    assert text == "скан 1\nскан 4\n"
+
+
+def test_extract_text_from_pdf_reports_progress_and_cancels(monkeypatch):
+    pages = ["Договор-заявка № 1 от 01.01.2024", "", ""]
+    monkeypatch.setattr(pdfplumber, "open", lambda path: FakePdf(pages))
+    cancel = threading.Event()
+    events = []
+
+    def fake_ocr(path, number, dpi, layout=None, page_count=1):
+        cancel.set()
+        return "скан"
+
+    def progress(stage, done, total):
+        events.append((stage, done, total))
+
+    monkeypatch.setattr(parsers, "_ocr_page", fake_ocr)
+    with pytest.raises(parsers.ExtractionCancelled):
+        parsers.extract_text_from_pdf("x.pdf", workers=1, progress=progress, cancel=cancel)
+    assert events == [("text", 1, 3), ("text", 2, 3), ("text", 3, 3), ("ocr", 1, 2)]
+
+
+CONTRACT_TEXT = "\n".join([
+    "Договор-заявка № 77 от 05.03.2024",
+    "Адрес загрузки  Адрес разгрузки",
+    "г. Москва, ул. Ленина, д. 1  г. Казань, ул. Баумана, д. 5",
+    "Дата  Время  Дата  Время",
+    "05.03.2024  10:00  07.03.2024  12:00",
+    "Стоимость перевозки 120 000 руб.",
+    "Марка, номер а/м, номер полуприцепа  Volvo  АВ1234",
+    "ФИО водителя  Петров Пётр Петрович",
+    "Заказчик: Индивидуальный предприниматель Иванов Иван Иванович",
+    "Юридический адрес: г. Москва, ул. Мира, д. 2,",
+    "офис 5",
+    "Почтовый адрес: г. Москва",
+    "ИНН получателя 7701234567",
+    "ОГРН 1027700000000",
+])
+
+
+def test_parse_data_from_text_table_layout():
+    data = parsers.parse_data_from_text(CONTRACT_TEXT)
+    assert data == {
+        "Данные заказчика": (
+            "Индивидуальный предприниматель Иванов Иван Иванович\n"
+            "Юридический адрес: г. Москва, ул. Мира, д. 2, офис 5"
+        ),
+        "ИНН получателя": "ИНН получателя 7701234567",
+        "ОГРН получателя": "ОГРН 1027700000000",
+        "Номер документа": "№ 77 от 05.03.2024",
+        "Адрес загрузки": "г. Москва, ул. Ленина, д. 1",
+        "Адрес разгрузки": "г. Казань, ул. Баумана, д. 5",
+        "Марка автомобиля": "Volvo",
+        "Номер полуприцепа": "АВ1234",
+        "ФИО водителя": "Петров Пётр Петрович",
+        "Дата погрузки": "05.03.2024",
+        "Дата разгрузки": "07.03.2024",
+        "Стоимость перевозки": "120 000 руб.",
+        "Цена": "120000",
+    }
+
+
+def test_parse_data_from_text_last_repeated_label_wins():
+    text = CONTRACT_TEXT + "\nФИО водителя  Сидоров Сидор\nСтоимость перевозки 5 руб.\n"
+    data = parsers.parse_data_from_text(text)
+    assert data["ФИО водителя"] == "Сидоров Сидор"
+    assert data["Стоимость перевозки"] == "5 руб."
+    assert data["Марка автомобиля"] == "Volvo"
+
+
+class ClosingPage(FakePage):
+    closed = 0
+
+    def close(self):
+        ClosingPage.closed += 1
+
+
+def test_iter_text_from_pdf_releases_pages_and_stops_ocr_when_closed(monkeypatch):
+    fake = FakePdf([])
+    fake.pages = [ClosingPage(t) for t in ["Договор-заявка № 1 от 01.01.2024", "", ""]]
+    monkeypatch.setattr(pdfplumber, "open", lambda path: fake)
+    ocr_calls = []
+
+    def fake_ocr(path, number, dpi, layout=None, page_count=1):
+        ocr_calls.append(number)
+        return f"скан {number}"
+
+    monkeypatch.setattr(parsers, "_ocr_page", fake_ocr)
+    pages = parsers.iter_text_from_pdf("x.pdf", workers=1)
+    assert next(pages) == "Договор-заявка № 1 от 01.01.2024"
+    # Text layers are read lazily up to the first scanned page, then all at once
+    assert ClosingPage.closed == 1
+    assert next(pages) == "скан 2"
+    assert ClosingPage.closed == 3
+    pages.close()
+    assert ocr_calls == [2]
+
+
+def test_early_exit_stops_ocr_once_all_fields_are_found(monkeypatch):
+    monkeypatch.setattr(pdfplumber, "open", lambda path: FakePdf([CONTRACT_TEXT] + [""] * 11))
+    ocr_calls = []
+
+    def fake_ocr(path, number, dpi, layout=None, page_count=1):
+        ocr_calls.append(number)
+        return f"{number}. Перевозчик обязуется доставить груз в пункт назначения."
+
+    monkeypatch.setattr(parsers, "_ocr_page", fake_ocr)
+    data = parsers.read_data_from_pdf("x.pdf", workers=1, early_exit=True)
+    assert ocr_calls == [2]
+    assert data == parsers.parse_data_from_text(CONTRACT_TEXT)
+
+    parse = parsers.IncrementalParse()
+    assert not parse.feed(CONTRACT_TEXT.split("Заказчик:")[0])
+    assert "ИНН получателя" in parse.missing
@@ -0,0 +1,111 @@
+import asyncio
+import http.client
+import io
+import json
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from openpyxl import load_workbook
+
+import batch
+import server
+from test_batch import make_source, make_template
+
+
+class RunningServer:
+    def __init__(self, templates):
+        self.loop = asyncio.new_event_loop()
+        self.server = server.RenderServer(templates, workers=1, use_cache=False)
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.host, self.port = self._call(self.server.start("127.0.0.1", 0))
+
+    def _call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout=30)
+
+    def request(self, conn, method, path, body=None, headers=None):
+        conn.request(method, path, body=body, headers=headers or {})
+        response = conn.getresponse()
+        return response.status, response.getheader("Content-Type"), response.read()
+
+    def close(self):
+        self._call(self.server.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+def test_server_renders_from_json_and_uploads(tmp_path):
+    make_template(tmp_path / "act.xlsx")
+    make_source(tmp_path / "contract.docx")
+    running = RunningServer(batch.load_templates({"act": str(tmp_path / "act.xlsx")}))
+    try:
+        conn = http.client.HTTPConnection(running.host, running.port, timeout=30)
+        status, _, body = running.request(conn, "GET", "/health")
+        assert status == 200
+        assert json.loads(body) == {"status": "ok", "templates": {"act": ".xlsx"}}
+
+        data = json.dumps({"Адрес загрузки": "Тверь", "Стоимость перевозки": "12 000 руб."})
+        status, content_type, body = running.request(
+            conn, "POST", "/render/act", data.encode("utf-8"), {"Content-Type": "application/json"}
+        )
+        assert status == 200, body
+        assert content_type == server.CONTENT_TYPES[".xlsx"]
+        ws = load_workbook(io.BytesIO(body)).active
+        assert ws["A1"].value == "Маршрут Тверь - "
+        assert ws["A2"].value == "12000"
+
+        source = (tmp_path / "contract.docx").read_bytes()
+        status, _, body = running.request(conn, "POST", "/parse?name=contract.docx", source)
+        assert status == 200, body
+        assert json.loads(body)["Адрес разгрузки"] == "г. Казань"
+        status, _, body = running.request(conn, "POST", "/render/act?name=contract.docx", source)
+        assert load_workbook(io.BytesIO(body)).active["A1"].value == "Маршрут г. Москва - г. Казань"
+
+        assert running.request(conn, "POST", "/render/invoice", b"{}")[0] == 404
+        assert running.request(conn, "POST", "/render/act", source)[0] == 415
+        assert running.request(conn, "POST", "/parse?name=broken.pdf", b"not a pdf")[0] == 422
+        status, _, body = running.request(
+            conn, "POST", "/render/act", b"[1]", {"Content-Type": "application/json"}
+        )
+        assert status == 400
+        data = json.dumps({"Цена": [1]})
+        status, _, body = running.request(
+            conn, "POST", "/render/act", data.encode("utf-8"), {"Content-Type": "application/json"}
+        )
+        assert status == 400
+        conn.close()
+    finally:
+        running.close()
+
+
+def test_json_fields_are_placeholder_text():
+    fields = server.json_fields({"Цена": 15000, "Ставка": 1.5, "НДС": False, "ИНН получателя": None})
+    assert fields == {"Цена": "15000", "Ставка": "1.5", "НДС": "false", "ИНН получателя": ""}
+    with pytest.raises(server.HttpError) as error:
+        server.json_fields({"Цена": {"сумма": 1}})
+    assert error.value.status == 400
+
+
+def test_server_replaces_a_broken_worker_pool(tmp_path):
+    make_template(tmp_path / "act.xlsx")
+    running = RunningServer(batch.load_templates({"act": str(tmp_path / "act.xlsx")}))
+    try:
+        with pytest.raises(server.HttpError) as error:
+            running._call(running.server._run(os._exit, 1))
+        assert error.value.status == 503
+
+        conn = http.client.HTTPConnection(running.host, running.port, timeout=30)
+        data = json.dumps({"Адрес загрузки": "Тверь"}).encode("utf-8")
+        status, _, body = running.request(
+            conn, "POST", "/render/act", data, {"Content-Type": "application/json"}
+        )
+        assert status == 200, body
+        conn.close()
+    finally:
+        running.close()
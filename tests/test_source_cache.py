@@ -0,0 +1,148 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import docx_layouts
+import ocr
+import parsers
+import source_cache
+
+TEXT = "Договор-заявка № 42 от 01.03.2024\nСтоимость перевозки 15 000 руб.\n"
+
+
+def count_extractions(monkeypatch):
+    calls = []
+
+    def fake_extract(path, **options):
+        calls.append(path)
+        return TEXT
+
+    monkeypatch.setattr(parsers, "extract_text_from_pdf", fake_extract)
+    return calls
+
+
+def test_cached_pdf_is_not_extracted_twice(tmp_path, monkeypatch):
+    calls = count_extractions(monkeypatch)
+    source = tmp_path / "scan.pdf"
+    source.write_bytes(b"%PDF-1.4 scan")
+    copy = tmp_path / "copy.pdf"
+    copy.write_bytes(b"%PDF-1.4 scan")
+    cache = source_cache.SourceCache(str(tmp_path / "cache"))
+
+    first = cache.read_data(str(source))
+    second = cache.read_data(str(copy))
+    assert first == second
+    assert first["Номер документа"] == "№ 42 от 01.03.2024"
+    assert first["Цена"] == "15000"
+    assert calls == [str(source)]
+
+    digest = source_cache.file_digest(str(source))
+    entry = cache.lookup(source_cache.entry_key(str(source), digest, {}))
+    assert entry["text"] == TEXT
+
+
+def test_parser_version_change_reparses_cached_text(tmp_path, monkeypatch):
+    calls = count_extractions(monkeypatch)
+    source = tmp_path / "scan.pdf"
+    source.write_bytes(b"%PDF-1.4 scan")
+    cache = source_cache.SourceCache(str(tmp_path / "cache"))
+    cache.read_data(str(source))
+
+    monkeypatch.setattr(parsers, "PARSER_VERSION", parsers.PARSER_VERSION + "-next")
+    parsed = []
+    original_parse = parsers.parse_data_from_text
+    monkeypatch.setattr(
+        parsers, "parse_data_from_text", lambda text: parsed.append(text) or original_parse(text)
+    )
+    cache.read_data(str(source))
+    assert calls == [str(source)]
+    assert parsed == [TEXT]
+
+
+def test_options_that_change_the_text_are_part_of_the_key(tmp_path, monkeypatch):
+    calls = count_extractions(monkeypatch)
+    source = tmp_path / "scan.pdf"
+    source.write_bytes(b"%PDF-1.4 scan")
+    cache = source_cache.SourceCache(str(tmp_path / "cache"))
+
+    cache.read_data(str(source), dpi=100)
+    cache.read_data(str(source), dpi=300)
+    cache.read_data(str(source), dpi=300, workers=4)
+    cache.read_data(str(source))
+    cache.read_data(str(source), dpi=parsers.OCR_DPI)
+    assert len(calls) == 3
+
+
+def test_early_exit_text_is_not_returned_to_full_reads(tmp_path, monkeypatch):
+    def fake_extract(path, early_exit=False, **options):
+        driver = "Петров Пётр" if early_exit else "Сидоров Сидор"
+        return TEXT + f"ФИО водителя  {driver}\n"
+
+    monkeypatch.setattr(parsers, "extract_text_from_pdf", fake_extract)
+    source = tmp_path / "scan.pdf"
+    source.write_bytes(b"%PDF-1.4 scan")
+    cache = source_cache.SourceCache(str(tmp_path / "cache"))
+
+    assert cache.read_data(str(source), early_exit=True)["ФИО водителя"] == "Петров Пётр"
+    assert cache.read_data(str(source))["ФИО водителя"] == "Сидоров Сидор"
+    assert cache.read_data(str(source), early_exit=False)["ФИО водителя"] == "Сидоров Сидор"
+    assert cache.read_data(str(source), early_exit=True)["ФИО водителя"] == "Петров Пётр"
+
+
+def test_region_ocr_and_whole_page_ocr_are_cached_apart(tmp_path, monkeypatch):
+    def fake_extract(path, ocr_layout=None, **options):
+        region = ocr.get_layout(ocr_layout)["name"] == "contract"
+        return TEXT if region else TEXT + "ФИО водителя  Сидоров Сидор\n"
+
+    monkeypatch.setattr(parsers, "extract_text_from_pdf", fake_extract)
+    source = tmp_path / "scan.pdf"
+    source.write_bytes(b"%PDF-1.4 scan")
+    cache = source_cache.SourceCache(str(tmp_path / "cache"))
+
+    assert cache.read_data(str(source), ocr_layout="contract")["ФИО водителя"] == ""
+    assert cache.read_data(str(source))["ФИО водителя"] == "Сидоров Сидор"
+    assert cache.read_data(str(source), ocr_layout=ocr.PAGE_LAYOUT)["ФИО водителя"] == "Сидоров Сидор"
+    contract = ocr.get_layout("contract")
+    assert cache.read_data(str(source), ocr_layout=contract)["ФИО водителя"] == ""
+
+    other = tmp_path / "other.pdf"
+    other.write_bytes(b"%PDF-1.4 other")
+    assert cache.read_data(str(other))["ФИО водителя"] == "Сидоров Сидор"
+    assert cache.read_data(str(other), ocr_layout="contract")["ФИО водителя"] == ""
+
+
+def test_docx_entries_follow_the_registered_layouts(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(parsers, "read_data_from_file", lambda path: calls.append(path) or {})
+    monkeypatch.setattr(docx_layouts, "LAYOUTS", list(docx_layouts.LAYOUTS))
+    source = tmp_path / "contract.docx"
+    source.write_bytes(b"PK contract")
+    cache = source_cache.SourceCache(str(tmp_path / "cache"))
+
+    cache.read_data(str(source))
+    cache.read_data(str(source))
+    assert len(calls) == 1
+
+    layout = {"name": "customer", "detect": {"anchors": ["Груз"]}, "fields": {}}
+    docx_layouts.register_layout(layout)
+    cache.read_data(str(source))
+    assert len(calls) == 2
+    layout["detect"]["anchors"].append("Маршрут")
+    cache.read_data(str(source))
+    assert len(calls) == 3
+
+
+def test_eviction_and_bypass(tmp_path, monkeypatch):
+    calls = count_extractions(monkeypatch)
+    cache = source_cache.SourceCache(str(tmp_path / "cache"), max_bytes=1)
+    source = tmp_path / "scan.pdf"
+    source.write_bytes(b"%PDF-1.4 scan")
+    cache.read_data(str(source))
+    assert os.listdir(tmp_path / "cache") == []
+
+    disabled = source_cache.SourceCache(str(tmp_path / "other"), enabled=False)
+    disabled.read_data(str(source))
+    disabled.read_data(str(source))
+    assert len(calls) == 3
+    assert not os.path.exists(tmp_path / "other")
@@ -0,0 +1,57 @@
+import os
+import pickle
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from openpyxl import Workbook, load_workbook
+
+import templates
+
+
+def make_template(path, text="{{Номер документа}}"):
+    wb = Workbook()
+    wb.active["B2"] = text
+    wb.active["B3"] = "без подстановок"
+    hidden = wb.create_sheet("Скрытый")
+    hidden["A1"] = "{{Цена}}"
+    hidden.sheet_state = "hidden"
+    wb.save(path)
+
+
+def test_compiled_template_indexes_cells_and_renders_repeatedly(tmp_path):
+    make_template(tmp_path / "act.xlsx")
+    template = templates.compile_template(str(tmp_path / "act.xlsx"))
+    assert [(c.sheet, c.coordinate) for c in template.cells] == [("Sheet", "B2"), ("Скрытый", "A1")]
+    assert template.placeholders == {"Номер документа", "Цена"}
+
+    template.render({"Номер документа": "№ 1", "Цена": "10"}, str(tmp_path / "1.xlsx"))
+    template.render({"Номер документа": "№ 2"}, str(tmp_path / "2.xlsx"))
+
+    first = load_workbook(tmp_path / "1.xlsx")
+    second = load_workbook(tmp_path / "2.xlsx")
+    assert first.active["B2"].value == "№ 1"
+    assert first["Скрытый"]["A1"].value == "10"
+    assert first["Скрытый"].sheet_state == "visible"
+    assert second.active["B2"].value == "№ 2"
+    assert second["Скрытый"]["A1"].value == "{{Цена}}"
+
+
+def test_compile_template_cache_invalidated_on_change(tmp_path):
+    path = tmp_path / "act.xlsx"
+    make_template(path)
+    first = templates.compile_template(str(path))
+    assert templates.compile_template(str(path)) is first
+
+    make_template(path, "{{ФИО водителя}}")
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 10**9))
+    second = templates.compile_template(str(path))
+    assert second is not first
+    assert "ФИО водителя" in second.placeholders
+
+
+def test_compiled_template_is_picklable(tmp_path):
+    make_template(tmp_path / "act.xlsx")
+    template = templates.compile_template(str(tmp_path / "act.xlsx"))
+    clone = pickle.loads(pickle.dumps(template))
+    assert clone.cells == template.cells
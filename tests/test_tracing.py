@@ -0,0 +1,48 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import tracing
+
+
+def test_span_is_noop_when_disabled():
+    tracing.disable()
+    with tracing.collect() as spans, tracing.span("read"):
+        pass
+    assert spans == []
+    assert tracing.span("a") is tracing.span("b")
+
+
+def test_spans_are_written_as_jsonl_and_summarized(tmp_path):
+    path = tmp_path / "trace.jsonl"
+    tracing.enable(str(path))
+    try:
+        with tracing.collect() as spans, tracing.span("load"):
+            with tracing.span("read", file="a.pdf"):
+                with tracing.span("pdf.text", page=1):
+                    pass
+                with tracing.span("pdf.text", page=2):
+                    pass
+            with tracing.span("parse"):
+                pass
+    finally:
+        tracing.disable()
+
+    assert [(r["name"], r["depth"], r["leaf"]) for r in spans] == [
+        ("pdf.text", 2, True),
+        ("pdf.text", 2, True),
+        ("read", 1, False),
+        ("parse", 1, True),
+        ("load", 0, False),
+    ]
+    summary = tracing.summarize(spans)
+    assert "pdf.text" in summary and "parse" in summary and "read" not in summary
+
+    records = tracing.read_jsonl(str(path))
+    assert [r["name"] for r in records] == ["pdf.text", "pdf.text", "read", "parse", "load"]
+    trace = tracing.to_chrome_trace(records)
+    assert trace["traceEvents"][2]["ph"] == "X"
+    assert trace["traceEvents"][2]["args"] == {"file": "a.pdf"}
+    json.dumps(trace)
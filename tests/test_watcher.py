@@ -0,0 +1,114 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import batch
+import watcher
+from source_cache import file_digest
+from test_batch import make_source, make_template
+
+
+def make_watcher(tmp_path, **kwargs):
+    make_template(tmp_path / "act.xlsx")
+    templates = batch.load_templates({"act": str(tmp_path / "act.xlsx")})
+    return watcher.InboxWatcher(
+        str(tmp_path / "inbox"), templates, str(tmp_path / "out"), settle=0, use_cache=False, **kwargs
+    )
+
+
+def test_watcher_processes_inbox_and_journals(tmp_path):
+    inbox = tmp_path / "inbox"
+    inbox.mkdir()
+    make_source(inbox / "a.docx")
+    (inbox / "b.pdf").write_bytes(b"not a pdf")
+    results = []
+
+    make_watcher(tmp_path, workers=2, on_result=results.append).run(once=True)
+
+    assert sorted(os.listdir(inbox / "done")) == ["a.docx"]
+    assert sorted(os.listdir(inbox / "failed")) == ["b.pdf"]
+    assert os.path.exists(tmp_path / "out" / "a_act.xlsx")
+    assert sorted(r["ok"] for r in results) == [False, True]
+    with open(inbox / watcher.JOURNAL_NAME, encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f]
+    assert {e["source"]: e["ok"] for e in entries} == {"a.docx": True, "b.pdf": False}
+
+
+def test_watcher_skips_files_already_in_journal(tmp_path):
+    inbox = tmp_path / "inbox"
+    inbox.mkdir()
+    make_source(inbox / "a.docx")
+    journal = watcher.Journal(str(inbox / watcher.JOURNAL_NAME))
+    journal.record({"digest": file_digest(inbox / "a.docx"), "ok": True})
+    results = []
+
+    make_watcher(tmp_path, on_result=results.append).run(once=True)
+
+    assert results == []
+    assert os.listdir(inbox / "done") == ["a.docx"]
+    assert not os.path.exists(tmp_path / "out" / "a_act.xlsx")
+
+
+def test_ready_files_waits_until_file_settles(tmp_path):
+    inbox = tmp_path / "inbox"
+    inbox.mkdir()
+    w = watcher.InboxWatcher(str(inbox), {}, str(tmp_path / "out"), settle=2)
+    make_source(inbox / "a.docx")
+    assert w.ready_files(now=100.0) == []
+    assert w.ready_files(now=101.0) == []
+    assert w.ready_files(now=102.5) == [str(inbox / "a.docx")]
+
+
+def test_watcher_fails_unreadable_file_and_goes_on(tmp_path, monkeypatch):
+    inbox = tmp_path / "inbox"
+    inbox.mkdir()
+    for name in ("a.docx", "b.docx", "c.docx"):
+        make_source(inbox / name)
+    (inbox / "c.docx").write_bytes((inbox / "c.docx").read_bytes() + b"\0")
+
+    def locked_digest(path):
+        if os.path.basename(path) == "b.docx":
+            raise PermissionError(13, "Permission denied", str(path))
+        return file_digest(path)
+
+    monkeypatch.setattr(watcher, "file_digest", locked_digest)
+    results = []
+    make_watcher(tmp_path, on_result=results.append).run(once=True)
+
+    assert sorted(os.listdir(inbox / "done")) == ["a.docx", "c.docx"]
+    assert os.listdir(inbox / "failed") == ["b.docx"]
+    failed = [r for r in results if not r["ok"]]
+    assert len(failed) == 1 and failed[0]["error"].startswith("PermissionError")
+    with open(inbox / watcher.JOURNAL_NAME, encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f]
+    assert {e["source"]: e["ok"] for e in entries} == {"a.docx": True, "b.docx": False, "c.docx": True}
+
+
+def test_watcher_does_not_overwrite_outputs_of_a_file_dropped_again(tmp_path):
+    inbox = tmp_path / "inbox"
+    inbox.mkdir()
+    make_source(inbox / "a.docx")
+    make_watcher(tmp_path).run(once=True)
+    make_source(inbox / "a.docx")
+    (inbox / "a.docx").write_bytes((inbox / "a.docx").read_bytes() + b"\0")
+    make_watcher(tmp_path, workers=2).run(once=True)
+
+    assert sorted(os.listdir(tmp_path / "out")) == ["a_act.xlsx", "a_act_2.xlsx"]
+
+
+def test_once_exits_when_only_unmovable_files_are_left(tmp_path, monkeypatch):
+    inbox = tmp_path / "inbox"
+    inbox.mkdir()
+    make_source(inbox / "a.docx")
+
+    def locked_move(path, directory):
+        raise PermissionError(13, "Permission denied", str(path))
+
+    monkeypatch.setattr(watcher, "_move", locked_move)
+    results = []
+    make_watcher(tmp_path, poll_interval=0.01, on_result=results.append).run(once=True)
+
+    assert os.path.exists(inbox / "a.docx")
+    assert len(results) == 1 and "not moved: PermissionError" in results[0]["error"]
@@ -0,0 +1,225 @@
+"""Timing spans for the extract -> parse -> render pipeline.
+
+Tracing is off unless ``WORD_COPYWRITER_TRACE`` is set: ``1`` keeps spans in
+memory only (for the GUI timing summary), any other value is a file that
+every process appends finished spans to as JSON lines. Convert such a file
+for chrome://tracing or Perfetto with::
+
+    python tracing.py trace.jsonl -o trace.json
+
+When tracing is off, ``span()`` returns a shared no-op context manager.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Spans kept in memory per process
+MAX_RECORDS = 10000
+
+_enabled = False
+_path = None
+_records = deque(maxlen=MAX_RECORDS)
+_write_lock = threading.Lock()
+_local = threading.local()
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def _stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+class _Span:
+    __slots__ = ("name", "args", "start", "wall", "leaf")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+        self.leaf = True
+
+    def __enter__(self):
+        stack = _stack()
+        if stack:
+            stack[-1].leaf = False
+        stack.append(self)
+        self.wall = time.time_ns()
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter_ns() - self.start
+        stack = _stack()
+        if stack and stack[-1] is self:
+            stack.pop()
+        elif self in stack:
+            # Spans of interleaved generators may close out of order
+            stack.remove(self)
+        record = {
+            "name": self.name,
+            "ts": self.wall // 1000,
+            "dur": duration // 1000,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "depth": len(stack),
+            "leaf": self.leaf,
+        }
+        if self.args:
+            record["args"] = self.args
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        _emit(record)
+        return False
+
+
+def _emit(record):
+    _records.append(record)
+    for collected in getattr(_local, "collectors", ()):
+        collected.append(record)
+    if _path:
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with _write_lock:
+            try:
+                with open(_path, "a", encoding="utf-8") as f:
+                    f.write(line)
+            except OSError:
+                pass
+
+
+def span(name, **args):
+    """Return a context manager timing the enclosed block as a span called name."""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, args)
+
+
+def enabled():
+    return _enabled
+
+
+def enable(path=None):
+    """Turn tracing on; spans are also appended to path as JSON lines if given."""
+    global _enabled, _path
+    _enabled = True
+    _path = path
+
+
+def disable():
+    global _enabled, _path
+    _enabled = False
+    _path = None
+
+
+def configure_from_env():
+    value = os.environ.get("WORD_COPYWRITER_TRACE", "")
+    if value and value != "0":
+        enable(None if value == "1" else value)
+
+
+def records():
+    """Return the spans recorded in this process, oldest first."""
+    return list(_records)
+
+
+@contextmanager
+def collect():
+    """Collect the spans finished on the current thread inside the block.
+
+    Yields a list that is filled as spans finish; it stays empty when tracing
+    is off.
+    """
+    collected = []
+    if not _enabled:
+        yield collected
+        return
+    collectors = getattr(_local, "collectors", None)
+    if collectors is None:
+        collectors = _local.collectors = []
+    collectors.append(collected)
+    base = len(_stack())
+    try:
+        yield collected
+    finally:
+        collectors.remove(collected)
+        # Depths relative to where the collection started, for summarize()
+        collected[:] = [dict(r, depth=r["depth"] - base) for r in collected]
+
+
+def summarize(collected):
+    """Return ``"total (stage time, ...)"`` for spans gathered by ``collect()``.
+
+    The total covers the outermost spans; the breakdown sums the innermost
+    spans by name, slowest first.
+    """
+    total = sum(r["dur"] for r in collected if r["depth"] == 0)
+    if not total:
+        return ""
+    leaves = {}
+    for r in collected:
+        if r["leaf"] and r["depth"] > 0:
+            leaves[r["name"]] = leaves.get(r["name"], 0) + r["dur"]
+    text = f"{total / 1e6:.2f} s"
+    if leaves:
+        parts = sorted(leaves.items(), key=lambda item: -item[1])[:4]
+        text += " (" + ", ".join(f"{name} {dur / 1e6:.2f} s" for name, dur in parts) + ")"
+    return text
+
+
+def read_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def to_chrome_trace(spans):
+    """Convert span records to the Chrome trace event format."""
+    events = []
+    for r in spans:
+        args = dict(r.get("args", {}))
+        if "error" in r:
+            args["error"] = r["error"]
+        events.append({
+            "name": r["name"],
+            "cat": r["name"].split(".")[0],
+            "ph": "X",
+            "ts": r["ts"],
+            "dur": r["dur"],
+            "pid": r["pid"],
+            "tid": r["tid"],
+            "args": args,
+        })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert a JSON lines trace to Chrome trace format.")
+    parser.add_argument("trace", help="JSON lines file written with WORD_COPYWRITER_TRACE")
+    parser.add_argument("--output", "-o", required=True, help="Chrome trace JSON to write")
+    args = parser.parse_args(argv)
+    spans = read_jsonl(args.trace)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(to_chrome_trace(spans), f, ensure_ascii=False)
+    print(f"Wrote {len(spans)} span(s) to {args.output}")
+    return 0
+
+
+configure_from_env()
+
+if __name__ == "__main__":
+    sys.exit(main())
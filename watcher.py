@@ -0,0 +1,467 @@
+"""Watch-folder service: process contracts as they appear in an inbox directory.
+
+New files are picked up once their size and modification time have been
+stable for ``settle`` seconds, parsed and rendered like in batch mode, then
+moved into ``done/`` or ``failed/``. At most ``workers`` files are processed at
+a time; the rest wait in the inbox, so a burst of scans never starts more OCR
+processes than that. Results are appended to a journal keyed by file content,
+so after a restart files that were already handled are only moved, not
+processed again. A file that cannot be read, or whose worker process dies,
+is journaled and moved into ``failed/`` like any other failure, and a broken
+worker pool is replaced. Outputs are never overwritten: when a name is
+already taken (two files with the same name, or a file dropped again) the
+new output gets a ``_2``, ``_3``... suffix.
+
+On Linux the inbox is watched with inotify; elsewhere it is polled.
+
+This module must not import PyQt5 so it can run on servers without a display.
+"""
+import argparse
+import json
+import os
+import select
+import shutil
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import batch
+import ocr
+from excel_utils import RENDER_BACKENDS
+from parsers import OCR_DPI
+from source_cache import file_digest
+from templates import NameClaims
+
+DEFAULT_SETTLE_SECONDS = 2.0
+DEFAULT_POLL_SECONDS = 1.0
+JOURNAL_NAME = "journal.jsonl"
+
+# inotify(7) flags
+_IN_MODIFY = 0x002
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+
+
+class _Inotify:
+    """Wakes the watcher as soon as something is written into the inbox."""
+
+    def __init__(self, directory):
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE | _IN_MODIFY
+        if libc.inotify_add_watch(fd, os.fsencode(directory), mask) < 0:
+            os.close(fd)
+            raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+        self.fd = fd
+
+    def wait(self, timeout):
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if readable:
+            try:
+                while os.read(self.fd, 65536):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _Polling:
+    def __init__(self, stop_event):
+        self.stop_event = stop_event
+
+    def wait(self, timeout):
+        self.stop_event.wait(timeout)
+
+    def close(self):
+        pass
+
+
+class Journal:
+    """Append-only JSON lines record of processed files, keyed by content digest."""
+
+    def __init__(self, path):
+        self.path = path
+        # digest -> whether processing succeeded
+        self.outcomes = {}
+        try:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self.outcomes[entry["digest"]] = entry["ok"]
+                    except (ValueError, KeyError):
+                        continue
+        except OSError:
+            pass
+
+    def __contains__(self, digest):
+        return digest in self.outcomes
+
+    def record(self, entry):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.outcomes[entry["digest"]] = entry["ok"]
+
+
+def _move(path, directory):
+    """Move path into directory, adding a counter to the name if it is taken."""
+    os.makedirs(directory, exist_ok=True)
+    stem, ext = os.path.splitext(os.path.basename(path))
+    target = os.path.join(directory, stem + ext)
+    n = 2
+    while os.path.exists(target):
+        target = os.path.join(directory, f"{stem}_{n}{ext}")
+        n += 1
+    shutil.move(path, target)
+    return target
+
+
+def _failure(path, error):
+    """Return the result record of a file that could not be processed at all."""
+    return {
+        "source": path,
+        "ok": False,
+        "missing": [],
+        "outputs": {},
+        "error": f"{type(error).__name__}: {error}",
+        "parse_seconds": 0.0,
+        "render_seconds": 0.0,
+        "seconds": 0.0,
+    }
+
+
+class InboxWatcher:
+    def __init__(
+        self,
+        inbox,
+        templates,
+        output_dir,
+        workers=1,
+        settle=DEFAULT_SETTLE_SECONDS,
+        poll_interval=DEFAULT_POLL_SECONDS,
+        dpi=OCR_DPI,
+        use_cache=True,
+        on_result=None,
+        use_inotify=True,
+        early_exit=False,
+        ocr_layout=None,
+    ):
+        self.inbox = inbox
+        self.templates = templates
+        self.output_dir = output_dir
+        self.done_dir = os.path.join(inbox, "done")
+        self.failed_dir = os.path.join(inbox, "failed")
+        self.journal = Journal(os.path.join(inbox, JOURNAL_NAME))
+        self.workers = max(1, workers)
+        self.settle = settle
+        self.poll_interval = poll_interval
+        # Files are already spread over the workers, so each one is OCR'd serially
+        self.pdf_options = {
+            "dpi": dpi,
+            "workers": 1,
+            "early_exit": early_exit,
+            "ocr_layout": ocr.get_layout(ocr_layout),
+        }
+        self.use_cache = use_cache
+        self.on_result = on_result
+        self.use_inotify = use_inotify
+        self.stop_event = threading.Event()
+        # path -> (size, mtime_ns, time the signature was first seen)
+        self._seen = {}
+        # Seconds until the next unsettled file settles, or None
+        self._settling = None
+        # path -> (size, mtime_ns) of files that could not be moved out of the inbox
+        self._stuck = {}
+
+    def stop(self):
+        self.stop_event.set()
+
+    def ready_files(self, now=None):
+        """Return inbox sources that have not changed for ``settle`` seconds, oldest first."""
+        now = time.monotonic() if now is None else now
+        ready = []
+        present = set()
+        self._settling = None
+        for path in batch.find_sources(self.inbox):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            present.add(path)
+            signature = (st.st_size, st.st_mtime_ns)
+            if path in self._stuck:
+                if self._stuck[path] == signature:
+                    continue
+                del self._stuck[path]
+            seen = self._seen.get(path)
+            if seen is None or seen[:2] != signature:
+                self._seen[path] = signature + (now,)
+                if self.settle > 0:
+                    continue
+                seen = self._seen[path]
+            if now - seen[2] >= self.settle:
+                ready.append((st.st_mtime_ns, path))
+            else:
+                remaining = self.settle - (now - seen[2])
+                self._settling = min(self._settling or remaining, remaining)
+        for path in set(self._seen) - present:
+            del self._seen[path]
+        for path in set(self._stuck) - present:
+            del self._stuck[path]
+        return [path for _mtime, path in sorted(ready)]
+
+    def _move_out(self, path, ok):
+        """Move a handled file to done/ or failed/; return the new path, or raise OSError.
+
+        A file that cannot be moved (vanished, or locked by another program)
+        is left alone until it changes.
+        """
+        self._seen.pop(path, None)
+        try:
+            return _move(path, self.done_dir if ok else self.failed_dir)
+        except OSError:
+            try:
+                st = os.stat(path)
+                self._stuck[path] = (st.st_size, st.st_mtime_ns)
+            except OSError:
+                pass
+            raise
+
+    def _finish(self, path, digest, result):
+        try:
+            target = self._move_out(path, result["ok"])
+        except OSError as e:
+            target = None
+            error = f"not moved: {type(e).__name__}: {e}"
+            result = dict(result, error=f"{result['error']}; {error}" if result["error"] else error)
+        self.journal.record({
+            "digest": digest,
+            "source": os.path.basename(path),
+            "moved_to": target,
+            "ok": result["ok"],
+            "outputs": result["outputs"],
+            "missing": result["missing"],
+            "error": result["error"],
+            "seconds": result["seconds"],
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        })
+        result = dict(result, source=target or path)
+        if self.on_result:
+            self.on_result(result)
+
+    def _claim(self, path):
+        """Return the digest of a ready file, or None if it is gone or already journaled.
+
+        Raises OSError if the file cannot be read.
+        """
+        try:
+            digest = file_digest(path)
+        except FileNotFoundError:
+            self._seen.pop(path, None)
+            return None
+        if digest in self.journal:
+            # Processed before a restart but not moved yet
+            try:
+                self._move_out(path, self.journal.outcomes[digest])
+            except OSError:
+                pass
+            return None
+        return digest
+
+    def _waiting(self):
+        """Return whether the inbox holds files other than those that could not be moved out."""
+        return any(path not in self._stuck for path in batch.find_sources(self.inbox))
+
+    def _new_pool(self):
+        return ProcessPoolExecutor(
+            max_workers=self.workers, initializer=batch._init_worker, initargs=(self.templates,)
+        )
+
+    def _collect(self, future, path, digest):
+        """Finish a file processed in the pool; return False if the pool broke."""
+        try:
+            result = future.result()
+        except BrokenProcessPool as e:
+            # A worker died (e.g. out of memory); the files it was running fail
+            self._finish(path, digest, _failure(path, e))
+            return False
+        except Exception as e:
+            result = _failure(path, e)
+        self._finish(path, digest, result)
+        return True
+
+    def run(self, once=False):
+        """Process files until ``stop`` is called; with ``once``, until the inbox is empty."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        waker = None
+        if self.use_inotify and sys.platform.startswith("linux"):
+            try:
+                waker = _Inotify(self.inbox)
+            except (OSError, AttributeError):
+                waker = None
+        waker = waker or _Polling(self.stop_event)
+        pool = self._new_pool() if self.workers > 1 else None
+        # Outputs of files with the same name (or dropped again) are numbered, not overwritten
+        claims = NameClaims(skip_existing=True)
+        running = {}
+        try:
+            while not self.stop_event.is_set():
+                if running:
+                    done, _ = wait(running, timeout=0, return_when=FIRST_COMPLETED)
+                    broken = False
+                    for future in done:
+                        path, digest = running.pop(future)
+                        broken = not self._collect(future, path, digest) or broken
+                    if broken:
+                        pool.shutdown(wait=False)
+                        pool = self._new_pool()
+                busy = {path for path, _digest in running.values()}
+                progressed = False
+                for path in self.ready_files():
+                    if len(running) >= self.workers or self.stop_event.is_set():
+                        break
+                    if path in busy:
+                        continue
+                    try:
+                        digest = self._claim(path)
+                    except OSError as e:
+                        self._finish(path, None, _failure(path, e))
+                        progressed = True
+                        continue
+                    if digest is None:
+                        continue
+                    if pool is None:
+                        result = batch.process_file(
+                            path,
+                            self.templates,
+                            self.output_dir,
+                            self.pdf_options,
+                            self.use_cache,
+                            claims=claims,
+                        )
+                        self._finish(path, digest, result)
+                        progressed = True
+                    else:
+                        args = (path, self.output_dir, self.pdf_options, self.use_cache)
+                        try:
+                            future = pool.submit(batch._process_in_worker, *args, claims=claims)
+                        except BrokenProcessPool:
+                            pool.shutdown(wait=False)
+                            pool = self._new_pool()
+                            future = pool.submit(batch._process_in_worker, *args, claims=claims)
+                        running[future] = (path, digest)
+                if once and not running and not self._waiting():
+                    break
+                if running:
+                    wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                elif not progressed:
+                    waker.wait(min(self.poll_interval, self._settling or self.poll_interval))
+            # Let files already being processed finish so they are journaled and moved
+            for future, (path, digest) in running.items():
+                if not future.cancel():
+                    self._collect(future, path, digest)
+            running = {}
+        finally:
+            waker.close()
+            if pool is not None:
+                for future in running:
+                    future.cancel()
+                pool.shutdown(wait=True)
+            claims.close()
+
+
+def _print_result(result):
+    status = "OK  " if result["ok"] else "FAIL"
+    line = f"{status} {result['seconds']:7.2f}s  {result['source']}"
+    if result["error"]:
+        line += f"  [{result['error']}]"
+    print(line, flush=True)
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(
+        description="Watch an inbox folder and render templates for every contract dropped into it."
+    )
+    parser.add_argument("--inbox", "-i", required=True, help="directory to watch")
+    parser.add_argument("--act", help="act template (.xlsx or .docx)")
+    parser.add_argument("--invoice", help="invoice template (.xlsx or .docx)")
+    parser.add_argument("--output", "-o", required=True, help="output directory")
+    parser.add_argument(
+        "--backend",
+        choices=RENDER_BACKENDS,
+        default="openpyxl",
+        help="xlsx rendering backend (default: openpyxl)",
+    )
+    parser.add_argument("--workers", "-j", type=int, default=1, help="files processed at a time (default: 1)")
+    parser.add_argument(
+        "--settle",
+        type=float,
+        default=DEFAULT_SETTLE_SECONDS,
+        help=f"seconds a file must stay unchanged before it is processed (default: {DEFAULT_SETTLE_SECONDS})",
+    )
+    parser.add_argument(
+        "--poll",
+        type=float,
+        default=DEFAULT_POLL_SECONDS,
+        help=f"seconds between inbox scans (default: {DEFAULT_POLL_SECONDS})",
+    )
+    parser.add_argument("--dpi", type=int, default=OCR_DPI, help=f"OCR resolution (default: {OCR_DPI})")
+    parser.add_argument(
+        "--early-exit",
+        action="store_true",
+        help="stop reading PDF pages once all fields are found",
+    )
+    parser.add_argument(
+        "--ocr-layout",
+        choices=sorted(ocr.OCR_LAYOUTS),
+        default="page",
+        help="regions of scanned pages to recognize (default: page, the whole page)",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="do not use the extracted data cache")
+    parser.add_argument("--once", action="store_true", help="exit when the inbox is empty")
+    return parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    templates = batch.load_templates({"act": args.act, "invoice": args.invoice}, args.backend)
+    watcher = InboxWatcher(
+        args.inbox,
+        templates,
+        args.output,
+        workers=args.workers,
+        settle=args.settle,
+        poll_interval=args.poll,
+        dpi=args.dpi,
+        use_cache=not args.no_cache,
+        on_result=_print_result,
+        early_exit=args.early_exit,
+        ocr_layout=args.ocr_layout,
+    )
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_args: watcher.stop())
+    warning = ocr.backend_warning()
+    if warning:
+        print(f"warning: {warning}", file=sys.stderr, flush=True)
+    print(f"Watching {os.path.abspath(args.inbox)}", flush=True)
+    watcher.run(once=args.once)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -24,18 +24,18 @@ a = Analysis(
 
 pyz = PYZ(a.pure)
 
+# One-folder build: a onefile exe unpacks everything to a temp dir on each start,
+# which dominates cold-start time. Document backends are imported lazily.
 exe = EXE(
     pyz,
     a.scripts,
-    a.binaries,
-    a.datas,
     [],
+    exclude_binaries=True,
     name='word_copywriter',
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
     upx=True,
-    upx_exclude=[],
     runtime_tmpdir=None,
     console=False,
     disable_windowed_traceback=False,
@@ -45,3 +45,13 @@ exe = EXE(
     entitlements_file=None,
     icon=str(root / 'resources' / 'icon.png'),
 )
+
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=True,
+    upx_exclude=[],
+    name='word_copywriter',
+)